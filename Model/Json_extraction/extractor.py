@@ -1,48 +1,24 @@
-import os
 import json
-import chardet
-import PyPDF2
-import docx
 import re
-import google.generativeai as genai
-from fastapi import APIRouter, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form
+from services.document_store import aget_upload_text
+from services.executor import endpoint_limit
+from services.llm_cache import cache as llm_cache
+from services import gemini
+from services.result_store import store as result_store
 
-# -----------------------------
-# Configure Gemini API
-# -----------------------------
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-1.5-flash")
+MODEL_NAME = "gemini-1.5-flash"
 
 router = APIRouter()
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def extract_text(file) -> str:
-    filename = file.filename
-    ext = os.path.splitext(filename)[1].lower()
-
-    if ext == ".pdf":
-        text = ""
-        reader = PyPDF2.PdfReader(file.file)
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
-
-    elif ext == ".docx":
-        doc = docx.Document(file.file)
-        return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
-
-    elif ext in [".txt", ".csv"]:
-        raw = file.file.read()
-        enc = chardet.detect(raw)["encoding"] or "utf-8"
-        return raw.decode(enc, errors="ignore")
-
-    else:
-        raise ValueError(f"Unsupported file type: {ext}")
+async def extract_text(file) -> str:
+    # Streamed to disk and parsed from there; text encodings are detected on a prefix
+    return await aget_upload_text(file, "extract-json")
 
-def generate_json(file_content: str):
+async def generate_json(file_content: str):
     prompt = """
     Extract the following details from the document and return ONLY valid JSON:
     {
@@ -64,8 +40,9 @@ def generate_json(file_content: str):
     }
     Respond with JSON ONLY. No explanations, no markdown.
     """
-    response = model.generate_content([prompt, file_content])
-    raw_text = response.text.strip()
+    raw_text = (await llm_cache.cached(
+        MODEL_NAME, [prompt, file_content], lambda: gemini.generate(MODEL_NAME, [prompt, file_content])
+    )).strip()
     match = re.search(r"\{.*\}", raw_text, re.DOTALL)
     if match:
         raw_text = match.group(0)
@@ -78,10 +55,12 @@ def generate_json(file_content: str):
 # API route
 # -----------------------------
 @router.post("/extract-json")
-async def extract_json(file: UploadFile = File(...)):
+async def extract_json(file: UploadFile = File(...), proposal_id: str = Form("")):
     try:
-        content = extract_text(file)
-        parsed_json = generate_json(content)
+        async with endpoint_limit("extract-json"):
+            content = await extract_text(file)
+            parsed_json = await result_store.cached("extract-json", content, lambda: generate_json(content),
+                                                    proposal_id=proposal_id)
         return parsed_json
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return gemini.error_response(e)
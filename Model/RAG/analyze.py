@@ -0,0 +1,158 @@
+import json
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from services.document_store import aextract_text_from_pdf
+from services.executor import endpoint_limit
+from services.longdoc import map_reduce, cost_reducer
+from services import gemini
+from services.plagiarism_engine import engine as plagiarism_engine
+from services.result_store import store as result_store
+from RAG.plag import check_plagiarism_percentage, local_check, needs_llm_review, PLAGIARISM_REDUCER
+from RAG.novelty import give_novelty_report, NOVELTY_REDUCER
+from RAG.cost import cost_estimation
+
+router = APIRouter()
+
+# -----------------------------
+# Analysis sections
+# -----------------------------
+# Each LLM section contributes its task description and JSON shape to one
+# combined prompt, which is mapped over every chunk of the document
+# (services.longdoc); `reducer` merges the section's per-chunk answers.
+# `required` lists the keys a chunk's section must have to be counted; a section
+# no chunk answered properly falls back to its single-analysis helper.
+# Plagiarism follows /check-plagiarism: once a reference corpus is ingested the
+# local MinHash engine decides, and the plagiarism task only stays in the
+# combined prompt (as the engine's "llm_review") when its score is borderline.
+# Either way every chunk costs one Gemini call.
+ANALYSES = {
+    "plagiarism": {
+        "task": (
+            "Act as a plagiarism detector: estimate the plagiarism percentage (0-100%) "
+            "and list any suspicious or copied sections."
+        ),
+        "schema": {"plagiarism_percentage": 70, "suspicious_sections": ["text part 1...", "text part 2..."]},
+        "required": ["plagiarism_percentage"],
+        "reducer": PLAGIARISM_REDUCER,
+        "fallback": check_plagiarism_percentage,
+    },
+    "novelty": {
+        "task": (
+            "Act as a novelty detector: estimate the novelty percentage (0-100%) "
+            "and list any unique or original sections."
+        ),
+        "schema": {"novelty_percentage": 70, "unique_sections": ["text part 1...", "text part 2..."]},
+        "required": ["novelty_percentage"],
+        "reducer": NOVELTY_REDUCER,
+        "fallback": give_novelty_report,
+    },
+    "cost": {
+        "task": (
+            "Act as a cost estimator: estimate the total cost in rupees with a breakdown by category, "
+            "using any mentioned budgets or financial figures and the cost of any non-free tools."
+        ),
+        "schema": {"estimated_cost": 1000, "cost_breakdown": {"category_1": 500, "category_2": 300, "category_3": 200}},
+        "required": ["estimated_cost"],
+        "reducer": cost_reducer,
+        "fallback": cost_estimation,
+    },
+}
+
+# -----------------------------
+# Helper functions
+# -----------------------------
+def parse_analyses(analyses: str) -> list:
+    selected = []
+    for name in analyses.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in ANALYSES:
+            raise ValueError(f"Unknown analysis: {name}")
+        if name not in selected:
+            selected.append(name)
+    return selected
+
+def build_prompt(selected: list):
+    tasks = "\n".join(f"    - {name}: {ANALYSES[name]['task']}" for name in selected)
+    schema = json.dumps({name: ANALYSES[name]["schema"] for name in selected}, indent=4)
+
+    def _prompt(chunk: str) -> str:
+        return f"""
+    You are an AI proposal analyst. Analyze the following text and perform every task below.
+    {tasks}
+    Only respond in JSON format with one top-level key per task, like:
+    {schema}
+
+    Text to check:
+    {chunk}
+    """
+    return _prompt
+
+def section_is_valid(name: str, section) -> bool:
+    return isinstance(section, dict) and all(k in section for k in ANALYSES[name]["required"])
+
+def combined_reducer(selected: list):
+    # Splits every chunk's combined answer into its sections and applies each section's reducer;
+    # sections that no chunk answered are listed under "failed"
+    def _reduce(results):
+        merged, failed = {}, []
+        for name in selected:
+            sections = [(chunk, p.get(name) if p and section_is_valid(name, p.get(name)) else None) for chunk, p in results]
+            if any(section for _, section in sections):
+                merged[name] = ANALYSES[name]["reducer"](sections)
+            else:
+                failed.append(name)
+        return {"sections": merged, "failed": failed}
+    return _reduce
+
+async def run_analyses(text: str, selected: list) -> dict:
+    prompted = list(selected)
+    local = None
+    if "plagiarism" in selected and len(plagiarism_engine):
+        local = await local_check(text)
+        if not needs_llm_review(local):
+            prompted.remove("plagiarism")
+
+    results, failed = {}, []
+    if prompted:
+        combined = await map_reduce(text, build_prompt(prompted), combined_reducer(prompted))
+        results.update(combined["sections"])
+        failed = combined["failed"]
+
+    # Re-run only the sections the combined responses did not answer properly
+    if failed:
+        fallbacks = await asyncio.gather(*(ANALYSES[name]["fallback"](text) for name in failed))
+        results.update(zip(failed, fallbacks))
+    if local is not None:
+        if "plagiarism" in results:
+            local["llm_review"] = results["plagiarism"]
+        results["plagiarism"] = local
+
+    return {"analyses": selected, "results": {name: results[name] for name in selected}, "fallback_sections": failed}
+
+# -----------------------------
+# API route
+# -----------------------------
+@router.post("/analyze")
+async def analyze(file: UploadFile = File(...), analyses: str = Form("plagiarism,novelty,cost"), proposal_id: str = Form("")):
+    try:
+        selected = parse_analyses(analyses)
+        if not selected:
+            return JSONResponse(content={"error": "No analyses selected"}, status_code=400)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    try:
+        async with endpoint_limit("analyze"):
+            pdf_text = await aextract_text_from_pdf(file.file, "analyze")
+            params = {"analyses": selected}
+            if "plagiarism" in selected:
+                # The local engine's answer depends on the reference corpus, as in /check-plagiarism
+                params["corpus"] = len(plagiarism_engine)
+            result = await result_store.cached("analyze", pdf_text, lambda: run_analyses(pdf_text, selected),
+                                               params, proposal_id)
+        return JSONResponse(content=result)
+    except Exception as e:
+        return gemini.error_response(e)
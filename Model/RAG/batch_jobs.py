@@ -0,0 +1,106 @@
+import os
+import re
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import JSONResponse, FileResponse
+from services.batch_runner import BatchJob, ANALYSES, parse_analyses
+from services.executor import run_in_thread
+from services.gemini import error_response
+from services.uploads import spooled
+
+router = APIRouter()
+
+# Server-side directories a job may read from (uploads of a zip are always allowed)
+INPUT_ROOT = os.path.abspath(os.getenv("BATCH_INPUT_ROOT", "data_files"))
+
+JOBS = {}   # key: job id, value: BatchJob
+TASKS = {}  # key: job id, value: asyncio.Task running it
+
+# -----------------------------
+# Helper functions
+# -----------------------------
+def get_job(job_id: str):
+    if not re.fullmatch(r"[\w-]+", job_id):
+        return None
+    if job_id not in JOBS:
+        try:
+            JOBS[job_id] = BatchJob(job_id)
+        except FileNotFoundError:
+            return None
+    return JOBS[job_id]
+
+def start(job: BatchJob, parquet: bool):
+    task = TASKS.get(job.job_id)
+    if task is not None and not task.done():
+        return False
+    TASKS[job.job_id] = asyncio.get_running_loop().create_task(job.run(parquet=parquet))
+    return True
+
+# -----------------------------
+# API routes
+# -----------------------------
+@router.post("/batch-jobs")
+async def create_batch_job(
+    file: UploadFile = File(None),
+    directory: str = Form(None),
+    analyses: str = Form(",".join(ANALYSES)),
+    parquet: bool = Form(False),
+):
+    try:
+        selected = parse_analyses(analyses)
+        if not selected:
+            return JSONResponse(content={"error": "No analyses selected"}, status_code=400)
+        if (file is None) == (directory is None):
+            return JSONResponse(content={"error": "Send either a zip file or a directory"}, status_code=400)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    try:
+        if file is not None:
+            # The zip is extracted into the job folder, so the upload itself is temporary
+            async with spooled(file, "batch-jobs", ".zip") as path:
+                job = await run_in_thread(BatchJob.create, path, selected)
+        else:
+            path = os.path.abspath(directory)
+            if os.path.commonpath([path, INPUT_ROOT]) != INPUT_ROOT:
+                return JSONResponse(content={"error": f"Directory must be inside {INPUT_ROOT}"}, status_code=400)
+            job = await run_in_thread(BatchJob.create, path, selected)
+
+        JOBS[job.job_id] = job
+        start(job, parquet)
+        return JSONResponse(content=job.status(), status_code=202)
+    except ValueError as e:
+        # Rejected zip (too large once extracted, too many entries) or not a zip
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return error_response(e)
+
+@router.post("/batch-jobs/{job_id}/resume")
+async def resume_batch_job(job_id: str, parquet: bool = Form(False)):
+    job = get_job(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"No batch job '{job_id}'"}, status_code=404)
+    if not start(job, parquet):
+        return JSONResponse(content={"error": "Job is already running"}, status_code=409)
+    return JSONResponse(content=job.status(), status_code=202)
+
+@router.get("/batch-jobs/{job_id}")
+async def batch_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"No batch job '{job_id}'"}, status_code=404)
+    status = job.status()
+    task = TASKS.get(job_id)
+    if task is not None and task.done() and task.exception() is not None:
+        status["error"] = str(task.exception())
+    return status
+
+@router.get("/batch-jobs/{job_id}/results")
+async def batch_job_results(job_id: str, format: str = "jsonl"):
+    job = get_job(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"No batch job '{job_id}'"}, status_code=404)
+    name = {"jsonl": "results.jsonl", "parquet": "results.parquet"}.get(format)
+    if name is None or not os.path.exists(os.path.join(job.folder, name)):
+        return JSONResponse(content={"error": f"No {format} results for job '{job_id}'"}, status_code=404)
+    return FileResponse(os.path.join(job.folder, name), filename=f"{job_id}_{name}")
@@ -1,28 +1,16 @@
-import os
-import PyPDF2
-import google.generativeai as genai
-from dotenv import load_dotenv
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse
-
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+from services.longdoc import map_reduce, stream_map_reduce, ndjson_response, cost_reducer
+from services.document_store import aextract_text_from_pdf
+from services.executor import endpoint_limit
+from services.gemini import error_response
+from services.result_store import store as result_store
 
 router = APIRouter()
 
 # --- Helpers ---
-def extract_text_from_pdf(file) -> str:
-    text = ""
-    reader = PyPDF2.PdfReader(file)
-    for page in reader.pages:
-        if page.extract_text():
-            text += page.extract_text() + "\n"
-    return text
-
-def cost_estimation(text: str) -> dict:
-    prompt = f"""
+def cost_prompt(text: str) -> str:
+    return f"""
     You are an AI cost estimator. Analyze the following text and provide:
     1. Estimated cost (in rupees).
     2. Breakdown of costs by category if applicable.
@@ -40,23 +28,25 @@ def cost_estimation(text: str) -> dict:
     }}
 
     Text to check:
-    {text[:4000]}
+    {text}
     """
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
-    response = model.generate_content(prompt)
 
-    import json
-    try:
-        return json.loads(response.text)
-    except Exception:
-        return {"report": "Cost found by fallback system", "percentage": response.text}
+async def cost_estimation(text: str) -> dict:
+    # Map over every chunk of the document, not just the first 4000 characters
+    return await map_reduce(text, cost_prompt, cost_reducer)
 
 # --- API Route ---
 @router.post("/check-cost")
-async def check_cost(file: UploadFile = File(...)):
+async def check_cost(file: UploadFile = File(...), stream: bool = Form(False), proposal_id: str = Form("")):
     try:
-        pdf_text = extract_text_from_pdf(file.file)
-        result = cost_estimation(pdf_text)
+        if stream:
+            # NDJSON progress: merged partial result after every chunk, then the final result
+            pdf_text = await aextract_text_from_pdf(file.file, "check-cost")
+            return ndjson_response(stream_map_reduce(pdf_text, cost_prompt, cost_reducer), endpoint_limit("check-cost"))
+        async with endpoint_limit("check-cost"):
+            pdf_text = await aextract_text_from_pdf(file.file, "check-cost")
+            result = await result_store.cached("check-cost", pdf_text, lambda: cost_estimation(pdf_text),
+                                               proposal_id=proposal_id)
         return JSONResponse(content=result)
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
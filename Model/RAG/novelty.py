@@ -1,28 +1,16 @@
-import os
-import PyPDF2
-import google.generativeai as genai
-from dotenv import load_dotenv
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse
-
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+from services.longdoc import map_reduce, stream_map_reduce, ndjson_response, percentage_reducer
+from services.document_store import aextract_text_from_pdf
+from services.executor import endpoint_limit
+from services.gemini import error_response
+from services.result_store import store as result_store
 
 router = APIRouter()
 
 # --- Helpers ---
-def extract_text_from_pdf(file) -> str:
-    text = ""
-    reader = PyPDF2.PdfReader(file)
-    for page in reader.pages:
-        if page.extract_text():
-            text += page.extract_text() + "\n"
-    return text
-
-def give_novelty_report(text: str) -> dict:
-    prompt = f"""
+def novelty_prompt(text: str) -> str:
+    return f"""
     You are an AI novelty detector. Analyze the following text and provide:
     1. Estimated novelty percentage (0-100%).
     2. List of any unique or original sections if any.
@@ -33,23 +21,27 @@ def give_novelty_report(text: str) -> dict:
     }}
 
     Text to check:
-    {text[:4000]}
+    {text}
     """
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
-    response = model.generate_content(prompt)
 
-    import json
-    try:
-        return json.loads(response.text)
-    except Exception:
-        return {"report": "Novelty found by fallback system", "percentage": response.text}
+NOVELTY_REDUCER = percentage_reducer("novelty_percentage", "unique_sections")
+
+async def give_novelty_report(text: str) -> dict:
+    # Map over every chunk of the document, not just the first 4000 characters
+    return await map_reduce(text, novelty_prompt, NOVELTY_REDUCER)
 
 # --- API Route ---
 @router.post("/check-novelty")
-async def check_novelty(file: UploadFile = File(...)):
+async def check_novelty(file: UploadFile = File(...), stream: bool = Form(False), proposal_id: str = Form("")):
     try:
-        pdf_text = extract_text_from_pdf(file.file)
-        result = give_novelty_report(pdf_text)
+        if stream:
+            # NDJSON progress: merged partial result after every chunk, then the final result
+            pdf_text = await aextract_text_from_pdf(file.file, "check-novelty")
+            return ndjson_response(stream_map_reduce(pdf_text, novelty_prompt, NOVELTY_REDUCER), endpoint_limit("check-novelty"))
+        async with endpoint_limit("check-novelty"):
+            pdf_text = await aextract_text_from_pdf(file.file, "check-novelty")
+            result = await result_store.cached("check-novelty", pdf_text, lambda: give_novelty_report(pdf_text),
+                                               proposal_id=proposal_id)
         return JSONResponse(content=result)
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
@@ -1,28 +1,26 @@
 import os
-import PyPDF2
-import google.generativeai as genai
-from dotenv import load_dotenv
-from fastapi import APIRouter, UploadFile, File
+import sys
+import argparse
+from typing import List
+from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse
-
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+from services.longdoc import map_reduce, stream_map_reduce, ndjson_response, percentage_reducer
+from services.document_store import aextract_text_from_pdf, aget_upload_text, store as document_store, kind_for_filename
+from services.executor import endpoint_limit, run_in_thread
+from services.gemini import error_response
+from services.plagiarism_engine import engine as plagiarism_engine
+from services.result_store import store as result_store
 
 router = APIRouter()
 
+# The local engine decides; Gemini is only asked for a second opinion when the
+# local score falls inside this borderline band (percent)
+LLM_BORDERLINE_LOW = float(os.getenv("PLAGIARISM_LLM_LOW", "10"))
+LLM_BORDERLINE_HIGH = float(os.getenv("PLAGIARISM_LLM_HIGH", "40"))
+
 # --- Helpers ---
-def extract_text_from_pdf(file) -> str:
-    text = ""
-    reader = PyPDF2.PdfReader(file)
-    for page in reader.pages:
-        if page.extract_text():
-            text += page.extract_text() + "\n"
-    return text
-
-def check_plagiarism_percentage(text: str) -> dict:
-    prompt = f"""
+def plagiarism_prompt(text: str) -> str:
+    return f"""
     You are an AI plagiarism detector. Analyze the following text and provide:
     1. Estimated plagiarism percentage (0-100%).
     2. List of any suspicious or copied sections if any.
@@ -33,23 +31,89 @@ def check_plagiarism_percentage(text: str) -> dict:
     }}
 
     Text to check:
-    {text[:4000]}
+    {text}
     """
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
-    response = model.generate_content(prompt)
 
-    import json
-    try:
-        return json.loads(response.text)
-    except Exception:
-        return {"report": "Plag found by fallback system", "percentage": response.text}
+PLAGIARISM_REDUCER = percentage_reducer("plagiarism_percentage", "suspicious_sections")
+
+async def check_plagiarism_percentage(text: str) -> dict:
+    # Map over every chunk of the document, not just the first 4000 characters
+    return await map_reduce(text, plagiarism_prompt, PLAGIARISM_REDUCER)
+
+def needs_llm_review(result: dict) -> bool:
+    return LLM_BORDERLINE_LOW <= result["plagiarism_percentage"] <= LLM_BORDERLINE_HIGH
+
+async def local_check(text: str) -> dict:
+    result = await run_in_thread(plagiarism_engine.check, text)
+    result["engine"] = "minhash"
+    return result
+
+async def detect_plagiarism(text: str, use_llm: bool = True) -> dict:
+    # No reference corpus ingested yet: keep the LLM-only behaviour, unless the LLM is turned off
+    if len(plagiarism_engine) == 0:
+        if not use_llm:
+            return {"plagiarism_percentage": 0, "suspicious_sections": [], "matches": [], "sources_checked": 0,
+                    "engine": "none", "note": "No reference corpus ingested and use_llm is off"}
+        return await check_plagiarism_percentage(text)
+
+    result = await local_check(text)
+    if use_llm and needs_llm_review(result):
+        result["llm_review"] = await check_plagiarism_percentage(text)
+    return result
 
 # --- API Route ---
 @router.post("/check-plagiarism")
-async def check_plagiarism(file: UploadFile = File(...)):
+async def check_plagiarism(file: UploadFile = File(...), use_llm: bool = Form(True), stream: bool = Form(False),
+                           proposal_id: str = Form("")):
     try:
-        pdf_text = extract_text_from_pdf(file.file)
-        result = check_plagiarism_percentage(pdf_text)
+        # Streaming progress only applies to the chunked LLM path; the local engine answers at once
+        if stream and use_llm and len(plagiarism_engine) == 0:
+            pdf_text = await aextract_text_from_pdf(file.file, "check-plagiarism")
+            events = stream_map_reduce(pdf_text, plagiarism_prompt, PLAGIARISM_REDUCER)
+            return ndjson_response(events, endpoint_limit("check-plagiarism"))
+        async with endpoint_limit("check-plagiarism"):
+            pdf_text = await aextract_text_from_pdf(file.file, "check-plagiarism")
+            # The local engine's answer depends on the reference corpus, so its size is part of the key
+            params = {"use_llm": use_llm, "corpus": len(plagiarism_engine)}
+            result = await result_store.cached("check-plagiarism", pdf_text, lambda: detect_plagiarism(pdf_text, use_llm),
+                                               params, proposal_id)
         return JSONResponse(content=result)
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
+
+@router.post("/plagiarism-corpus/ingest")
+async def ingest_plagiarism_corpus(files: List[UploadFile] = File(...)):
+    # Past proposals and reference papers (PDF, DOCX, TXT); the file name is the source id
+    try:
+        documents = []
+        for file in files:
+            text = await aget_upload_text(file, "plagiarism-corpus")
+            documents.append((file.filename, text))
+        async with endpoint_limit("plagiarism-ingest"):
+            summary = await run_in_thread(plagiarism_engine.add, documents)
+        return summary
+    except Exception as e:
+        return error_response(e)
+
+# --- Corpus ingest from the command line ---
+#   python -m RAG.plag path/to/reference_documents
+def main():
+    parser = argparse.ArgumentParser(description="Ingest reference documents into the local plagiarism corpus")
+    parser.add_argument("directory")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    names = []
+    for name in sorted(os.listdir(args.directory)):
+        try:
+            names.append((name, kind_for_filename(name)))
+        except ValueError:
+            continue
+    for start in range(0, len(names), args.batch_size):
+        documents = []
+        for name, kind in names[start:start + args.batch_size]:
+            documents.append((name, document_store.get_text(os.path.join(args.directory, name), kind)))
+        print(plagiarism_engine.add(documents), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+from typing import List
+from fastapi import APIRouter, UploadFile, File, Form
+from services.executor import run_in_thread, endpoint_limit
+from services.gemini import error_response
+from services.proposal_index import store as proposal_index
+from services.uploads import json_upload
+
+router = APIRouter()
+
+# -----------------------------
+# Helper functions
+# -----------------------------
+def proposal_id_for(filename: str, data: dict) -> str:
+    return str(data.get("proposal_id") or os.path.splitext(os.path.basename(filename))[0])
+
+def summary_text(fields: dict) -> str:
+    return f"{fields.get('title', '')}\n{fields.get('abstract', '')}".strip()
+
+async def rescore(query_fields: dict, matches: list, score_key: str = "score") -> list:
+    # LLM judgment only for the shortlisted matches, averaged with the embedding score
+    # like compare_json's combined score
+    from RAG.similarity_checker import gemini_scores, combined_score
+    pairs = []
+    for match in matches:
+        record = proposal_index.record(match["proposal_id"]) or {"fields": {}}
+        pairs.append((summary_text(query_fields), summary_text(record["fields"])))
+    scores = await gemini_scores(pairs)
+    for match, gem in zip(matches, scores):
+        match["gemini_score"] = gem
+        match["combined_score"] = combined_score(match[score_key], gem)
+    matches.sort(key=lambda m: m["combined_score"], reverse=True)
+    return matches
+
+# -----------------------------
+# API routes
+# -----------------------------
+@router.post("/proposals/ingest")
+async def ingest_proposals(files: List[UploadFile] = File(...)):
+    try:
+        proposals = []
+        for file in files:
+            data = await json_upload(file, "proposals")
+            proposals.append((proposal_id_for(file.filename, data), data))
+        async with endpoint_limit("proposals-ingest"):
+            summary = await run_in_thread(proposal_index.add, proposals)
+        return summary
+    except Exception as e:
+        return error_response(e)
+
+@router.post("/similar-proposals")
+async def similar_proposals(
+    file: UploadFile = File(...),
+    top_k: int = Form(10),
+    rescore_with_llm: bool = Form(False),
+):
+    try:
+        data = await json_upload(file, "similar-proposals")
+        pid = proposal_id_for(file.filename, data)
+        async with endpoint_limit("similar-proposals"):
+            matches = await run_in_thread(proposal_index.search, data, top_k, pid)
+            if rescore_with_llm and matches:
+                query_fields = {k: str(data.get(k, "")) for k in ["title", "abstract"]}
+                matches = await rescore(query_fields, matches)
+        return {"proposal_id": pid, "corpus_size": len(proposal_index), "matches": matches}
+    except Exception as e:
+        return error_response(e)
+
+# -----------------------------
+# Batch job: ingest a directory / all-pairs near-duplicate report
+#   python -m RAG.proposal_search ingest path/to/jsons
+#   python -m RAG.proposal_search report --threshold 90 --out near_duplicates.jsonl [--rescore]
+# -----------------------------
+async def rescore_pairs(pairs: list) -> list:
+    from RAG.similarity_checker import gemini_scores, combined_score
+    texts = []
+    for pair in pairs:
+        a = proposal_index.record(pair["proposal_a"])["fields"]
+        b = proposal_index.record(pair["proposal_b"])["fields"]
+        texts.append((summary_text(a), summary_text(b)))
+    # gemini_scores batches one prompt per call; keep each prompt small
+    for start in range(0, len(pairs), 20):
+        scores = await gemini_scores(texts[start:start + 20])
+        for pair, gem in zip(pairs[start:start + 20], scores):
+            pair["gemini_score"] = gem
+            pair["combined_score"] = combined_score(pair["score"], gem)
+    return pairs
+
+def main():
+    parser = argparse.ArgumentParser(description="Proposal corpus similarity tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="index every *.json file in a directory")
+    ingest.add_argument("directory")
+    ingest.add_argument("--batch-size", type=int, default=1000)
+    report = sub.add_parser("report", help="write the all-pairs near-duplicate report")
+    report.add_argument("--threshold", type=float, default=90.0)
+    report.add_argument("--k", type=int, default=20)
+    report.add_argument("--out", default="near_duplicates.jsonl")
+    report.add_argument("--rescore", action="store_true", help="re-score shortlisted pairs with Gemini")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        names = sorted(n for n in os.listdir(args.directory) if n.endswith(".json"))
+        for start in range(0, len(names), args.batch_size):
+            batch = []
+            for name in names[start:start + args.batch_size]:
+                with open(os.path.join(args.directory, name), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                batch.append((proposal_id_for(name, data), data))
+            print(proposal_index.add(batch), file=sys.stderr)
+        return
+
+    pairs = proposal_index.near_duplicates(args.threshold, args.k)
+    if args.rescore and pairs:
+        pairs = asyncio.run(rescore_pairs(pairs))
+    with open(args.out, "w", encoding="utf-8") as f:
+        for pair in pairs:
+            f.write(json.dumps(pair, ensure_ascii=False) + "\n")
+    print(f"{len(pairs)} near-duplicate pairs written to {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
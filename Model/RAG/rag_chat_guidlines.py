@@ -1,14 +1,21 @@
 import os
-import tempfile
+import time
 from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAI
+from services.gemini import GeminiLLM, error_response
 from langchain.prompts import PromptTemplate
 from langchain.chains import RetrievalQA
-from langchain.document_loaders import PyPDFLoader
+from langchain.schema import Document
+from services.executor import run_in_thread, endpoint_limit
+from services.uploads import spool_upload
+from services import pdf_text
+from services.guideline_index import store as guideline_index
+from services.embeddings import langchain_embeddings, service as embedding_service
+from services import llm_cache, tracing
+from services.streaming import sse_response, single_event, rag_events
 
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 150
@@ -16,20 +23,25 @@ CHUNK_OVERLAP = 150
 router = APIRouter()
 
 # -----------------------------
-# In-memory storage for uploaded PDFs and their FAISS indexes
+# Indexes are persisted by services/guideline_index.py; this dict only keeps
+# the LangChain wrappers for indexes already loaded by this worker.
 # -----------------------------
-INDEXES = {}  # key: filename, value: FAISS store
+INDEXES = {}  # key: filename, value: (index version, FAISS store)
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def load_pdf(file_path):
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
-    for i, d in enumerate(docs):
-        d.metadata["source"] = os.path.basename(file_path)
-        d.metadata["chunk_id"] = f"{d.metadata['source']}_page_{i}"
-    return docs
+def load_pdf(file_path, source=None):
+    # One Document per page; "page" is 0-based as PyPDFLoader had it, "headings" lists the page's section headings
+    source = source or os.path.basename(file_path)
+    return [
+        Document(
+            page_content=p["text"],
+            metadata={"source": source, "page": p["page"] - 1, "headings": " | ".join(p["headings"]),
+                      "chunk_id": f"{source}_page_{p['page'] - 1}"},
+        )
+        for p in pdf_text.extract_pages(file_path)
+    ]
 
 def chunk_documents(docs):
     splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
@@ -41,10 +53,40 @@ def chunk_documents(docs):
             chunks.append(p)
     return chunks
 
-def build_index(chunks):
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    store = FAISS.from_documents(chunks, embeddings)
-    return store
+def get_embeddings():
+    return langchain_embeddings
+
+def chunk_page(docs):
+    def _chunk(number, text):
+        return [(c.page_content, c.metadata) for c in chunk_documents([docs[number]])]
+    return _chunk
+
+def index_pdf(filename, file_path):
+    docs = load_pdf(file_path, source=filename)
+    pages = [d.page_content for d in docs]
+    return guideline_index.update(filename, pages, chunk_page(docs), get_embeddings().embed_documents)
+
+def get_store(filename):
+    # Lazily load the persisted index on first use (or after another worker updated it)
+    loaded = guideline_index.load(filename)
+    if loaded is None:
+        return None
+    index, meta = loaded
+    cached = INDEXES.get(filename)
+    if cached is None or cached[0] != meta["version"]:
+        docs = {
+            cid: Document(page_content=c["text"], metadata=c["metadata"])
+            for cid, c in meta["chunks"].items()
+        }
+        store = FAISS(
+            embedding_function=get_embeddings(),
+            index=index,
+            docstore=InMemoryDocstore(docs),
+            index_to_docstore_id={int(cid): cid for cid in docs},
+        )
+        cached = (meta["version"], store)
+        INDEXES[filename] = cached
+    return cached[1]
 
 QA_PROMPT = PromptTemplate(
     input_variables=["question", "context"],
@@ -58,11 +100,13 @@ QA_PROMPT = PromptTemplate(
     )
 )
 
+def get_llm():
+    return GeminiLLM(model="gemini-2.5-flash-lite", temperature=0)  # shared rate-limited client
+
 def make_rag_chain(store):
-    llm = GoogleGenerativeAI(model="gemini-2.5-flash-lite", temperature=0)  # updated model
     retriever = store.as_retriever(search_kwargs={"k": 5})
     qa = RetrievalQA.from_chain_type(
-        llm=llm,
+        llm=get_llm(),
         chain_type="stuff",
         retriever=retriever,
         return_source_documents=True,
@@ -80,48 +124,75 @@ async def upload_guidelines(file: UploadFile = File(...)):
         if suffix.lower() != ".pdf":
             return JSONResponse(content={"error": "Only PDF files are allowed"}, status_code=400)
 
-        # Save PDF temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
-        # Load, chunk, build index
-        docs = load_pdf(tmp_path)
-        chunks = chunk_documents(docs)
-        store = build_index(chunks)
-
-        # Save the index in memory keyed by filename
-        INDEXES[file.filename] = store
+        # Save PDF temporarily (copied to disk in chunks, never held in memory)
+        tmp_path = await spool_upload(file, "upload-guidelines", suffix)
 
-        # Cleanup PDF file
-        os.remove(tmp_path)
+        # Load, chunk and embed changed pages off the event loop, then persist to disk
+        try:
+            async with endpoint_limit("upload-guidelines"):
+                summary = await run_in_thread(index_pdf, file.filename, tmp_path)
+        finally:
+            # Cleanup PDF file
+            os.remove(tmp_path)
 
-        return {"message": f"PDF uploaded and indexed successfully as '{file.filename}'."}
+        return {
+            "message": f"PDF uploaded and indexed successfully as '{file.filename}'.",
+            **summary,
+        }
 
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
 
 # -----------------------------
 # Route 2: Ask question using uploaded PDF
 # -----------------------------
 @router.post("/ask-guidelines")
-async def ask_guidelines(filename: str = Form(...), question: str = Form(...)):
+async def ask_guidelines(filename: str = Form(...), question: str = Form(...), stream: bool = Form(False)):
     try:
         # Check if the PDF has been uploaded
-        if filename not in INDEXES:
+        store = await run_in_thread(get_store, filename)
+        if store is None:
             return JSONResponse(content={"error": f"No indexed PDF found for '{filename}'."}, status_code=404)
 
-        store = INDEXES[filename]
+        # Semantic cache: near-identical questions against the same index version reuse the answer
+        namespace = vector = None
+        if llm_cache.ENABLED and llm_cache.SEMANTIC:
+            namespace = f"guidelines:{filename}:{INDEXES[filename][0]}"
+            vector = (await embedding_service.aencode([" ".join(question.lower().split())]))[0]
+            answer = await run_in_thread(llm_cache.cache.semantic_get, namespace, vector)
+            if answer is not None:
+                result = {"filename": filename, "question": question, "answer": answer, "cached": True}
+                return sse_response(single_event("final", result)) if stream else result
+
+        if stream:
+            # Retrieved chunks are sent first, then tokens as Gemini produces them
+            async def _events():
+                start = time.perf_counter()
+                final = {"filename": filename, "question": question}
+                async for event, data in rag_events(store, question, QA_PROMPT, get_llm(), final):
+                    if event == "final" and namespace is not None:
+                        latency = time.perf_counter() - start
+                        await run_in_thread(llm_cache.cache.semantic_put, namespace, question, vector, data["answer"], latency)
+                    yield event, data
+            return sse_response(_events(), endpoint_limit("ask-guidelines"))
+
         qa = make_rag_chain(store)
 
         # Query the LLM
-        result = qa({"query": question})
+        async with endpoint_limit("ask-guidelines"):
+            start = time.perf_counter()
+            result = await qa.ainvoke({"query": question}, config={"callbacks": tracing.langchain_callbacks()})
+            latency = time.perf_counter() - start
+
+        answer = result.get("result", "")
+        if namespace is not None:
+            await run_in_thread(llm_cache.cache.semantic_put, namespace, question, vector, answer, latency)
 
         return {
             "filename": filename,
             "question": question,
-            "answer": result.get("result", "")
+            "answer": answer
         }
 
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
@@ -1,15 +1,18 @@
 import os
 import json
-import tempfile
 from fastapi import APIRouter, UploadFile, File, Form
 from fastapi.responses import JSONResponse
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAI
+from services.gemini import GeminiLLM, error_response
 from langchain.prompts import PromptTemplate
 from langchain.chains import RetrievalQA
 from langchain.schema import Document
+from services.executor import run_in_thread, endpoint_limit
+from services.uploads import spooled
+from services.embeddings import cached_langchain_embeddings
+from services.streaming import sse_response, rag_events
+from services import tracing
 
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 150
@@ -36,8 +39,9 @@ def chunk_documents(docs):
     return chunks
 
 def build_index(chunks):
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    store = FAISS.from_documents(chunks, embeddings)
+    # Chunk vectors come from the on-disk embedding cache, so repeated
+    # questions on the same JSON only pay for the LLM call
+    store = FAISS.from_documents(chunks, cached_langchain_embeddings)
     return store
 
 QA_PROMPT = PromptTemplate(
@@ -50,11 +54,13 @@ QA_PROMPT = PromptTemplate(
     )
 )
 
+def get_llm():
+    return GeminiLLM(model="gemini-2.5-flash-lite", temperature=0)  # shared rate-limited client
+
 def make_rag_chain(store):
-    llm = GoogleGenerativeAI(model="gemini-2.5-flash-lite", temperature=0)  # updated model
     retriever = store.as_retriever(search_kwargs={"k": 5})
     qa = RetrievalQA.from_chain_type(
-        llm=llm,
+        llm=get_llm(),
         chain_type="stuff",
         retriever=retriever,
         return_source_documents=True,
@@ -62,8 +68,8 @@ def make_rag_chain(store):
     )
     return qa
 
-def query_rag(qa, question: str):
-    result = qa({"query": question})
+async def query_rag(qa, question: str):
+    result = await qa.ainvoke({"query": question}, config={"callbacks": tracing.langchain_callbacks()})
     return {
         "question": question,
         "answer": result.get("result", "")
@@ -73,31 +79,36 @@ def query_rag(qa, question: str):
 # API route
 # -----------------------------
 @router.post("/ask-json")
-async def ask_json(file: UploadFile = File(...), question: str = Form(...)):
+async def ask_json(file: UploadFile = File(...), question: str = Form(...), stream: bool = Form(False)):
     try:
         # Ensure JSON file
         if not file.filename.endswith(".json"):
             return JSONResponse(content={"error": "Only JSON files are allowed"}, status_code=400)
 
-        # Save uploaded file temporarily
+        # Save uploaded file temporarily and parse it off the event loop; the copy
+        # is removed however this ends
         suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
+        async with spooled(file, "ask-json", suffix) as tmp_path:
+            doc = await run_in_thread(load_json_file, tmp_path)
 
-        # Load document, chunk, build index
-        doc = load_json_file(tmp_path)
-        chunks = chunk_documents([doc])
-        store = build_index(chunks)
-        qa = make_rag_chain(store)
+        if stream:
+            # Index build and retrieval run inside the stream; sources go out before any token
+            async def _events():
+                store = await run_in_thread(build_index, chunk_documents([doc]))
+                async for event, data in rag_events(store, question, QA_PROMPT, get_llm(), {"question": question}):
+                    yield event, data
+            return sse_response(_events(), endpoint_limit("ask-json"))
 
-        # Query the LLM
-        result = query_rag(qa, question)
+        async with endpoint_limit("ask-json"):
+            # Chunk, build index off the event loop
+            chunks = chunk_documents([doc])
+            store = await run_in_thread(build_index, chunks)
+            qa = make_rag_chain(store)
 
-        # Cleanup temp file
-        os.remove(tmp_path)
+            # Query the LLM
+            result = await query_rag(qa, question)
 
         return result
 
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
@@ -1,81 +1,129 @@
 import os
+import re
 import json
-import torch
-from torch.nn.functional import cosine_similarity
-from transformers import pipeline
-from dotenv import load_dotenv
-from fastapi import APIRouter, UploadFile, File
-from fastapi.responses import JSONResponse
-from langchain_google_genai import GoogleGenerativeAI
+import asyncio
+import numpy as np
+from fastapi import APIRouter, UploadFile, File, Form
+from services.gemini import error_response
+from services.executor import run_in_thread, endpoint_limit
+from services.embeddings import encode_cached
+from services.llm_backends import backend_for
+from services.result_store import store as result_store
+from services.uploads import json_upload
 
-# -----------------------------
-# Load environment variables
-# -----------------------------
-load_dotenv()
-
-embedding_model = pipeline("feature-extraction", model="sentence-transformers/all-MiniLM-L6-v2")
-llm = GoogleGenerativeAI(model="gemini-2.5-flash-lite")
+MODEL_NAME = "gemini-2.5-flash-lite"
+# Per-pair Gemini calls allowed in flight when the batched judgment cannot be parsed
+GEMINI_CONCURRENCY = int(os.getenv("COMPARE_GEMINI_CONCURRENCY", "4"))
+# Output shapes, used to constrain decoding on the local backend (LLM_BACKEND_COMPARE_JSON=local)
+SCORE_SCHEMA = {"type": "number"}
+SCORES_SCHEMA = {"type": "array", "items": {"type": "number"}}
 
 router = APIRouter()
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def fetch_json_from_file(file) -> dict:
-    return json.load(file)
-
 def get_embedding(text: str):
-    output = embedding_model(text, truncation=True, padding=True)
-    tensor = torch.tensor(output[0])
-    return tensor.mean(dim=0)
+    return encode_cached([text])[0]
 
 def miniLM_score(text1: str, text2: str) -> float:
-    emb1, emb2 = get_embedding(text1), get_embedding(text2)
-    sim = cosine_similarity(emb1.unsqueeze(0), emb2.unsqueeze(0))
-    return sim.item() * 100
+    emb1, emb2 = encode_cached([text1, text2])
+    sim = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2) + 1e-12)
+    return float(sim) * 100
 
-def gemini_score(text1: str, text2: str) -> float:
+def parse_score(response: str) -> float:
+    try:
+        score = float(response.strip())
+    except ValueError:
+        m = re.search(r"\d+(\.\d+)?", response)
+        score = float(m.group(0)) if m else 0.0
+    return max(0.0, min(score, 100.0))
+
+async def gemini_score(text1: str, text2: str) -> float:
     prompt = (
         "Read the following two sentences and determine if they express the same idea.\n"
         "Return a number between 0 and 100 indicating similarity.\n"
         f"Sentence A: {text1}\nSentence B: {text2}\nAnswer with just a number."
     )
-    response = llm.invoke(prompt)
+    response = await backend_for("compare-json").generate(MODEL_NAME, prompt, SCORE_SCHEMA)
+    return parse_score(response)
+
+# -----------------------------
+# Batched scoring for whole documents
+# -----------------------------
+def miniLM_scores(texts1: list, texts2: list) -> np.ndarray:
+    # One forward pass over both documents (MiniLM mean-pools with the attention
+    # mask), then every field pair's cosine similarity in a single matrix op
+    vectors = encode_cached(texts1 + texts2)
+    a, b = vectors[:len(texts1)], vectors[len(texts1):]
+    a = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-12)
+    b = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-12)
+    return (a * b).sum(axis=1) * 100
+
+def scores_prompt(pairs: list) -> str:
+    numbered = "\n".join(
+        f"{i + 1}. Sentence A: {text1}\n   Sentence B: {text2}" for i, (text1, text2) in enumerate(pairs)
+    )
+    return (
+        "For each numbered pair below, determine if the two sentences express the same idea.\n"
+        "Give a number between 0 and 100 indicating similarity for every pair.\n"
+        f"{numbered}\n"
+        f"Answer with ONLY a JSON array of {len(pairs)} numbers, in the same order."
+    )
+
+def parse_scores(response: str, count: int):
+    # List of `count` clamped scores, or None if the reply is not such a JSON array
+    match = re.search(r"\[.*\]", response or "", re.DOTALL)
     try:
-        score = float(response.strip())
-    except:
-        import re
-        m = re.search(r"\d+(\.\d+)?", response.text)
-        score = float(m.group(0)) if m else 0.0
-    return max(0.0, min(score, 100.0))
+        scores = json.loads(match.group(0)) if match else None
+        if isinstance(scores, list) and len(scores) == count:
+            return [max(0.0, min(float(s), 100.0)) for s in scores]
+    except (ValueError, TypeError):
+        pass
+    return None
+
+async def gemini_scores(pairs: list) -> list:
+    # All field pairs are judged in one prompt; if the reply cannot be parsed,
+    # fall back to per-pair calls with at most GEMINI_CONCURRENCY in flight
+    if not pairs:
+        return []
+    response = await backend_for("compare-json").generate(MODEL_NAME, scores_prompt(pairs), SCORES_SCHEMA)
+    scores = parse_scores(response, len(pairs))
+    if scores is not None:
+        return scores
+
+    semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+    async def _one(text1, text2):
+        async with semaphore:
+            return await gemini_score(text1, text2)
+    return list(await asyncio.gather(*(_one(t1, t2) for t1, t2 in pairs)))
 
 def combined_score(mini_score: float, gem_score: float) -> float:
     return (mini_score + gem_score) / 2
 
-def compare_json(json1: dict, json2: dict):
-    total_score, count = 0, 0
+async def compare_json(json1: dict, json2: dict):
+    keys = [key for key in json1 if key in json2]
+    texts1 = [str(json1[key]) for key in keys]
+    texts2 = [str(json2[key]) for key in keys]
+
+    mini_scores, gem_scores = await asyncio.gather(
+        run_in_thread(miniLM_scores, texts1, texts2),
+        gemini_scores(list(zip(texts1, texts2))),
+    )
+
     details = []
-    
-    for key in json1.keys() & json2.keys():
-        text1, text2 = str(json1[key]), str(json2[key])
-        
-        mini_score_val = miniLM_score(text1, text2)
-        gem_score_val = gemini_score(text1, text2)
-        final_score_val = combined_score(mini_score_val, gem_score_val)
-        
-        total_score += final_score_val
-        count += 1
-        
+    for key, text1, text2, mini_score_val, gem_score_val in zip(keys, texts1, texts2, mini_scores, gem_scores):
+        mini_score_val = float(mini_score_val)
         details.append({
             "key": key,
             "text1": text1,
             "text2": text2,
             "miniLM_score": mini_score_val,
             "gemini_score": gem_score_val,
-            "combined_score": final_score_val
+            "combined_score": combined_score(mini_score_val, gem_score_val)
         })
-    
-    overall_score = total_score / count if count > 0 else 0
+
+    overall_score = sum(d["combined_score"] for d in details) / len(details) if details else 0
     return {
         "overall_score": overall_score,
         "details": details
@@ -85,11 +133,13 @@ def compare_json(json1: dict, json2: dict):
 # API route
 # -----------------------------
 @router.post("/compare-json")
-async def compare_json_files(file1: UploadFile = File(...), file2: UploadFile = File(...)):
+async def compare_json_files(file1: UploadFile = File(...), file2: UploadFile = File(...), proposal_id: str = Form("")):
     try:
-        json1 = fetch_json_from_file(file1.file)
-        json2 = fetch_json_from_file(file2.file)
-        result = compare_json(json1, json2)
+        json1 = await json_upload(file1, "compare-json")
+        json2 = await json_upload(file2, "compare-json")
+        async with endpoint_limit("compare-json"):
+            result = await result_store.cached("compare-json", [json1, json2], lambda: compare_json(json1, json2),
+                                               proposal_id=proposal_id)
         return result
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
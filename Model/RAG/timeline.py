@@ -1,31 +1,18 @@
-import os
-from dotenv import load_dotenv
-import PyPDF2
-import google.generativeai as genai
-from fastapi import APIRouter, UploadFile, File
-from fastapi.responses import JSONResponse
-
-# -----------------------------
-# Load environment variables
-# -----------------------------
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+import json
+from fastapi import APIRouter, UploadFile, File, Form
+from services.document_store import aextract_text_from_pdf
+from services.longdoc import map_reduce, stream_map_reduce, ndjson_response, timeline_reducer
+from services.executor import endpoint_limit
+from services.gemini import error_response
+from services.result_store import store as result_store
 
 router = APIRouter()
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def extract_text_from_pdf(file) -> str:
-    text = ""
-    reader = PyPDF2.PdfReader(file)
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
-
-def generate_timeline(text: str):
-    prompt = f"""
+def timeline_prompt(text: str) -> str:
+    return f"""
     You are an AI timeline generator. Analyze the following text and provide:
     1. A timeline of events mentioned in the text.
     2. Key dates and their corresponding events.
@@ -42,20 +29,26 @@ def generate_timeline(text: str):
     Text to analyze:
     {text}
     """
-    # Use a valid model version
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
-    response = model.generate_content(prompt)
-    return response.text
+
+async def generate_timeline(text: str):
+    # Each chunk is prompted separately; events are merged, deduplicated and sorted by date
+    result = await map_reduce(text, timeline_prompt, timeline_reducer)
+    return json.dumps(result, ensure_ascii=False)
 
 
 # -----------------------------
 # API route
 # -----------------------------
 @router.post("/timeline")
-async def pdf_timeline(file: UploadFile = File(...)):
+async def pdf_timeline(file: UploadFile = File(...), stream: bool = Form(False), proposal_id: str = Form("")):
     try:
-        text = extract_text_from_pdf(file.file)
-        result = generate_timeline(text)
+        if stream:
+            # NDJSON progress: merged partial timeline after every chunk, then the final one
+            text = await aextract_text_from_pdf(file.file, "timeline")
+            return ndjson_response(stream_map_reduce(text, timeline_prompt, timeline_reducer), endpoint_limit("timeline"))
+        async with endpoint_limit("timeline"):
+            text = await aextract_text_from_pdf(file.file, "timeline")
+            result = await result_store.cached("timeline", text, lambda: generate_timeline(text), proposal_id=proposal_id)
         return {"timeline_json": result}
     except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        return error_response(e)
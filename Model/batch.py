@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from dotenv import load_dotenv
+from services.batch_runner import BatchJob, ANALYSES, parse_analyses
+
+# -----------------------------
+# Batch processing from the command line (same engine as POST /batch-jobs)
+# -----------------------------
+#   python batch.py submissions/ --analyses plagiarism,novelty,cost --parquet
+#   python batch.py submissions.zip --job-id cycle-2025-1
+#   python batch.py --resume cycle-2025-1        # continue after a crash or Ctrl+C
+def print_progress(job: BatchJob):
+    print(f"[{job.job_id}] {job.processed}/{job.total} processed, {job.failed} not ok", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run analyses over a directory or zip of proposals")
+    parser.add_argument("source", nargs="?", help="directory or zip of PDF/DOCX/TXT files")
+    parser.add_argument("--analyses", default=",".join(ANALYSES), help=f"comma separated: {', '.join(ANALYSES)}")
+    parser.add_argument("--job-id", help="name for a new job (default: random)")
+    parser.add_argument("--resume", metavar="JOB_ID", help="continue an existing job from its checkpoint")
+    parser.add_argument("--parquet", action="store_true", help="also write results.parquet (needs pandas + pyarrow)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.resume:
+        job = BatchJob(args.resume)
+    elif args.source:
+        job = BatchJob.create(args.source, parse_analyses(args.analyses), job_id=args.job_id)
+    else:
+        parser.error("give a source directory/zip or --resume JOB_ID")
+
+    print(f"[{job.job_id}] {job.total} documents, analyses: {', '.join(job.config['analyses'])}", file=sys.stderr)
+    summary = asyncio.run(job.run(parquet=args.parquet, progress=print_progress))
+    print(json.dumps(summary, indent=2))
+    print(f"[{job.job_id}] throughput: {summary['docs_per_minute']} documents/minute", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from RAG import similarity_checker
+from services.embeddings import service as embedding_service
+
+# -----------------------------
+# Per-comparison latency: field-by-field loop vs batched compare_json
+# -----------------------------
+# Gemini is replaced by a fake with a fixed round-trip delay so only our side
+# of the work (embedding passes, number of LLM round trips) is measured.
+FIELDS = [
+    "title", "author", "affiliation", "abstract", "keywords", "introduction", "methodology",
+    "results", "discussion", "conclusion", "references", "timeline", "research_needs",
+    "funding_sources", "collaborating_institutions",
+]
+
+class FakeLLM:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        pairs = prompt.count("Sentence A:")
+        return "72" if pairs == 1 else json.dumps([72] * pairs)
+
+def make_proposal(seed):
+    return {f: f"{f} of proposal {seed}: coal gasification pilot with carbon capture, variant {seed}" for f in FIELDS}
+
+async def old_compare(json1, json2):
+    # The previous implementation: two embeddings and one LLM call per field, sequentially
+    details = []
+    for key in json1.keys() & json2.keys():
+        text1, text2 = str(json1[key]), str(json2[key])
+        emb1, emb2 = embedding_service.encode([text1])[0], embedding_service.encode([text2])[0]
+        mini = float(emb1 @ emb2 / (np.linalg.norm(emb1) * np.linalg.norm(emb2))) * 100
+        gem = await similarity_checker.gemini_score(text1, text2)
+        details.append(similarity_checker.combined_score(mini, gem))
+    return sum(details) / len(details)
+
+async def run(rounds, latency):
+    fake = FakeLLM(latency)
+    similarity_checker.llm = fake
+    # Bypass the disk cache so both paths pay for their embedding passes
+    similarity_checker.encode_cached = embedding_service.encode
+    results = {}
+    for label, fn in [("before", old_compare), ("after", similarity_checker.compare_json)]:
+        fake.calls = 0
+        await fn(make_proposal(-1), make_proposal(-2))  # warm-up (model load)
+        fake.calls = 0
+        start = time.perf_counter()
+        for i in range(rounds):
+            await fn(make_proposal(2 * i), make_proposal(2 * i + 1))
+        elapsed = time.perf_counter() - start
+        results[label] = {
+            "ms_per_comparison": elapsed / rounds * 1000,
+            "llm_calls_per_comparison": fake.calls / rounds,
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="compare_json latency benchmark")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake Gemini round trip in seconds")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rounds, args.llm_latency)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# -----------------------------
+# Embeddings/sec and peak RSS: old per-call model loads vs the shared service
+# -----------------------------
+# Each mode runs in its own subprocess so RSS numbers do not bleed into each other.
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+def sample_texts(n):
+    return [f"Proposal section {i}: pilot-scale coal gasification with carbon capture, phase {i % 7}." for i in range(n)]
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_old(texts, calls):
+    # What the routers used to do: a fresh HuggingFaceEmbeddings per request,
+    # plus the transformers pipeline from similarity_checker embedding one text at a time.
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from transformers import pipeline
+    import torch
+
+    pipe = pipeline("feature-extraction", model=MODEL)
+    start = time.perf_counter()
+    for _ in range(calls):
+        HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2").embed_documents(texts)
+    for t in texts:
+        torch.tensor(pipe(t, truncation=True, padding=True)[0]).mean(dim=0)
+    return time.perf_counter() - start, calls * len(texts) + len(texts)
+
+def run_new(texts, calls):
+    from services.embeddings import service
+    service.encode(texts[:1])  # model load is paid once at warm-up
+    start = time.perf_counter()
+    for _ in range(calls):
+        service.encode(texts)
+    service.encode(texts)
+    return time.perf_counter() - start, calls * len(texts) + len(texts)
+
+def child(mode, n, calls):
+    texts = sample_texts(n)
+    seconds, count = (run_old if mode == "old" else run_new)(texts, calls)
+    print(json.dumps({
+        "mode": mode,
+        "embeddings": count,
+        "seconds": seconds,
+        "embeddings_per_sec": count / seconds if seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput and memory benchmark")
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--mode", choices=["old", "new"])
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.texts, args.calls)
+        return
+
+    results = []
+    for mode in ["old", "new"]:
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--texts", str(args.texts), "--calls", str(args.calls)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# -----------------------------
+# Local stand-in for the Gemini REST API
+# -----------------------------
+# Answers generateContent and streamGenerateContent?alt=sse after a configurable
+# delay, and fails a configurable share of requests with 429/503 so retries and
+# the circuit breaker can be exercised offline:
+#   python benchmarks/fake_gemini.py --port 8089 --latency 0.3 --error-rate 0.2
+#   GEMINI_API_ENDPOINT=http://127.0.0.1:8089 python main.py
+# Prompts of the app's analyses get canned replies of the shape each parser
+# expects (--canned adds or overrides them: a JSON object of regex -> reply);
+# anything else gets an echo of the prompt.
+# GET /stats returns how many requests actually reached the "model".
+LATENCY = float(os.getenv("FAKE_GEMINI_LATENCY", "0.2"))
+ERROR_RATE = float(os.getenv("FAKE_GEMINI_ERROR_RATE", "0.0"))
+ERROR_CODES = [429, 503]
+STREAM_CHUNKS = 8
+
+# Sections of the combined /analyze prompt
+SECTIONS = {
+    "plagiarism": {"plagiarism_percentage": 12, "suspicious_sections": ["The proposed methodology builds on prior work."]},
+    "novelty": {"novelty_percentage": 64, "unique_sections": ["A new evaluation protocol for the pilot study."]},
+    "cost": {"estimated_cost": 1850000, "cost_breakdown": {"equipment": 900000, "manpower": 650000, "travel": 300000}},
+}
+# (regex on the prompt, reply), first match wins
+CANNED = [
+    (r"return ONLY valid JSON", {
+        "title": "Synthetic proposal", "author": "A. Researcher", "affiliation": "Institute of Technology",
+        "abstract": "A synthetic abstract.", "keywords": ["benchmark", "proposal"], "introduction": "...",
+        "methodology": "...", "results": "...", "discussion": "...", "conclusion": "...", "references": [],
+        "timeline": "24 months", "research_needs": ["compute"], "funding_sources": ["government"],
+        "collaborating_institutions": ["Partner University"],
+    }),
+    (r"You are an AI plagiarism detector", SECTIONS["plagiarism"]),
+    (r"You are an AI novelty detector", SECTIONS["novelty"]),
+    (r"You are an AI cost estimator", SECTIONS["cost"]),
+    (r"You are an AI timeline generator", {"timeline": [
+        {"date": "2025-04-01", "event": "Project start"},
+        {"date": "2026-03-31", "event": "Final report"},
+    ]}),
+    (r"You are an expert proposal reviewer", [{"line": 1, "message": "Sentence is too long"}]),
+]
+
+app = FastAPI()
+counts = {"requests": 0, "errors": 0}
+
+def prompt_text(body: dict) -> str:
+    return " ".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+
+def answer_for(prompt: str) -> str:
+    # Prompts asking for JSON get JSON of the requested shape so parsers downstream are exercised
+    for pattern, reply in CANNED:
+        if re.search(pattern, prompt):
+            return reply if isinstance(reply, str) else json.dumps(reply)
+    if "AI proposal analyst" in prompt:
+        return json.dumps({name: reply for name, reply in SECTIONS.items() if f'"{name}": {{' in prompt})
+    scores = re.search(r"JSON array of (\d+) numbers", prompt)
+    if scores:
+        return json.dumps([50] * int(scores.group(1)))
+    if "JSON array" in prompt:
+        return "[]"
+    if "JSON" in prompt:
+        return json.dumps({"echo": prompt[:80]})
+    return f"Answer to: {prompt[:200]}"
+
+def payload(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+def maybe_fail():
+    counts["requests"] += 1
+    if random.random() < ERROR_RATE:
+        counts["errors"] += 1
+        status = random.choice(ERROR_CODES)
+        return JSONResponse({"error": {"code": status, "message": "injected failure"}}, status_code=status)
+    return None
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    body = await request.json()
+    await asyncio.sleep(LATENCY)
+    return maybe_fail() or payload(answer_for(prompt_text(body)))
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def stream_generate_content(model: str, request: Request):
+    body = await request.json()
+    await asyncio.sleep(LATENCY / 2)
+    failure = maybe_fail()
+    if failure is not None:
+        return failure
+    text = answer_for(prompt_text(body))
+    size = max(1, len(text) // STREAM_CHUNKS + 1)
+
+    async def _events():
+        for i in range(0, len(text), size):
+            await asyncio.sleep(LATENCY / 2 / STREAM_CHUNKS)
+            yield f"data: {json.dumps(payload(text[i:i + size]))}\n\n"
+
+    return StreamingResponse(_events(), media_type="text/event-stream")
+
+@app.get("/stats")
+def stats():
+    return counts
+
+def main():
+    global LATENCY, ERROR_RATE, ERROR_CODES
+    parser = argparse.ArgumentParser(description="Fake Gemini REST server for offline tests")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="share of requests answered with an error")
+    parser.add_argument("--error-codes", default="429,503", help="statuses injected failures use, e.g. 429")
+    parser.add_argument("--canned", help="JSON file of {prompt regex: reply}, checked before the built-in replies")
+    args = parser.parse_args()
+    LATENCY, ERROR_RATE = args.latency, args.error_rate
+    ERROR_CODES = [int(code) for code in args.error_codes.split(",")]
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            CANNED[:0] = list(json.load(f).items())
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.gemini import GeminiClient, LLMUnavailable  # noqa: E402
+
+# -----------------------------
+# Shared Gemini client against the local fake server
+# -----------------------------
+# Starts benchmarks/fake_gemini.py on --port and compares a bare client
+# (no limits, retries or coalescing) with the shared client on:
+#   duplicates  many callers sending the same prompt at once
+#   flaky       distinct prompts with a share of 429/503 answers
+#   outage      every request fails; the breaker should stop hammering the server
+#   python benchmarks/gemini_client_bench.py --requests 200 --error-rate 0.2
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = "gemini-2.5-flash-lite"
+
+def start_server(port: int, latency: float, error_rate: float):
+    server = subprocess.Popen(
+        [sys.executable, "benchmarks/fake_gemini.py", "--port", str(port),
+         "--latency", str(latency), "--error-rate", str(error_rate)],
+        cwd=MODEL_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1.0)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.05)
+    server.terminate()
+    raise RuntimeError("fake Gemini server did not start")
+
+async def run_calls(client: GeminiClient, prompts: list) -> dict:
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(client.generate(MODEL, p) for p in prompts), return_exceptions=True)
+    failed = [o for o in outcomes if isinstance(o, Exception)]
+    return {
+        "callers": len(prompts),
+        "succeeded": len(prompts) - len(failed),
+        "failed_fast": sum(isinstance(o, LLMUnavailable) and "circuit" in str(o) for o in failed),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+def scenario(name: str, port: int, latency: float, error_rate: float, prompts: list, **client_kwargs) -> dict:
+    server = start_server(port, latency, error_rate)
+    try:
+        client = GeminiClient(endpoint=f"http://127.0.0.1:{port}", **client_kwargs)
+        result = asyncio.run(run_calls(client, prompts))
+        upstream = httpx.get(f"http://127.0.0.1:{port}/stats").json()
+    finally:
+        server.terminate()
+        server.wait()
+    return {"scenario": name, **result, "upstream_requests": upstream["requests"], "client_stats": client.stats()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Retry / coalescing / breaker behaviour of the shared Gemini client")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    duplicates = ["Summarize the eligibility rules."] * args.requests
+    distinct = [f"Question {i}: summarize section {i}." for i in range(args.requests)]
+    report = []
+    for label, kwargs in (("bare", {"max_retries": 0, "rpm": 0, "tpm": 0, "coalesce": False}), ("shared", {})):
+        report.append({"client": label, **scenario("duplicates", args.port, args.latency, 0.0, duplicates, **kwargs)})
+        report.append({"client": label, **scenario("flaky", args.port, args.latency, args.error_rate, distinct, **kwargs)})
+        report.append({"client": label, **scenario("outage", args.port, args.latency, 1.0, distinct, **kwargs)})
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
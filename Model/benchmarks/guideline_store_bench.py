@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.guideline_index import GuidelineIndexStore
+
+# -----------------------------
+# Startup and first-query latency with many stored guideline sets
+# -----------------------------
+# Uses random vectors in place of MiniLM so only the store itself is measured.
+DIM = 384
+
+def fake_embed(texts):
+    rng = np.random.default_rng(len(texts))
+    return rng.random((len(texts), DIM), dtype=np.float32)
+
+def chunk_page(number, text):
+    return [(f"{text} chunk {i}", {"page": number}) for i in range(4)]
+
+def populate(root, sets, pages):
+    store = GuidelineIndexStore(root)
+    for i in range(sets):
+        store.update(f"guidelines_{i}.pdf", [f"set {i} page {p}" for p in range(pages)], chunk_page, fake_embed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Guideline index store startup benchmark")
+    parser.add_argument("--sets", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="guideline_bench_")
+    try:
+        start = time.perf_counter()
+        populate(root, args.sets, args.pages)
+        populate_s = time.perf_counter() - start
+
+        # Simulates a fresh worker: nothing is loaded until the first question
+        start = time.perf_counter()
+        store = GuidelineIndexStore(root)
+        startup_s = time.perf_counter() - start
+
+        query = fake_embed(["q"])
+        start = time.perf_counter()
+        index, meta = store.load("guidelines_0.pdf")
+        index.search(query, 5)
+        first_query_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index, meta = store.load("guidelines_0.pdf")
+        index.search(query, 5)
+        warm_query_s = time.perf_counter() - start
+
+        # Revision with one changed page re-embeds only that page
+        pages = [f"set 0 page {p}" for p in range(args.pages)]
+        pages[3] = "set 0 page 3 revised"
+        start = time.perf_counter()
+        summary = store.update("guidelines_0.pdf", pages, chunk_page, fake_embed)
+        update_s = time.perf_counter() - start
+
+        print(json.dumps({
+            "sets": args.sets,
+            "pages_per_set": args.pages,
+            "populate_seconds": populate_s,
+            "startup_ms": startup_s * 1000,
+            "first_query_ms": first_query_s * 1000,
+            "warm_query_ms": warm_query_s * 1000,
+            "incremental_update_ms": update_s * 1000,
+            "incremental_update": summary,
+        }, indent=2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# -----------------------------
+# Latency, throughput and JSON validity per LLM backend
+# -----------------------------
+# Runs the two tasks meant for the local backend with the app's own prompts:
+#   score     compare-json batched similarity grading (RAG/similarity_checker.py)
+#   validate  one /validateProposal section check (live_checker/online_checker.py)
+# e.g.
+#   LOCAL_LLM_PATH=models/qwen2.5-0.5b-instruct-q4_k_m.gguf \
+#   python benchmarks/llm_backend_bench.py --backends gemini,local --proposal proposal.txt
+# Gemini needs GEMINI_API_KEY (or GEMINI_API_ENDPOINT pointing at benchmarks/fake_gemini.py).
+# The LLM response cache is bypassed so every request reaches the backend.
+PAIRS = [
+    ("Develop low-cost catalysts for coal gasification.", "Design cheaper catalysts to gasify Indian coal."),
+    ("Pilot plant validation in Phase 3.", "The third phase validates the process at pilot scale."),
+    ("Funding from the Clean Energy Mission.", "Partnership with international climate funds."),
+    ("Reduce CO2 emissions by 20 percent.", "Improve the tensile strength of steel alloys."),
+]
+SAMPLE_SECTION = """Abstract
+This projcet aims to develop a low cost catalyst for coal gasification in india.
+We will test the catalyst in lab and then in a pilot plant.
+The results wil help reduce emisions and improve energy security."""
+
+def section_texts(path: str) -> list:
+    if not path:
+        return [SAMPLE_SECTION]
+    with open(path, "r", encoding="utf-8") as f:
+        return [f.read()]
+
+def valid_issues(text: str) -> bool:
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    try:
+        issues = json.loads(match.group(0)) if match else None
+    except json.JSONDecodeError:
+        return False
+    return isinstance(issues, list) and all(isinstance(i, dict) and "line" in i and "message" in i for i in issues)
+
+async def run_task(backend, requests: list, concurrency: int) -> dict:
+    # requests: [(model, prompt, schema, is_valid)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, valid, errors = [], 0, 0
+
+    async def _one(model, prompt, schema, is_valid):
+        nonlocal valid, errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                text = await backend.generate(model, prompt, schema)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            valid += bool(is_valid(text))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(*r) for r in requests))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "p50_seconds": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_seconds": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+        "requests_per_minute": round(len(latencies) / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        "json_valid_rate": round(valid / len(requests), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM backends on compare-json and validateProposal prompts")
+    parser.add_argument("--backends", default="gemini,local")
+    parser.add_argument("--requests", type=int, default=20, help="requests per task and backend")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--proposal", help="text file used as the section to validate")
+    args = parser.parse_args()
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    # online_checker refuses to import without a Gemini key unless its backend is local
+    if "gemini" not in backends:
+        os.environ.setdefault("LLM_BACKEND_VALIDATE_PROPOSAL", "local")
+    from services.llm_backends import get_backend
+    from RAG import similarity_checker
+    from live_checker import online_checker
+
+    section = online_checker.split_sections(section_texts(args.proposal)[0])[0]
+    validate_prompt = online_checker.build_section_prompt(section, [])
+    report = []
+    # One loop for all runs: the shared Gemini client binds its buckets and HTTP pool to it
+    loop = asyncio.new_event_loop()
+    for name in backends:
+        backend = get_backend(name)
+        if name == "local":
+            start = time.perf_counter()
+            backend.warm()
+            load_seconds = round(time.perf_counter() - start, 2)
+        else:
+            load_seconds = 0.0
+        # Distinct prompts per request, so neither coalescing nor any cache can answer
+        score_requests = [
+            (similarity_checker.MODEL_NAME, similarity_checker.scores_prompt(PAIRS) + f"\n(request {i})",
+             similarity_checker.SCORES_SCHEMA,
+             lambda text: similarity_checker.parse_scores(text, len(PAIRS)) is not None)
+            for i in range(args.requests)
+        ]
+        validate_requests = [
+            (online_checker.MODEL_NAME, validate_prompt + f"\n(request {i})", online_checker.ISSUES_SCHEMA, valid_issues)
+            for i in range(args.requests)
+        ]
+        for task, requests in (("score", score_requests), ("validate", validate_requests)):
+            result = loop.run_until_complete(run_task(backend, requests, args.concurrency))
+            report.append({"backend": name, "model": backend.cache_model(requests[0][0]), "task": task,
+                           "load_seconds": load_seconds, **result})
+    loop.close()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
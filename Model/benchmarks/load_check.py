@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+# -----------------------------
+# Concurrent load against the /check-* endpoints
+# -----------------------------
+# Start the server first (python main.py), then run e.g.
+#   python benchmarks/load_check.py --pdf data_files/yescape.pdf --label after
+# Run it once on the old commit with --label before to compare.
+ENDPOINTS = ["/check-plagiarism", "/check-novelty", "/check-cost"]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+async def one_request(client, endpoint, pdf_bytes, filename):
+    start = time.perf_counter()
+    files = {"file": (filename, pdf_bytes, "application/pdf")}
+    response = await client.post(endpoint, files=files)
+    return endpoint, response.status_code, time.perf_counter() - start
+
+async def run(base_url, pdf_path, concurrency, timeout):
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    filename = os.path.basename(pdf_path)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        tasks = [
+            one_request(client, ENDPOINTS[i % len(ENDPOINTS)], pdf_bytes, filename)
+            for i in range(concurrency)
+        ]
+        start = time.perf_counter()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        wall = time.perf_counter() - start
+
+    latencies, errors = [], 0
+    for r in results:
+        if isinstance(r, Exception) or r[1] != 200:
+            errors += 1
+        if not isinstance(r, Exception):
+            latencies.append(r[2])
+
+    return {
+        "requests": concurrency,
+        "errors": errors,
+        "wall_seconds": wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="p50/p99 latency under concurrent /check-* load")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--pdf", default="data_files/yescape.pdf")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--label", default="run")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.pdf, args.concurrency, args.timeout))
+    report["label"] = args.label
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import fitz  # PyMuPDF, also used to build the synthetic corpus
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import pdf_text  # noqa: E402
+
+# -----------------------------
+# PDF extraction: PyPDF2 vs PyMuPDF (serial and page-parallel)
+# -----------------------------
+# Synthetic proposals are generated with known text and headings, so quality is
+# measured as word recall and heading precision/recall against the truth. A real
+# corpus (--corpus dir) has no truth, so its quality column is agreement with
+# PyMuPDF's words instead.
+#   python benchmarks/pdf_extract_bench.py --synthetic 20 --pages 80
+#   python benchmarks/pdf_extract_bench.py --corpus data_files/proposals --workers 8
+SECTIONS = ["Abstract", "Introduction", "Objectives", "Methodology", "Expected Results",
+            "Budget Justification", "Timeline", "References"]
+WORDS = ("catalyst reactor coal gasification emission capture pilot plant efficiency process "
+         "design validation cost energy security policy analysis laboratory scale sensor data").split()
+
+def build_proposal(path: str, pages: int, rng: random.Random) -> dict:
+    doc = fitz.open()
+    words, headings = [], []
+    for number in range(pages):
+        page = doc.new_page()
+        y = 72
+        if number % 2 == 0:
+            heading = f"{number // 2 + 1}. {SECTIONS[(number // 2) % len(SECTIONS)]}"
+            page.insert_text((72, y), heading, fontsize=15, fontname="hebo")
+            headings.append(heading)
+            words.extend(heading.split())
+            y += 28
+        while y < 760:
+            line = " ".join(rng.choice(WORDS) for _ in range(11)) + "."
+            page.insert_text((72, y), line, fontsize=10)
+            words.extend(line.split())
+            y += 14
+    doc.save(path)
+    return {"words": words, "headings": headings}
+
+def word_recall(truth: list, text: str) -> float:
+    found = Counter(text.split())
+    expected = Counter(truth)
+    return sum(min(n, found[w]) for w, n in expected.items()) / max(1, sum(expected.values()))
+
+def heading_scores(truth: list, found: list) -> tuple:
+    truth_set, found_set = set(truth), set(found)
+    hits = len(truth_set & found_set)
+    return hits / max(1, len(found_set)), hits / max(1, len(truth_set))
+
+def configure(engine: str, workers: int):
+    pdf_text.ENGINE = "pypdf2" if engine == "pypdf2" else "pymupdf"
+    pdf_text.WORKERS = workers if engine == "pymupdf-parallel" else 1
+    pdf_text.PARALLEL_MIN_PAGES = 1 if engine == "pymupdf-parallel" else 10 ** 9
+
+def run(engine: str, files: list, truths: dict, reference: dict, workers: int) -> dict:
+    configure(engine, workers)
+    if engine == "pymupdf-parallel":
+        pdf_text.extract_pages(files[0])  # start the pool outside the timing
+    pages, recall, precision, heading_recall = 0, [], [], []
+    start = time.perf_counter()
+    outputs = {path: pdf_text.extract_pages(path) for path in files}
+    elapsed = time.perf_counter() - start
+    for path, extracted in outputs.items():
+        pages += len(extracted)
+        text = " ".join(p["text"] for p in extracted)
+        found = [h for p in extracted for h in p["headings"]]
+        if path in truths:
+            recall.append(word_recall(truths[path]["words"], text))
+            p, r = heading_scores(truths[path]["headings"], found)
+            precision.append(p)
+            heading_recall.append(r)
+        elif path in reference:
+            recall.append(word_recall(reference[path].split(), text))
+    mean = lambda xs: round(sum(xs) / len(xs), 3) if xs else None
+    return {
+        "engine": engine,
+        "files": len(files),
+        "pages": pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 1) if elapsed > 0 else None,
+        "word_recall": mean(recall),
+        "heading_precision": mean(precision),
+        "heading_recall": mean(heading_recall),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pages/second and extraction quality per PDF engine")
+    parser.add_argument("--corpus", help="directory of real proposal PDFs")
+    parser.add_argument("--synthetic", type=int, default=10, help="synthetic proposals to generate")
+    parser.add_argument("--pages", type=int, default=60, help="pages per synthetic proposal")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="pdf_bench_")
+    files, truths = [], {}
+    for i in range(args.synthetic):
+        path = os.path.join(workdir, f"proposal_{i}.pdf")
+        truths[path] = build_proposal(path, args.pages, rng)
+        files.append(path)
+    if args.corpus:
+        files += sorted(os.path.join(args.corpus, n) for n in os.listdir(args.corpus) if n.lower().endswith(".pdf"))
+
+    # Real files are scored against PyMuPDF's serial output
+    configure("pymupdf", 1)
+    reference = {path: " ".join(pdf_text.page_texts(path)) for path in files if path not in truths}
+
+    report = [run(engine, files, truths, reference, args.workers)
+              for engine in ("pypdf2", "pymupdf", "pymupdf-parallel")]
+    pdf_text.shutdown()
+    for path in files[:args.synthetic]:
+        os.remove(path)
+    os.rmdir(workdir)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
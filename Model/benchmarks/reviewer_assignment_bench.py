@@ -0,0 +1,140 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import reviewer_assignment  # noqa: E402
+
+# -----------------------------
+# Cycle-wide reviewer assignment on a synthetic dataset
+# -----------------------------
+# Proposals and reviewers are drawn around shared topic centres (so affinities
+# look like real embedding similarities), each with a random institute. The
+# auction is compared with a greedy baseline (best remaining edge first) and
+# with the capacity-free upper bound (each proposal's top reviewers), and the
+# result is checked for capacity, distinctness and conflict violations.
+#   python benchmarks/reviewer_assignment_bench.py --proposals 5000 --reviewers 2000
+# --write DIR also saves the dataset as extracted proposal JSONs plus a faculty
+# CSV, for running the real pipeline:
+#   python -m faculty.faculty build --csv DIR/faculty.csv --skiprows 0
+#   python -m faculty.faculty assign DIR/proposals --out assignments.jsonl
+TOPIC_WORDS = ("coal gasification carbon capture mining safety combustion catalysis remote sensing hydrology "
+               "geotechnics robotics vision power grid battery hydrogen emission sensor ventilation methane "
+               "beneficiation flotation slurry logistics automation blasting subsidence reclamation").split()
+
+def synthetic(proposals: int, reviewers: int, dim: int, topics: int, institutes: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype("float32")
+
+    def around(count, spread):
+        topic = rng.integers(0, topics, count)
+        vectors = centres[topic] + spread * rng.standard_normal((count, dim)).astype("float32")
+        return topic, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    proposal_topics, proposal_vectors = around(proposals, 1.2)
+    reviewer_topics, reviewer_vectors = around(reviewers, 1.0)
+    return {
+        "proposal_topics": proposal_topics,
+        "proposal_vectors": proposal_vectors,
+        "proposal_affiliations": [f"Institute {a}" for a in rng.integers(0, institutes, proposals)],
+        "reviewer_topics": reviewer_topics,
+        "reviewer_vectors": reviewer_vectors,
+        "reviewer_affiliations": [f"Institute {a}" for a in rng.integers(0, institutes, reviewers)],
+    }
+
+def topic_words(topic: int) -> list:
+    return [TOPIC_WORDS[(topic * 3 + k) % len(TOPIC_WORDS)] for k in range(3)]
+
+def write_dataset(data: dict, directory: str):
+    os.makedirs(os.path.join(directory, "proposals"), exist_ok=True)
+    for i, (topic, affiliation) in enumerate(zip(data["proposal_topics"], data["proposal_affiliations"])):
+        words = topic_words(int(topic))
+        with open(os.path.join(directory, "proposals", f"P{i:05d}.json"), "w", encoding="utf-8") as f:
+            json.dump({"proposal_id": f"P{i:05d}", "title": f"{' '.join(words).title()} study {i}",
+                       "abstract": f"We study {', '.join(words)} at pilot scale.", "affiliation": affiliation}, f)
+    with open(os.path.join(directory, "faculty.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "institute", "department", "research_areas"])
+        for j, (topic, affiliation) in enumerate(zip(data["reviewer_topics"], data["reviewer_affiliations"])):
+            writer.writerow([f"Reviewer {j}", affiliation, "Mining", ", ".join(topic_words(int(topic)))])
+
+def greedy(candidates: np.ndarray, affinities: np.ndarray, per_proposal: int, capacity: int) -> tuple:
+    # -> (total affinity, empty slots)
+    order = np.argsort(-affinities, axis=None)
+    load = np.zeros(candidates.max() + 1, dtype="int64")
+    count = np.zeros(len(candidates), dtype="int64")
+    total = 0.0
+    for flat in order:
+        i, k = divmod(int(flat), candidates.shape[1])
+        j = candidates[i, k]
+        if not np.isfinite(affinities[i, k]):
+            break
+        if count[i] < per_proposal and load[j] < capacity:
+            count[i] += 1
+            load[j] += 1
+            total += float(affinities[i, k])
+    return total, int((per_proposal - count).sum())
+
+def check(result: dict, conflicts: list, capacity: int) -> dict:
+    held = result["reviewers"]
+    load = np.bincount(held[held >= 0])
+    return {
+        "over_capacity": int((load > capacity).sum()),
+        "duplicate_reviewers": int(sum(len(set(r[r >= 0])) != int((r >= 0).sum()) for r in held)),
+        "conflicts": int(sum(np.isin(r[r >= 0], c).sum() for r, c in zip(held, conflicts))),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Reviewer assignment: auction vs greedy")
+    parser.add_argument("--proposals", type=int, default=5000)
+    parser.add_argument("--reviewers", type=int, default=2000)
+    parser.add_argument("--per-proposal", type=int, default=3)
+    parser.add_argument("--capacity", type=int, help="default: even share plus ASSIGNMENT_CAPACITY_SLACK")
+    parser.add_argument("--candidates", type=int, default=reviewer_assignment.CANDIDATES)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--institutes", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--write", help="also save the dataset to this directory")
+    args = parser.parse_args()
+
+    data = synthetic(args.proposals, args.reviewers, args.dim, args.topics, args.institutes, args.seed)
+    if args.write:
+        write_dataset(data, args.write)
+    capacity = args.capacity or reviewer_assignment.default_capacity(args.proposals, args.reviewers, args.per_proposal)
+
+    start = time.perf_counter()
+    conflicts = reviewer_assignment.conflict_rows(
+        [[reviewer_assignment.institute_key(a)] for a in data["proposal_affiliations"]],
+        data["reviewer_affiliations"])
+    result = reviewer_assignment.assign(data["proposal_vectors"], data["reviewer_vectors"], conflicts,
+                                        args.per_proposal, capacity, args.candidates)
+    seconds = time.perf_counter() - start
+
+    candidates, affinities = reviewer_assignment.candidate_graph(
+        data["proposal_vectors"], data["reviewer_vectors"], conflicts, args.candidates)
+    start = time.perf_counter()
+    greedy_total, greedy_unassigned = greedy(candidates, affinities, args.per_proposal, capacity)
+    greedy_seconds = time.perf_counter() - start
+    bound = float(np.sort(affinities, axis=1)[:, -args.per_proposal:].sum())
+
+    stats = result["stats"]
+    print(json.dumps({
+        **stats,
+        "capacity": capacity,
+        "candidates": args.candidates,
+        "seconds": round(seconds, 2),
+        "violations": check(result, conflicts, capacity),
+        "greedy": {"total_affinity": round(greedy_total, 2), "unassigned": greedy_unassigned,
+                   "seconds": round(greedy_seconds, 2)},
+        "upper_bound_without_capacity": round(bound, 2),
+        "auction_gap_to_bound_pct": round(100 * (bound - stats["total_affinity"]) / bound, 3),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.faculty_index import FacultyIndex, unique_areas  # noqa: E402
+
+# -----------------------------
+# /match-reviewers latency over a synthetic faculty dataset
+# -----------------------------
+# Builds an index of --faculty synthetic profiles with a hashed bag-of-words
+# encoder (same shape as the real embeddings, no model download), then times
+# FacultyIndex.match. The query encoder is the same hash, so the numbers are the
+# index cost alone; add the embedding model's single-text latency for the route.
+# Also compares the old list-scan research area dedup with the dict-based one.
+#   python benchmarks/reviewer_match_bench.py --faculty 50000 --queries 200
+TOPICS = ("machine learning, computer vision, power systems, catalysis, coal combustion, gasification, "
+          "carbon capture, mining safety, geotechnics, remote sensing, signal processing, robotics, "
+          "thermodynamics, fluid mechanics, materials science, nanotechnology, hydrology, control systems, "
+          "structural engineering, data mining, cryptography, wireless networks, vlsi design, polymer chemistry").split(", ")
+INSTITUTES = [f"Institute {i}" for i in range(40)]
+DEPARTMENTS = ["Mechanical", "Chemical", "Electrical", "Mining", "Computer Science", "Civil", "Physics"]
+
+def hashed_encoder(dim: int):
+    def encode(texts: list) -> np.ndarray:
+        out = np.zeros((len(texts), dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(",", " ").replace(".", " ").split():
+                out[row, zlib.crc32(word.encode()) % dim] += 1.0
+        return out
+    return encode
+
+def synthetic_faculty(count: int, rng: random.Random, extra_areas: int) -> list:
+    # A long tail of rare areas keeps the area list realistic in size
+    tail = [f"{rng.choice(TOPICS)} {i}" for i in range(extra_areas)]
+    return [
+        {
+            "name": f"Faculty {i}",
+            "affiliation": rng.choice(INSTITUTES),
+            "department": rng.choice(DEPARTMENTS),
+            "research_areas": rng.sample(TOPICS, 3) + [rng.choice(tail)],
+        }
+        for i in range(count)
+    ]
+
+def list_scan_areas(records: list) -> list:
+    # The original faculty.py loop
+    research_areas = []
+    for record in records:
+        for area in record["research_areas"]:
+            if area and area not in research_areas:
+                research_areas.append(area)
+    return research_areas
+
+def percentile(values: list, q: float) -> float:
+    return round(float(np.percentile(values, q)) * 1000, 3)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reviewer matching latency")
+    parser.add_argument("--faculty", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--extra-areas", type=int, default=5000)
+    parser.add_argument("--scan-prefix", type=int, default=10000, help="faculty used for the dedup comparison")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records = synthetic_faculty(args.faculty, rng, args.extra_areas)
+    root = tempfile.mkdtemp(prefix="faculty_bench_")
+    index = FacultyIndex(root, encode=hashed_encoder(args.dim))
+
+    start = time.perf_counter()
+    summary = index.build(records)
+    build_seconds = time.perf_counter() - start
+
+    queries = [(f"{' '.join(rng.sample(TOPICS, 2))} for coal", " ".join(rng.sample(TOPICS, 5))) for _ in range(args.queries)]
+    index.match(*queries[0], k=args.top_k)  # first call loads the index
+    latencies, excluded = [], []
+    for title, abstract in queries:
+        start = time.perf_counter()
+        index.match(title, abstract, k=args.top_k)
+        latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.match(title, abstract, k=args.top_k, exclude_affiliation=INSTITUTES[0])
+        excluded.append(time.perf_counter() - start)
+
+    # The list scan is quadratic; time it on a prefix so the run stays short
+    prefix = records[:args.scan_prefix]
+    start = time.perf_counter()
+    scanned = list_scan_areas(prefix)
+    scan_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    assert unique_areas(prefix) == scanned
+    dedup_seconds = time.perf_counter() - start
+
+    for name in os.listdir(root):
+        os.remove(os.path.join(root, name))
+    os.rmdir(root)
+    print(json.dumps({
+        **summary,
+        "dimension": args.dim,
+        "build_seconds": round(build_seconds, 2),
+        "match_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99)},
+        "match_excluding_affiliation_ms": {"p50": percentile(excluded, 50), "p95": percentile(excluded, 95)},
+        "area_dedup_ms": {"faculty": len(prefix), "list_scan": round(scan_seconds * 1000, 2),
+                          "dict": round(dedup_seconds * 1000, 2)},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
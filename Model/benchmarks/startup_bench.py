@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+# -----------------------------
+# Cold start: import cost of main.py and time until /health and /ready answer
+# -----------------------------
+# Run from Model/, e.g.
+#   python benchmarks/startup_bench.py --port 8011
+# Both startup modes are measured: LAZY_STARTUP=1 (background loading) and 0 (everything up front).
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_profile(lazy: bool, top: int) -> dict:
+    # Equivalent of `python -X importtime -c "import main"`, reduced to the slowest modules
+    env = {**os.environ, "LAZY_STARTUP": "1" if lazy else "0"}
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", "import main"],
+        cwd=MODEL_DIR, env=env, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Indentation is nesting depth; two spaces = imported directly by main
+        rows.append((int(cumulative), name[1:].rstrip()))
+    total = next((us for us, name in rows if name == "main"), 0)
+    direct = [(us, name.strip()) for us, name in rows if name.startswith("  ") and not name.startswith("   ")]
+    slowest = sorted(direct, reverse=True)[:top]
+    return {
+        "import_main_ms": round(total / 1000, 1),
+        "slowest_modules_ms": {name: round(us / 1000, 1) for us, name in slowest},
+    }
+
+def wait_for(client, path: str, start: float, timeout: float):
+    while time.perf_counter() - start < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return round(time.perf_counter() - start, 3)
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    return None
+
+def serve_timing(lazy: bool, port: int, timeout: float) -> dict:
+    env = {**os.environ, "LAZY_STARTUP": "1" if lazy else "0"}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=MODEL_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+            health = wait_for(client, "/health", start, timeout)
+            ready = wait_for(client, "/ready", start, timeout)
+            status = client.get("/ready").json() if ready is not None else None
+    finally:
+        server.terminate()
+        server.wait()
+    return {"health_seconds": health, "ready_seconds": ready, "ready_status": status}
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time: lazy vs eager router loading")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    args = parser.parse_args()
+
+    report = {}
+    for lazy in (True, False):
+        mode = "lazy" if lazy else "eager"
+        report[mode] = {**import_profile(lazy, args.top), **serve_timing(lazy, args.port, args.timeout)}
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
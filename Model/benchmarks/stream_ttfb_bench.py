@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+# -----------------------------
+# Time-to-first-byte vs total time, buffered vs streamed
+# -----------------------------
+# Start the server first (python main.py) and upload the guidelines PDF once via
+# /upload-guidelines, then run e.g.
+#   python benchmarks/stream_ttfb_bench.py --guidelines-file guide.pdf --json proposal.json --proposal proposal.txt
+# Run the server with LLM_CACHE_ENABLED=0 so repeats measure real Gemini calls.
+# For streamed responses "first_token" is the first SSE token event, which
+# arrives after the "sources" event.
+QUESTION = "What are the eligibility criteria and the maximum project duration?"
+
+def requests_for(args):
+    with open(args.json, "rb") as f:
+        json_bytes = f.read()
+    with open(args.proposal, "r", encoding="utf-8") as f:
+        proposal = f.read()
+
+    def ask_guidelines(stream):
+        data = {"filename": args.guidelines_file, "question": QUESTION, "stream": str(stream).lower()}
+        return {"method": "POST", "url": "/ask-guidelines", "data": data}
+
+    def ask_json(stream):
+        data = {"question": QUESTION, "stream": str(stream).lower()}
+        files = {"file": (os.path.basename(args.json), json_bytes, "application/json")}
+        return {"method": "POST", "url": "/ask-json", "data": data, "files": files}
+
+    def validate(stream):
+        return {"method": "POST", "url": "/validateProposal", "json": {"content": proposal, "stream": stream}}
+
+    return {"ask-guidelines": ask_guidelines, "ask-json": ask_json, "validateProposal": validate}
+
+async def timed_request(client, request):
+    start = time.perf_counter()
+    first_byte = first_token = None
+    async with client.stream(**request) as response:
+        async for line in response.aiter_lines():
+            now = time.perf_counter() - start
+            if first_byte is None:
+                first_byte = now
+            if first_token is None and line.startswith("event: token"):
+                first_token = now
+    total = time.perf_counter() - start
+    return {
+        "status": response.status_code,
+        "ttfb": first_byte if first_byte is not None else total,
+        "first_token": first_token,
+        "total": total,
+    }
+
+def summarize(runs):
+    def _median(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return round(statistics.median(values) * 1000, 1) if values else None
+    return {
+        "errors": sum(1 for r in runs if r["status"] != 200),
+        "ttfb_ms": _median("ttfb"),
+        "first_token_ms": _median("first_token"),
+        "total_ms": _median("total"),
+    }
+
+async def run(args):
+    report = {}
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        for name, build in requests_for(args).items():
+            if args.only and name not in args.only:
+                continue
+            for stream in (False, True):
+                # Sequential runs so the numbers are not skewed by queueing
+                runs = [await timed_request(client, build(stream)) for _ in range(args.repeat)]
+                report[f"{name} ({'stream' if stream else 'buffered'})"] = summarize(runs)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="TTFB and total time for buffered vs streamed endpoints")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--guidelines-file", default="guide.pdf", help="filename previously sent to /upload-guidelines")
+    parser.add_argument("--json", required=True, help="JSON file sent to /ask-json")
+    parser.add_argument("--proposal", required=True, help="text file sent to /validateProposal")
+    parser.add_argument("--only", nargs="*", help="subset of: ask-guidelines ask-json validateProposal")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
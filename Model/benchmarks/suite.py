@@ -0,0 +1,456 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from collections import Counter
+
+import docx
+import fitz  # PyMuPDF, only used to build the corpus
+import httpx
+
+# -----------------------------
+# Offline benchmark suite: every router against a fake Gemini
+# -----------------------------
+# Generates a synthetic corpus (proposal PDFs, DOCX and extracted JSON in small,
+# medium and large sizes, plus a guidelines PDF), starts benchmarks/fake_gemini.py
+# and the app (uvicorn main:app) with every on-disk index and cache in a
+# temporary directory, then drives each endpoint with --requests requests,
+# --concurrency in flight. Per endpoint it records throughput, p50/p95/p99
+# latency, status codes, LLM calls that reached the fake server and the server's
+# peak RSS while that endpoint ran (VmHWM, reset between endpoints; Linux only).
+# Results go to one JSON file per run, named after the git commit, so runs on
+# two commits can be compared. Run from Model/, e.g.
+#   python benchmarks/suite.py run --concurrency 8 --requests 40 --latency 0.2 --error-rate 0.05
+#   python benchmarks/suite.py compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+# The LLM cache and result store are off so every request reaches the "model";
+# --llm-cache turns the LLM cache on.
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(MODEL_DIR, "benchmarks", "results")
+SIZES = {"small": 1, "medium": 5, "large": 25}  # paragraphs per long section
+LINES_PER_PAGE = 52
+FIELDS = [
+    "title", "author", "affiliation", "abstract", "keywords", "introduction", "methodology", "results",
+    "discussion", "conclusion", "references", "timeline", "research_needs", "funding_sources",
+    "collaborating_institutions",
+]
+LONG_FIELDS = {"abstract", "introduction", "methodology", "results", "discussion", "conclusion"}
+LIST_FIELDS = {"keywords", "references", "research_needs", "funding_sources", "collaborating_institutions"}
+WORDS = (
+    "coal gasification carbon capture catalyst reactor pilot process optimisation emission efficiency "
+    "model simulation laboratory characterisation syngas hydrogen sorbent membrane kinetics thermal "
+    "analysis industrial policy energy security validation prototype dataset scale cost impact field "
+    "measurement sensor control temperature pressure yield conversion baseline benchmark framework"
+).split()
+QUESTIONS = [
+    "What is the maximum budget allowed for equipment?",
+    "How long can the project run?",
+    "Which sections must the proposal contain?",
+    "Who is eligible to apply?",
+]
+ALL_ENDPOINTS = [
+    "upload-guidelines", "ask-guidelines", "extract-json", "compare-json", "ask-json", "check-novelty",
+    "check-cost", "check-plagiarism", "timeline", "analyze", "validateProposal",
+]
+
+# -----------------------------
+# Synthetic corpus
+# -----------------------------
+def sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+def paragraph(rng: random.Random, sentences: int = 6) -> str:
+    return " ".join(sentence(rng, rng.randint(8, 20)) for _ in range(sentences))
+
+def synthetic_proposal(rng: random.Random, paragraphs: int) -> dict:
+    proposal = {}
+    for field in FIELDS:
+        if field in LONG_FIELDS:
+            proposal[field] = "\n\n".join(paragraph(rng) for _ in range(paragraphs))
+        elif field in LIST_FIELDS:
+            proposal[field] = [sentence(rng, 4) for _ in range(rng.randint(3, 6))]
+        else:
+            proposal[field] = sentence(rng, 6)
+    proposal["timeline"] = "; ".join(
+        f"Phase {i + 1} (months {6 * i + 1}-{6 * i + 6}): {sentence(rng, 6)}" for i in range(4)
+    )
+    proposal["funding_sources"].append(f"Equipment budget Rs. {rng.randint(5, 50)} lakh, manpower Rs. {rng.randint(5, 30)} lakh")
+    return proposal
+
+def proposal_lines(proposal: dict) -> list:
+    # Headings the validator recognises ("Research Needs:"), one value per line
+    lines = []
+    for field in FIELDS:
+        lines.append(field.replace("_", " ").title() + ":")
+        value = proposal[field]
+        for part in value if isinstance(value, list) else value.split("\n\n"):
+            lines.extend(textwrap.wrap(part, 95) or [""])
+        lines.append("")
+    return lines
+
+def write_pdf(path: str, lines: list):
+    doc = fitz.open()
+    for start in range(0, len(lines), LINES_PER_PAGE):
+        page = doc.new_page()
+        page.insert_text((50, 50), "\n".join(lines[start:start + LINES_PER_PAGE]), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def write_docx(path: str, lines: list):
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(path)
+
+def guideline_lines(rng: random.Random) -> list:
+    rules = [
+        "Proposals must contain a title, abstract, methodology, budget and timeline.",
+        "The maximum budget for equipment is Rs. 50 lakh; manpower may not exceed Rs. 30 lakh.",
+        "Projects may run for at most 36 months, divided into phases with deliverables.",
+        "Applicants must hold a permanent position at a recognised institution.",
+    ]
+    lines = []
+    for section in range(12):
+        lines.append(f"Section {section + 1}: {rules[section % len(rules)]}")
+        for _ in range(8):
+            lines.extend(textwrap.wrap(paragraph(rng, 3), 95))
+        lines.append("")
+    return lines
+
+def build_corpus(root: str, seed: int) -> dict:
+    rng = random.Random(seed)
+    corpus = {"pdf": {}, "docx": {}, "json": {}, "text": {}, "pages": {}}
+    for size, paragraphs in SIZES.items():
+        first, second = synthetic_proposal(rng, paragraphs), synthetic_proposal(rng, paragraphs)
+        lines = proposal_lines(first)
+        corpus["pdf"][size] = os.path.join(root, f"proposal_{size}.pdf")
+        corpus["docx"][size] = os.path.join(root, f"proposal_{size}.docx")
+        write_pdf(corpus["pdf"][size], lines)
+        write_docx(corpus["docx"][size], lines)
+        corpus["json"][size] = []
+        for name, proposal in (("a", first), ("b", second)):
+            path = os.path.join(root, f"extracted_{size}_{name}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(proposal, f)
+            corpus["json"][size].append(path)
+        corpus["text"][size] = "\n".join(lines)
+        corpus["pages"][size] = -(-len(lines) // LINES_PER_PAGE)
+    corpus["guidelines"] = os.path.join(root, "guidelines.pdf")
+    write_pdf(corpus["guidelines"], guideline_lines(rng))
+    return corpus
+
+# -----------------------------
+# Requests per endpoint
+# -----------------------------
+def upload(path: str, content_type: str) -> tuple:
+    with open(path, "rb") as f:
+        return os.path.basename(path), f.read(), content_type
+
+def request_builders(corpus: dict, sizes: list) -> dict:
+    # endpoint -> (path, build(i) -> keyword arguments for client.post); files are read once
+    pdfs = {size: upload(corpus["pdf"][size], "application/pdf") for size in sizes}
+    docxs = {size: upload(corpus["docx"][size], "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+             for size in sizes}
+    jsons = {size: [upload(path, "application/json") for path in corpus["json"][size]] for size in sizes}
+    guidelines = upload(corpus["guidelines"], "application/pdf")
+    guidelines_name = guidelines[0]
+
+    def size_of(i):
+        return sizes[i % len(sizes)]
+
+    def pdf_form(data=None):
+        return lambda i: {"files": {"file": pdfs[size_of(i)]}, "data": data or {}}
+
+    return {
+        "upload-guidelines": ("/upload-guidelines", lambda i: {"files": {"file": guidelines}}),
+        "ask-guidelines": ("/ask-guidelines", lambda i: {
+            "data": {"filename": guidelines_name, "question": QUESTIONS[i % len(QUESTIONS)]}}),
+        # Alternates PDF and DOCX uploads
+        "extract-json": ("/extract-json", lambda i: {
+            "files": {"file": (pdfs if i % 2 == 0 else docxs)[size_of(i // 2)]}}),
+        "compare-json": ("/compare-json", lambda i: {
+            "files": {"file1": jsons[size_of(i)][0], "file2": jsons[size_of(i)][1]}}),
+        "ask-json": ("/ask-json", lambda i: {
+            "files": {"file": jsons[size_of(i)][0]}, "data": {"question": QUESTIONS[i % len(QUESTIONS)]}}),
+        "check-novelty": ("/check-novelty", pdf_form()),
+        "check-cost": ("/check-cost", pdf_form()),
+        "check-plagiarism": ("/check-plagiarism", pdf_form({"use_llm": "true"})),
+        "timeline": ("/timeline", pdf_form()),
+        "analyze": ("/analyze", pdf_form()),
+        "validateProposal": ("/validateProposal", lambda i: {"json": {"content": corpus["text"][size_of(i)]}}),
+    }
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+def memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0])
+    return values
+
+def reset_peak(pid: int) -> bool:
+    # Writing 5 to clear_refs resets VmHWM to the current RSS (Linux >= 4.0)
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def wait_until_up(url: str, timeout: float) -> httpx.Response:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            response = httpx.get(url, timeout=2.0)
+            if response.status_code == 200:
+                return response
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+def failed(response: httpx.Response) -> bool:
+    # Some handlers answer 200 with an "error" key
+    if response.status_code != 200:
+        return True
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and "error" in body
+
+async def drive(client, path: str, build, requests: int, concurrency: int, offset: int = 0) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses, errors = [], Counter(), []
+
+    async def _one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, **build(offset + i))
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] += 1
+            if failed(response):
+                errors.append(response.text[:200])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    ok = len(latencies) - len(errors)
+    return {
+        "requests": requests,
+        "ok": ok,
+        "errors": requests - ok,
+        "status_codes": dict(statuses),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(ok / wall, 3) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+async def run_endpoints(base_url: str, fake_url: str, pid: int, builders: dict, args) -> dict:
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client, \
+            httpx.AsyncClient(base_url=fake_url, timeout=10.0) as fake:
+        for name in args.endpoints:
+            path, build = builders[name]
+            if name == "ask-guidelines" and "upload-guidelines" not in results:
+                await drive(client, *builders["upload-guidelines"], 1, 1)
+            # Warm-up requests load lazily imported models and indexes; not measured
+            await drive(client, path, build, args.warmup, args.concurrency)
+            before = (await fake.get("/stats")).json()
+            peak_reset = reset_peak(pid)
+            rss_before = memory_kb(pid)["VmRSS"]
+            result = await drive(client, path, build, args.requests, args.concurrency, args.warmup)
+            memory = memory_kb(pid)
+            after = (await fake.get("/stats")).json()
+            result.update({
+                "llm_calls": after["requests"] - before["requests"],
+                "llm_injected_errors": after["errors"] - before["errors"],
+                "rss_before_mb": round(rss_before / 1024, 1),
+                "peak_rss_mb": round(memory["VmHWM"] / 1024, 1),
+                "peak_rss_since_start": not peak_reset,
+            })
+            results[name] = result
+            print(f"{name:18s} ok {result['ok']:4d}/{result['requests']:<4d} {result['throughput_rps']:8.2f} req/s  "
+                  f"p50 {result['p50_ms']:8.1f}  p95 {result['p95_ms']:8.1f}  p99 {result['p99_ms']:8.1f} ms  "
+                  f"peak {result['peak_rss_mb']:7.1f} MB", file=sys.stderr)
+    return results
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=MODEL_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=MODEL_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+# -----------------------------
+# Commands
+# -----------------------------
+def run(args):
+    unknown = [name for name in args.endpoints if name not in ALL_ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)} (choose from {', '.join(ALL_ENDPOINTS)})")
+    unknown = [size for size in args.sizes if size not in SIZES]
+    if unknown:
+        raise SystemExit(f"Unknown sizes: {', '.join(unknown)} (choose from {', '.join(SIZES)})")
+    workdir = tempfile.mkdtemp(prefix="model_suite_")
+    state = os.path.join(workdir, "state")
+    os.makedirs(os.path.join(workdir, "corpus"))
+    corpus = build_corpus(os.path.join(workdir, "corpus"), args.seed)
+    env = {
+        **os.environ,
+        "GEMINI_API_ENDPOINT": f"http://127.0.0.1:{args.fake_port}",
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "unused"),
+        "LLM_CACHE_ENABLED": "1" if args.llm_cache else "0",
+        "LLM_CACHE_PATH": os.path.join(state, "llm_cache.sqlite3"),
+        "RESULT_STORE_ENABLED": "0",
+        "GUIDELINES_PDF": corpus["guidelines"],
+        "GUIDELINE_INDEX_DIR": os.path.join(state, "guideline_indexes"),
+        "EMBEDDING_CACHE_DIR": os.path.join(state, "embedding_cache"),
+        "PLAGIARISM_INDEX_DIR": os.path.join(state, "plagiarism_index"),
+        "PROPOSAL_INDEX_DIR": os.path.join(state, "proposal_index"),
+        "FACULTY_INDEX_DIR": os.path.join(state, "faculty_index"),
+        "BATCH_JOB_DIR": os.path.join(state, "batch_jobs"),
+        "PROFILE_DIR": os.path.join(state, "profiles"),
+    }
+    fake = subprocess.Popen(
+        [sys.executable, "benchmarks/fake_gemini.py", "--port", str(args.fake_port), "--latency", str(args.latency),
+         "--error-rate", str(args.error_rate), "--error-codes", args.error_codes],
+        cwd=MODEL_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    log = open(os.path.join(workdir, "server.log"), "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=MODEL_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.fake_port}/stats", 60.0)
+        startup = wait_until_up(f"http://127.0.0.1:{args.port}/ready", args.startup_timeout).json()
+        for name, status in {**startup["routers"], **startup["warmups"]}.items():
+            if status.startswith("error"):
+                print(f"Startup: {name}: {status}", file=sys.stderr)
+        builders = request_builders(corpus, args.sizes)
+        endpoints = asyncio.run(run_endpoints(f"http://127.0.0.1:{args.port}", f"http://127.0.0.1:{args.fake_port}",
+                                              server.pid, builders, args))
+    finally:
+        server.terminate()
+        fake.terminate()
+        server.wait()
+        fake.wait()
+        log.close()
+        if args.keep:
+            print(f"Corpus, state and server log kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "label": args.label or commit,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "sizes": {size: corpus["pages"][size] for size in args.sizes},  # pages per PDF
+            "fake_latency": args.latency,
+            "fake_error_rate": args.error_rate,
+            "fake_error_codes": args.error_codes,
+            "llm_cache": args.llm_cache,
+            "seed": args.seed,
+        },
+        "startup": startup,
+        "endpoints": endpoints,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['label']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.compare:
+        compare_reports(load_report(args.compare), report)
+
+def load_report(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def compare_reports(old: dict, new: dict):
+    print(f"{old['label']} -> {new['label']}")
+    metrics = [("throughput_rps", "req/s"), ("p50_ms", "p50"), ("p95_ms", "p95"), ("p99_ms", "p99"), ("peak_rss_mb", "MB")]
+    for name in new["endpoints"]:
+        if name not in old["endpoints"]:
+            continue
+        a, b = old["endpoints"][name], new["endpoints"][name]
+        cells = []
+        for key, unit in metrics:
+            change = f"{(b[key] - a[key]) / a[key] * 100:+.0f}%" if a[key] else "n/a"
+            cells.append(f"{unit} {a[key]:.1f}->{b[key]:.1f} ({change})")
+        errors = f"  errors {a['errors']}->{b['errors']}" if a["errors"] or b["errors"] else ""
+        print(f"  {name:18s} " + "  ".join(cells) + errors)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of every router against a fake Gemini")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate the corpus, start both servers and drive every endpoint")
+    run_parser.add_argument("--requests", type=int, default=20, help="measured requests per endpoint")
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument("--warmup", type=int, default=1, help="unmeasured requests per endpoint")
+    run_parser.add_argument("--endpoints", type=lambda s: s.split(","), default=ALL_ENDPOINTS,
+                            help="comma-separated subset, run in the given order")
+    run_parser.add_argument("--sizes", type=lambda s: s.split(","), default=list(SIZES),
+                            help="proposal sizes to rotate through (small,medium,large)")
+    run_parser.add_argument("--latency", type=float, default=0.2, help="fake Gemini seconds per call")
+    run_parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake Gemini calls that fail")
+    run_parser.add_argument("--error-codes", default="429", help="statuses of injected failures")
+    run_parser.add_argument("--llm-cache", action="store_true", help="leave the LLM response cache on")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout in seconds")
+    run_parser.add_argument("--startup-timeout", type=float, default=600.0)
+    run_parser.add_argument("--label", help="result name (default: git commit)")
+    run_parser.add_argument("--output", help=f"results file (default: {os.path.relpath(RESULTS_DIR, MODEL_DIR)}/<label>.json)")
+    run_parser.add_argument("--compare", help="earlier results file to print the difference against")
+    run_parser.add_argument("--keep", action="store_true", help="keep the corpus, state and server log")
+    run_parser.add_argument("--port", type=int, default=8013)
+    run_parser.add_argument("--fake-port", type=int, default=8089)
+
+    compare_parser = commands.add_parser("compare", help="print the difference between two results files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        compare_reports(load_report(args.old), load_report(args.new))
+
+if __name__ == "__main__":
+    main()
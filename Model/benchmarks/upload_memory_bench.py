@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF, only used to build the test file
+import httpx
+
+# -----------------------------
+# Peak server memory under concurrent large uploads
+# -----------------------------
+# Builds a large PDF, mostly incompressible images with a little text per page
+# (like a scanned attachment), starts benchmarks/fake_gemini.py and the app, then
+# posts the file --concurrency times at once and reads the server's peak RSS
+# (VmHWM in /proc, so Linux only). Run from Model/, e.g.
+#   python benchmarks/upload_memory_bench.py --size-mb 200 --concurrency 4
+# With --limit-mb below --size-mb the same uploads should be rejected with 413
+# before the body is read.
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_IMAGE_SIDE = 1024  # 3 MB of random RGB per page
+
+def build_pdf(path: str, size_mb: int):
+    doc = fitz.open()
+    pages = max(1, size_mb * 1024 * 1024 // (PAGE_IMAGE_SIDE * PAGE_IMAGE_SIDE * 3))
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Section {i + 1}: methodology and expected results of the proposed work.")
+        pixmap = fitz.Pixmap(fitz.csRGB, PAGE_IMAGE_SIDE, PAGE_IMAGE_SIDE, os.urandom(PAGE_IMAGE_SIDE * PAGE_IMAGE_SIDE * 3), False)
+        page.insert_image(fitz.Rect(72, 100, 520, 548), pixmap=pixmap)
+    doc.save(path)
+    return pages
+
+def memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0])
+    return values
+
+def wait_until_up(url: str, timeout: float = 120.0):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+async def upload(client, endpoint: str, path: str) -> tuple:
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        response = await client.post(endpoint, files={"file": (os.path.basename(path), f, "application/pdf")})
+    return response.status_code, time.perf_counter() - start
+
+async def upload_all(base_url: str, endpoint: str, path: str, concurrency: int) -> list:
+    async with httpx.AsyncClient(base_url=base_url, timeout=600.0) as client:
+        return await asyncio.gather(*(upload(client, endpoint, path) for _ in range(concurrency)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of the app under concurrent large uploads")
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--endpoint", default="/extract-json")
+    parser.add_argument("--limit-mb", type=int, help="UPLOAD_MAX_BYTES for the server (default: its own default)")
+    parser.add_argument("--port", type=int, default=8012)
+    parser.add_argument("--fake-port", type=int, default=8089)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="upload_bench_")
+    pdf_path = os.path.join(workdir, "large_proposal.pdf")
+    pages = build_pdf(pdf_path, args.size_mb)
+
+    env = {
+        **os.environ,
+        "GEMINI_API_ENDPOINT": f"http://127.0.0.1:{args.fake_port}",
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "unused"),
+        "LLM_CACHE_ENABLED": "0",
+        "LAZY_STARTUP": "0",
+        "STARTUP_WARMUP": "0",
+    }
+    if args.limit_mb is not None:
+        env["UPLOAD_MAX_BYTES"] = str(args.limit_mb * 1024 * 1024)
+    fake = subprocess.Popen([sys.executable, "benchmarks/fake_gemini.py", "--port", str(args.fake_port), "--latency", "0.1"],
+                            cwd=MODEL_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+                              cwd=MODEL_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.fake_port}/stats")
+        wait_until_up(f"http://127.0.0.1:{args.port}/ready")
+        before = memory_kb(server.pid)
+        start = time.perf_counter()
+        results = asyncio.run(upload_all(f"http://127.0.0.1:{args.port}", args.endpoint, pdf_path, args.concurrency))
+        elapsed = time.perf_counter() - start
+        after = memory_kb(server.pid)
+    finally:
+        server.terminate()
+        fake.terminate()
+        server.wait()
+        fake.wait()
+        os.remove(pdf_path)
+        os.rmdir(workdir)
+
+    latencies = sorted(seconds for _, seconds in results)
+    print(json.dumps({
+        "endpoint": args.endpoint,
+        "file_mb": args.size_mb,
+        "pages": pages,
+        "concurrency": args.concurrency,
+        "status_codes": sorted(status for status, _ in results),
+        "rss_before_mb": round(before["VmRSS"] / 1024, 1),
+        "peak_rss_mb": round(after["VmHWM"] / 1024, 1),
+        "peak_growth_mb": round((after["VmHWM"] - before["VmRSS"]) / 1024, 1),
+        "slowest_request_seconds": round(latencies[-1], 2),
+        "elapsed_seconds": round(elapsed, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from live_checker import online_checker
+
+# -----------------------------
+# /validateProposal prompt size and latency: whole guide per call vs retrieved chunks per section
+# -----------------------------
+# Run from Model/ with GEMINI_API_KEY set, e.g.
+#   LLM_CACHE_ENABLED=0 python benchmarks/validation_prompt_bench.py --proposal proposal.txt --live
+# Without --live only prompt sizes are reported (no Gemini calls).
+def full_guide_prompt(content: str) -> str:
+    # The prompt every validation used to send
+    guidelines = "".join(online_checker.load_guidelines(online_checker.GUIDELINES_PDF))
+    return f"""
+    You are an expert proposal reviewer.
+
+    --- GUIDELINES ---
+    {guidelines}
+
+    --- PROPOSAL CONTENT (string) ---
+    {content}
+
+    --- TEMPLATE (must be checked) ---
+    {online_checker.proposal_json}
+
+    --- TASK ---
+    1. Treat the content as multi-line string input.
+    2. Check spelling and grammar.
+    3. Check compliance with guidelines.
+    4. Check if all required fields from the template exist in the string.
+    5. Output ONLY a JSON array.
+    """
+
+async def time_full_guide(prompt: str) -> float:
+    start = time.perf_counter()
+    await online_checker.gemini.generate(online_checker.MODEL_NAME, prompt)
+    return time.perf_counter() - start
+
+async def time_sections(content: str) -> float:
+    start = time.perf_counter()
+    async for _ in online_checker.validation_events(content):
+        pass
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation prompt size / latency before and after retrieval scoping")
+    parser.add_argument("--proposal", required=True, help="proposal text file")
+    parser.add_argument("--live", action="store_true", help="also time real Gemini calls")
+    args = parser.parse_args()
+
+    with open(args.proposal, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    online_checker.index_guidelines()
+    sections = online_checker.split_sections(content)
+    guidelines = online_checker.retrieve_guidelines(["\n".join(s["lines"]) for s in sections]) if sections else []
+    section_prompts = [online_checker.build_section_prompt(s, g) for s, g in zip(sections, guidelines)]
+    before = full_guide_prompt(content)
+
+    report = {
+        "sections": len(sections),
+        "before": {"calls": 1, "prompt_chars": len(before)},
+        "after": {
+            "calls": len(section_prompts),
+            "prompt_chars_total": sum(len(p) for p in section_prompts),
+            "prompt_chars_max": max((len(p) for p in section_prompts), default=0),
+        },
+    }
+    if args.live:
+        report["before"]["latency_s"] = asyncio.run(time_full_guide(before))
+        report["after"]["latency_s"] = asyncio.run(time_sections(content))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,12 @@ def connect_db():
         print(f"Database connection error: {error}")
         sys.exit(1)
 
+def connect_async_db(**pool_options):
+    # Pooled async client (Motor) for the Model service; created once at app startup.
+    # Unlike connect_db, failures are left to the caller.
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(os.getenv("MONGODB_URI"), **pool_options)
+
 # Example usage
 if __name__ == "__main__":
     db_client = connect_db()
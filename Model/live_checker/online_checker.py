@@ -1,33 +1,101 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import os
-import google.generativeai as genai
-import fitz  # to read PDFs
+import re
+import json
+import asyncio
+import threading
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.executor import run_in_thread, endpoint_limit
+from services.embeddings import encode_cached
+from services.guideline_index import store as guideline_index
+from services import pdf_text
+from services.longdoc import chunk_text
+from services.llm_cache import cache as llm_cache
+from services import gemini, tracing
+from services.llm_backends import backend_for
+from services.streaming import sse_response
+from live_checker.sessions import sessions, section_hash, SessionConflict
 
 app = APIRouter()
-# Load guidelines PDF once
-def load_guidelines(pdf_path: str) -> str:
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text("text")
-    return text
-
-GUIDELINES = load_guidelines(r"C:\Users\Shanmuga Shyam. B\OneDrive\Desktop\SIH25180\Model\guidelines\guide.pdf")
-# Configure Gemini
+
+# -----------------------------
+# Guidelines are chunked and embedded once at startup by the warm-up in main.py
+# (persisted by services/guideline_index.py, so restarts only re-embed pages
+# that changed). A request that arrives before the warm-up has built the index
+# (or with STARTUP_WARMUP=0) builds it itself.
+# Each proposal section is validated against just the guideline chunks
+# retrieved for it, instead of pasting the whole guide into every prompt.
+# -----------------------------
+GUIDELINES_PDF = os.getenv("GUIDELINES_PDF", os.path.join("guidelines", "guide.pdf"))
+GUIDELINES_INDEX_NAME = "live_checker:" + os.path.basename(GUIDELINES_PDF)
+GUIDELINE_CHUNK_TOKENS = int(os.getenv("VALIDATION_GUIDELINE_CHUNK_TOKENS", "250"))
+GUIDELINE_TOP_K = int(os.getenv("VALIDATION_GUIDELINE_TOP_K", "4"))
+SECTION_MAX_LINES = int(os.getenv("VALIDATION_SECTION_MAX_LINES", "40"))
+VALIDATION_CONCURRENCY = int(os.getenv("VALIDATION_CONCURRENCY", "4"))
+
+def load_guidelines(pdf_path: str) -> list:
+    # One text per page
+    return pdf_text.page_texts(pdf_path)
+
+def chunk_guideline_page(number: int, text: str) -> list:
+    return [
+        (chunk, {"source": os.path.basename(GUIDELINES_PDF), "page": number})
+        for chunk in chunk_text(text, max_tokens=GUIDELINE_CHUNK_TOKENS, overlap_tokens=GUIDELINE_CHUNK_TOKENS // 10)
+    ]
+
+def index_guidelines() -> dict:
+    pages = load_guidelines(GUIDELINES_PDF)
+    return guideline_index.update(GUIDELINES_INDEX_NAME, pages, chunk_guideline_page, encode_cached)
+
+_index_lock = threading.Lock()
+
+def load_guideline_index() -> tuple:
+    # (index, meta), building the index on first use if the warm-up has not yet
+    loaded = guideline_index.load(GUIDELINES_INDEX_NAME)
+    if loaded is None:
+        with _index_lock:
+            # Concurrent first requests build it once; update() itself holds the
+            # cross-process file lock
+            loaded = guideline_index.load(GUIDELINES_INDEX_NAME)
+            if loaded is None:
+                index_guidelines()
+                loaded = guideline_index.load(GUIDELINES_INDEX_NAME)
+    if loaded is None:
+        raise RuntimeError(f"Guidelines index not built; check GUIDELINES_PDF ({GUIDELINES_PDF})")
+    return loaded
+
+def retrieve_guidelines(texts: list, k: int = GUIDELINE_TOP_K) -> list:
+    # Top-k guideline chunk texts for each of `texts`
+    index, meta = load_guideline_index()
+    vectors = encode_cached(texts)
+    with tracing.stage("retrieval"):
+        _, ids = index.search(vectors, min(k, index.ntotal))
+    return [[meta["chunks"][str(i)]["text"] for i in row if i >= 0] for row in ids]
+
+# Configure Gemini (not needed when LLM_BACKEND_VALIDATE_PROPOSAL=local)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and backend_for("validate-proposal").name == "gemini":
     raise RuntimeError("Set the GEMINI_API_KEY environment variable")
 
-genai.configure(api_key=GEMINI_API_KEY)
 # Choose the model you want (Flash, Pro, etc.)
 # Use appropriate model name per your access
 MODEL_NAME = "gemini-2.5-flash-lite"  # or a newer model you have access to
 
+class LineChange(BaseModel):
+    start_line: int
+    end_line: int
+    text: str
+
 class ProposalRequest(BaseModel):
-    content: str
+    content: Optional[str] = None
+    stream: bool = False
+    # Incremental mode: a live editor sends its document id with either the full
+    # content or `changes` against the text it sent last time
+    document_id: Optional[str] = None
+    changes: Optional[List[LineChange]] = None
 
 class ValidationIssue(BaseModel):
     line: int
@@ -35,6 +103,9 @@ class ValidationIssue(BaseModel):
 
 class ValidationResponse(BaseModel):
     issues: List[ValidationIssue]
+    document_id: Optional[str] = None
+    revalidated_sections: Optional[int] = None
+    reused_sections: Optional[int] = None
 
 proposal_json = """{
     "title": "Concise, descriptive project title (max 15–20 words, highlight innovation & purpose)",
@@ -54,53 +125,181 @@ proposal_json = """{
     "collaborating_institutions": ["List partners: e.g., IITs, CSIR labs, NTPC, international research collaborators"]
 }"""
 
-@app.post("/validateProposal", response_model=ValidationResponse)
-async def validate_proposal(request: ProposalRequest):
-    content = request.content
-    
-    # Build prompt
-    prompt = f"""
+TEMPLATE = json.loads(proposal_json)
+# Reply shape; the local backend constrains decoding to it
+ISSUES_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"line": {"type": "integer"}, "message": {"type": "string"}},
+        "required": ["line", "message"],
+    },
+}
+_HEADING = re.compile(r"^[\s#*\-\d.()]*\"?([A-Za-z][A-Za-z _&]{2,40}?)\"?\s*[:\-]?\s*$")
+_FIELD_NAMES = {field.replace("_", " "): field for field in TEMPLATE}
+
+def heading_field(line: str):
+    # Template field a heading line introduces ("Abstract", "## 3. Methodology", "\"abstract\":"), else None
+    match = _HEADING.match(line.split(":")[0])
+    if not match:
+        return None
+    return _FIELD_NAMES.get(" ".join(match.group(1).lower().replace("_", " ").split()))
+
+def split_sections(content: str) -> list:
+    # [{"field", "start_line", "lines"}]; line numbers are 1-based in the full content.
+    # Long sections are cut at the first blank line past SECTION_MAX_LINES, so an edit
+    # only shifts boundaries up to the next paragraph break, not the rest of the document.
+    sections = []
+    for number, line in enumerate(content.split("\n"), start=1):
+        field = heading_field(line)
+        size = len(sections[-1]["lines"]) if sections else 0
+        if field is not None or not sections or (size >= SECTION_MAX_LINES and not line.strip()) \
+                or size >= 2 * SECTION_MAX_LINES:
+            inherited = sections[-1]["field"] if sections and field is None else None
+            sections.append({"field": field or inherited, "start_line": number, "lines": []})
+        sections[-1]["lines"].append(line)
+    return [s for s in sections if any(line.strip() for line in s["lines"])]
+
+def missing_fields(sections: list) -> list:
+    found = {s["field"] for s in sections}
+    return [{"line": 1, "message": f"Missing required field: {field}"} for field in TEMPLATE if field not in found]
+
+def build_section_prompt(section: dict, guidelines: list) -> str:
+    # Section-relative numbering keeps the prompt (and its cached response) independent of position
+    numbered = "\n".join(f"{i}: {line}" for i, line in enumerate(section["lines"], start=1))
+    field = section["field"]
+    expected = json.dumps({field: TEMPLATE[field]}, ensure_ascii=False) if field else "(no specific template field)"
+    rules = "\n\n".join(guidelines) or "(no relevant guidelines found)"
+    return f"""
     You are an expert proposal reviewer.
 
-    --- GUIDELINES ---
-    {GUIDELINES}
+    --- RELEVANT GUIDELINES ---
+    {rules}
 
-    --- PROPOSAL CONTENT (string) ---
-    {content}
+    --- TEMPLATE EXPECTATION FOR THIS SECTION ---
+    {expected}
 
-    --- TEMPLATE (must be checked) ---
-    {proposal_json}
+    --- PROPOSAL SECTION (each line prefixed with its line number) ---
+    {numbered}
 
     --- TASK ---
-    1. Treat the content as multi-line string input.
-    2. Check spelling and grammar.
-    3. Check compliance with guidelines.
-    4. Check if all required fields from the template exist in the string.
-    5. Output ONLY a JSON array.
+    1. Check spelling and grammar.
+    2. Check compliance with the guidelines above.
+    3. Check the section meets the template expectation.
+    4. Output ONLY a JSON array, using the line numbers shown above.
 
     Example:
     [
-    {{"line": 1, "message": "Abstract too short"}},
-    {{"line": 2, "message": "Missing keywords field"}}
+    {{"line": 1, "message": "Abstract too short"}}
     ]
     """
 
-    # Call Gemini
-    model = genai.GenerativeModel(MODEL_NAME)
-    response = model.generate_content(prompt)
+def parse_issues(text: str) -> list:
+    # The response should be a JSON array, possibly wrapped in a code fence
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    try:
+        issues = json.loads(match.group(0)) if match else []
+    except json.JSONDecodeError:
+        # If parsing fails, no issues or fallback
+        return []
+    # Validate each object
+    return [obj for obj in issues if isinstance(obj, dict) and "line" in obj and "message" in obj]
+
+def section_issues(section: dict, text: str) -> list:
+    # Section-relative issues; out-of-range line numbers point at the section's first line
+    issues = []
+    for issue in parse_issues(text):
+        try:
+            line = int(issue["line"])
+        except (TypeError, ValueError):
+            line = 1
+        if not 1 <= line <= len(section["lines"]):
+            line = 1
+        issues.append({"line": line, "message": str(issue["message"])})
+    return issues
+
+def absolute_issues(section: dict, issues: list) -> list:
+    return [{"line": section["start_line"] + issue["line"] - 1, "message": issue["message"]} for issue in issues]
+
+async def validate_section(section: dict, guidelines: list) -> list:
+    prompt = build_section_prompt(section, guidelines)
+
+    # Call the LLM (identical prompts are served from the response cache)
+    backend = backend_for("validate-proposal")
+    raw = await llm_cache.cached(backend.cache_model(MODEL_NAME), prompt, lambda: backend.generate(MODEL_NAME, prompt, ISSUES_SCHEMA))
+    return section_issues(section, raw)
+
+async def validation_events(content: str, session=None):
+    # ("section", {...}) as each section finishes, then ("final", {"issues": [...], ...}) sorted by line.
+    # With a session, sections whose hash already has results are not sent to the model.
+    sections = split_sections(content)
+    keys = [section_hash(s) for s in sections]
+    issues = missing_fields(sections)
+    todo = [i for i, key in enumerate(keys) if session is None or key not in session.results]
+    guidelines = {}
+    if todo:
+        queries = ["\n".join(sections[i]["lines"]) for i in todo]
+        guidelines = dict(zip(todo, await run_in_thread(retrieve_guidelines, queries)))
+    semaphore = asyncio.Semaphore(VALIDATION_CONCURRENCY)
+
+    async def _one(i):
+        async def _validate():
+            async with semaphore:
+                return await validate_section(sections[i], guidelines.get(i, []))
+        if session is None:
+            return i, await _validate(), False
+        found, reused = await session.issues_for(keys[i], _validate)
+        return i, found, reused
+
+    revalidated = 0
+    for task in asyncio.as_completed([_one(i) for i in range(len(sections))]):
+        i, found, reused = await task
+        section = sections[i]
+        found = absolute_issues(section, found)
+        issues.extend(found)
+        revalidated += not reused
+        yield "section", {
+            "field": section["field"],
+            "start_line": section["start_line"],
+            "end_line": section["start_line"] + len(section["lines"]) - 1,
+            "reused": reused,
+            "issues": found,
+        }
+
+    if session is not None:
+        session.retain(set(keys))
+    issues.sort(key=lambda issue: issue["line"])
+    yield "final", {
+        "issues": issues,
+        "revalidated_sections": revalidated,
+        "reused_sections": len(sections) - revalidated,
+    }
+
+@app.post("/validateProposal", response_model=ValidationResponse)
+async def validate_proposal(request: ProposalRequest):
+    session, content = None, request.content
+    if request.document_id is not None:
+        try:
+            changes = [c.dict() for c in request.changes] if request.changes is not None else None
+            session, content = sessions.resolve_content(request.document_id, content, changes)
+        except SessionConflict as e:
+            return JSONResponse(content={"error": str(e)}, status_code=409)
+    elif content is None:
+        return JSONResponse(content={"error": "content is required without a document_id"}, status_code=400)
+
+    events = validation_events(content, session)
+    if request.stream:
+        return sse_response(events, endpoint_limit("validate-proposal"))
 
-    # The response should be JSON text
-    text = response.text.strip()
     try:
-        issues = eval(text)  # or json.loads if response is valid JSON
-        # Validate each object
-        clean = []
-        for obj in issues:
-            if isinstance(obj, dict) and "line" in obj and "message" in obj:
-                clean.append(obj)
-        issues = clean
+        async with endpoint_limit("validate-proposal"):
+            async for event, data in events:
+                if event == "final":
+                    return {**data, "document_id": request.document_id}
     except Exception as e:
-        # If parsing fails, no issues or fallback
-        issues = []
+        return gemini.error_response(e)
 
-    return {"issues": issues}
+@app.delete("/validateProposal/{document_id}")
+async def end_validation_session(document_id: str):
+    # Called by the editor when the document is closed
+    return {"document_id": document_id, "dropped": sessions.drop(document_id)}
@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+# -----------------------------
+# Live-editor validation sessions
+# -----------------------------
+# One session per document id keeps the last proposal text and the issues
+# found for each section, keyed by a hash of the section's field and text.
+# Issues are stored with section-relative line numbers, so a section that only
+# moved (lines inserted above it) is reused as-is and just re-based.
+SESSION_TTL_SECONDS = float(os.getenv("VALIDATION_SESSION_TTL_SECONDS", "3600"))
+MAX_SESSIONS = int(os.getenv("VALIDATION_MAX_SESSIONS", "1000"))
+
+
+class SessionConflict(Exception):
+    # Raised when edits arrive for a document the server holds no text for
+    pass
+
+
+def section_hash(section: dict) -> str:
+    body = "\n".join(section["lines"])
+    return hashlib.sha256(f"{section['field']}\0{body}".encode("utf-8")).hexdigest()
+
+def apply_changes(content: str, changes: list) -> str:
+    # changes: [{"start_line", "end_line", "text"}], 1-based inclusive line ranges of the
+    # previous text, replaced by `text`; end_line = start_line - 1 inserts before start_line.
+    # Applied bottom-up so earlier ranges keep their numbering.
+    lines = content.split("\n")
+    for change in sorted(changes, key=lambda c: c["start_line"], reverse=True):
+        start, end = change["start_line"], change["end_line"]
+        if not (1 <= start <= len(lines) + 1 and start - 1 <= end <= len(lines)):
+            raise SessionConflict(f"Line range {start}-{end} is outside the document ({len(lines)} lines)")
+        lines[start - 1:end] = change["text"].split("\n") if change["text"] != "" else []
+    return "\n".join(lines)
+
+
+class ValidationSession:
+    def __init__(self):
+        self.content = None
+        self.results = {}   # section hash -> section-relative issues
+        self.pending = {}   # section hash -> future, so overlapping requests share one model call
+        self.last_used = time.time()
+
+    async def issues_for(self, key: str, validate):
+        # `validate` is a zero-argument coroutine function returning relative issues
+        if key in self.results:
+            return self.results[key], True
+        if key in self.pending:
+            return await asyncio.shield(self.pending[key]), True
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            issues = await validate()
+            self.results[key] = issues
+            future.set_result(issues)
+            return issues, False
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self.pending.pop(key, None)
+
+    def retain(self, keys: set):
+        # Forget results of sections that no longer exist in the document
+        self.results = {k: v for k, v in self.results.items() if k in keys}
+
+
+class SessionStore:
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def get(self, document_id: str) -> ValidationSession:
+        now = time.time()
+        for key in [k for k, s in self._sessions.items() if now - s.last_used > self.ttl]:
+            del self._sessions[key]
+        session = self._sessions.pop(document_id, None) or ValidationSession()
+        session.last_used = now
+        self._sessions[document_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def resolve_content(self, document_id: str, content: str = None, changes: list = None):
+        # Returns (session, full current text) from either the full text or edits to the last one
+        session = self.get(document_id)
+        if content is None:
+            if session.content is None:
+                raise SessionConflict(f"No previous text for document '{document_id}'; send the full content")
+            content = apply_changes(session.content, changes or [])
+        session.content = content
+        return session, content
+
+    def drop(self, document_id: str) -> bool:
+        return self._sessions.pop(document_id, None) is not None
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "cached_sections": sum(len(s.results) for s in self._sessions.values()),
+        }
+
+
+# Process-wide instance (sessions are per worker; route a document to one worker for best reuse)
+sessions = SessionStore()
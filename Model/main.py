@@ -1,18 +1,23 @@
-from fastapi import FastAPI
+import os
+import sys
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from RAG import novelty
-from RAG import cost
-from RAG import plag
-from RAG import rag_chat_guidlines
-from RAG import rag_chat_specialist
-from RAG import timeline
-from RAG import similarity_checker
-from live_checker import online_checker
-from Json_extraction import extractor
+from fastapi.responses import JSONResponse, Response, FileResponse
+from services import executor
+from services.startup import Startup, LAZY
+from services.uploads import UploadLimitMiddleware
+from services.result_store import store as result_store
+from services import tracing
 import uvicorn
 
+load_dotenv()
+
 app = FastAPI()
 
+# Reject oversized uploads before their body is read (see services/uploads.py)
+app.add_middleware(UploadLimitMiddleware)
+
 # Allow CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -20,18 +25,142 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
+)
+
+# -----------------------------
+# Routers and warm-ups (see services/startup.py; LAZY_STARTUP=0 imports everything up front)
+# -----------------------------
+startup = Startup(
+    routers=[
+        "RAG.timeline:router",
+        "RAG.similarity_checker:router",
+        "RAG.rag_chat_guidlines:router",
+        "RAG.rag_chat_specialist:router",
+        "Json_extraction.extractor:router",
+        "RAG.novelty:router",
+        "RAG.cost:router",
+        "RAG.plag:router",
+        "RAG.analyze:router",
+        "RAG.proposal_search:router",
+        "RAG.batch_jobs:router",
+        "faculty.faculty:router",
+        "live_checker.online_checker:app",
+    ],
+    warmups=[
+        ("embedding_model", "services.embeddings:service.warm"),
+        ("guidelines_index", "live_checker.online_checker:index_guidelines"),
+        ("plagiarism_engine", "services.plagiarism_engine:engine.warm"),
+        ("local_llm", "services.llm_backends:warm"),
+    ],
 )
+if not LAZY:
+    startup.load_eagerly(app)
+
+UNGATED_PATHS = {"/health", "/ready", "/metrics"}
+
+@app.middleware("http")
+async def wait_for_routers(request: Request, call_next):
+    # Until the background import finishes, hold requests instead of answering 404
+    if request.url.path not in UNGATED_PATHS and not startup.routers_loaded.is_set():
+        await startup.routers_loaded.wait()
+    return await call_next(request)
+
+# Registered last so it is the outermost middleware and its timings include the
+# wait for routers: per-request endpoint label, Server-Timing and the opt-in
+# profiler (see services/tracing.py)
+app.add_middleware(tracing.TracingMiddleware)
+
+@app.on_event("startup")
+async def start_background_loading():
+    startup.start(app)
+
+@app.on_event("startup")
+async def connect_result_store():
+    # One pooled Mongo client for the app's lifetime (no-op without MONGODB_URI)
+    await result_store.connect()
+
+@app.on_event("shutdown")
+async def close_result_store():
+    await result_store.close()
+
+@app.on_event("shutdown")
+def shutdown_pools():
+    # Only flush the embedding cache if something loaded it
+    embeddings = sys.modules.get("services.embeddings")
+    if embeddings is not None:
+        embeddings.cache.flush()
+    pdf = sys.modules.get("services.pdf_text")
+    if pdf is not None:
+        pdf.shutdown()
+    executor.shutdown()
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    status = startup.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+# -----------------------------
+# Cache statistics (imported on use to keep startup light)
+# -----------------------------
+@app.get("/stats/document-cache")
+def document_cache_stats():
+    from services import document_store
+    return document_store.store.stats()
+
+@app.get("/stats/embedding-cache")
+def embedding_cache_stats():
+    from services import embeddings
+    return embeddings.cache.stats()
+
+@app.get("/stats/llm-cache")
+def llm_cache_stats():
+    from services import llm_cache
+    return llm_cache.cache.stats()
+
+@app.get("/stats/llm-client")
+def llm_client_stats():
+    from services import gemini, llm_backends
+    return {**gemini.client.stats(), "backends": llm_backends.stats()}
+
+@app.get("/stats/result-store")
+def result_store_stats():
+    return result_store.stats()
+
+@app.get("/stats/validation-sessions")
+def validation_session_stats():
+    from live_checker.sessions import sessions
+    return sessions.stats()
+
+# -----------------------------
+# Metrics and profiles (see services/tracing.py)
+# -----------------------------
+@app.get("/metrics")
+def metrics():
+    payload = tracing.metrics_payload()
+    if payload is None:
+        return JSONResponse(content={"error": "prometheus_client is not installed"}, status_code=503)
+    body, content_type = payload
+    return Response(content=body, media_type=content_type)
+
+@app.get("/profiles/{profile_id}")
+def profile(profile_id: str):
+    path = tracing.profile_path(profile_id)
+    if not tracing.PROFILING or not os.path.exists(path):
+        return JSONResponse(content={"error": "Profile not found"}, status_code=404)
+    return FileResponse(path, media_type="text/html")
+
+# -----------------------------
+# Stored analysis results (see services/result_store.py)
+# -----------------------------
+@app.get("/results/{proposal_id}")
+async def proposal_results(proposal_id: str, endpoint: str = None, limit: int = 50):
+    return {"proposal_id": proposal_id, "results": await result_store.history(proposal_id, endpoint, limit)}
 
-# Include all routers
-app.include_router(timeline.router)
-app.include_router(similarity_checker.router)
-app.include_router(rag_chat_guidlines.router)
-app.include_router(rag_chat_specialist.router)
-app.include_router(extractor.router)
-app.include_router(novelty.router)
-app.include_router(cost.router)
-app.include_router(plag.router)
-app.include_router(online_checker.app)
 # -----------------------------
 # Run FastAPI directly with Python
 # -----------------------------
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from services import gemini
+from services.document_store import PARSERS, content_hash, join_pages, kind_for_filename
+from services.startup import load_object
+from services.uploads import max_bytes
+
+# -----------------------------
+# Batch jobs over a whole submission cycle
+# -----------------------------
+# A job is a directory (or zip) of PDF/DOCX/TXT files plus a list of analyses.
+# Documents are parsed in a process pool and fed through a queue to async
+# workers that run the analyses, with LLM-bound work limited in concurrency
+# (analyses in flight) and in Gemini requests per minute. The rate limit is
+# applied to the shared Gemini client's calls, since one analysis maps over
+# every chunk of a document and can make many requests.
+#
+# Layout under BATCH_JOB_DIR/<job_id>/:
+#   job.json        inputs and selected analyses
+#   input/          extracted zip contents (zip jobs only)
+#   results.jsonl   one line per finished document; doubles as the checkpoint
+#   results.parquet optional, written at the end when pyarrow is installed
+#   summary.json    counts and throughput of the last run
+# Re-running a job skips documents that finished ok in results.jsonl, parses
+# again those that failed to parse and only repeats the analyses that failed
+# for a document.
+# Zips are rejected before extraction when their declared uncompressed size
+# passes the batch-jobs upload limit or they have more than BATCH_ZIP_MAX_ENTRIES
+# entries; zipfile never writes more than the declared size of an entry.
+JOB_DIR = os.getenv("BATCH_JOB_DIR", os.path.join("data_files", "batch_jobs"))
+PARSE_WORKERS = int(os.getenv("BATCH_PARSE_WORKERS", str(os.cpu_count() or 2)))
+DOC_CONCURRENCY = int(os.getenv("BATCH_DOC_CONCURRENCY", "4"))
+LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("BATCH_LLM_RPM", "120"))
+ZIP_MAX_ENTRIES = int(os.getenv("BATCH_ZIP_MAX_ENTRIES", "10000"))
+
+ANALYSES = {
+    "extract_json": "Json_extraction.extractor:generate_json",
+    "plagiarism": "RAG.plag:detect_plagiarism",
+    "novelty": "RAG.novelty:give_novelty_report",
+    "cost": "RAG.cost:cost_estimation",
+    "timeline": "RAG.timeline:generate_timeline",
+}
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+
+def parse_analyses(analyses: str) -> list:
+    selected = []
+    for name in analyses.split(","):
+        name = name.strip().lower().replace("-", "_")
+        if not name:
+            continue
+        if name not in ANALYSES:
+            raise ValueError(f"Unknown analysis: {name}")
+        if name not in selected:
+            selected.append(name)
+    return selected
+
+def check_archive(archive: zipfile.ZipFile):
+    entries = archive.infolist()
+    if ZIP_MAX_ENTRIES and len(entries) > ZIP_MAX_ENTRIES:
+        raise ValueError(f"Zip has {len(entries)} entries; the limit is {ZIP_MAX_ENTRIES}")
+    limit = max_bytes("batch-jobs")
+    size = sum(info.file_size for info in entries)
+    if limit and size > limit:
+        raise ValueError(f"Zip expands to {size // (1024 * 1024)} MB; the limit is {limit // (1024 * 1024)} MB")
+
+def parse_file(path: str) -> tuple:
+    # Runs in a worker process: (sha256 of the bytes, extracted text); parsers read from the path
+    return content_hash(path), join_pages(PARSERS[kind_for_filename(path)](path))
+
+
+class BatchJob:
+    def __init__(self, job_id: str, root: str = JOB_DIR):
+        self.job_id = job_id
+        self.folder = os.path.join(root, job_id)
+        with open(self._path("job.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.total = len(self.config["documents"])
+        self.processed = 0
+        self.failed = 0
+        self.running = False
+        self.started = None
+        self.summary = None
+        if os.path.exists(self._path("summary.json")):
+            with open(self._path("summary.json"), "r", encoding="utf-8") as f:
+                self.summary = json.load(f)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    # -----------------------------
+    # Creation
+    # -----------------------------
+    @classmethod
+    def create(cls, source: str, analyses: list, job_id: str = None, root: str = JOB_DIR):
+        job_id = job_id or uuid.uuid4().hex[:12]
+        folder = os.path.join(root, job_id)
+        if zipfile.is_zipfile(source):
+            # Only supported files are extracted; zipfile strips absolute and ".." components
+            base = os.path.join(folder, "input")
+            with zipfile.ZipFile(source) as archive:
+                check_archive(archive)
+                for name in archive.namelist():
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        archive.extract(name, base)
+        elif os.path.isdir(source):
+            base = os.path.abspath(source)
+        else:
+            raise ValueError(f"Not a directory or zip file: {source}")
+        os.makedirs(folder, exist_ok=True)
+
+        documents = []
+        for dirpath, _, filenames in os.walk(base):
+            for name in filenames:
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    documents.append(os.path.relpath(os.path.join(dirpath, name), base))
+        documents.sort()
+
+        config = {"job_id": job_id, "base": base, "documents": documents, "analyses": analyses, "created": time.time()}
+        with open(os.path.join(folder, "job.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        return cls(job_id, root)
+
+    # -----------------------------
+    # Checkpoint
+    # -----------------------------
+    def finished(self) -> dict:
+        # Latest result line per document
+        results = {}
+        if os.path.exists(self._path("results.jsonl")):
+            with open(self._path("results.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line after a crash
+                    results[record["document"]] = record
+        return results
+
+    def _append(self, handle, record: dict):
+        handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def _compact(self, results: dict):
+        # Rewrite results.jsonl with one line per document, in input order
+        ordered = [results[d] for d in self.config["documents"] if d in results]
+        tmp = self._path("results.jsonl.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in ordered:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp, self._path("results.jsonl"))
+        return ordered
+
+    def _write_parquet(self, records: list) -> str:
+        try:
+            import pandas as pd
+            import pyarrow  # noqa: F401  (parquet engine)
+        except ImportError:
+            return "skipped: pandas and pyarrow are required for parquet output"
+        rows = []
+        for record in records:
+            row = {"document": record["document"], "sha256": record.get("sha256"), "status": record["status"]}
+            for name in self.config["analyses"]:
+                value = record["results"].get(name)
+                row[name] = json.dumps(value, ensure_ascii=False) if value is not None else None
+            row["errors"] = json.dumps(record["errors"], ensure_ascii=False) if record["errors"] else None
+            rows.append(row)
+        pd.DataFrame(rows).to_parquet(self._path("results.parquet"), index=False)
+        return self._path("results.parquet")
+
+    # -----------------------------
+    # Run
+    # -----------------------------
+    async def _analyze(self, text: str, previous: dict, limit) -> tuple:
+        results = dict(previous.get("results", {}))
+        errors = {}
+
+        async def _one(name):
+            async with limit:
+                value = await load_object(ANALYSES[name])(text)
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except json.JSONDecodeError:
+                    pass
+            return value
+
+        todo = [name for name in self.config["analyses"] if name not in results]
+        outcomes = await asyncio.gather(*(_one(name) for name in todo), return_exceptions=True)
+        for name, outcome in zip(todo, outcomes):
+            if isinstance(outcome, Exception):
+                errors[name] = str(outcome)
+            else:
+                results[name] = outcome
+        return results, errors
+
+    async def run(self, parquet: bool = False, progress=None) -> dict:
+        # progress(job) is called after every finished document
+        self.running = True
+        try:
+            return await self._run(parquet, progress)
+        finally:
+            self.running = False
+
+    async def _run(self, parquet: bool, progress) -> dict:
+        self.started = time.time()
+        self.processed = self.failed = 0
+        # Rewriting the checkpoint drops a torn last line left by a crash
+        previous = self.finished()
+        self._compact(previous)
+        todo = [d for d in self.config["documents"] if previous.get(d, {}).get("status") != "ok"]
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=DOC_CONCURRENCY * 2)
+        limit = asyncio.Semaphore(LLM_CONCURRENCY)
+        write_lock = asyncio.Lock()
+
+        with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as pool, \
+                open(self._path("results.jsonl"), "a", encoding="utf-8") as out:
+
+            async def _parse(document):
+                try:
+                    sha, text = await loop.run_in_executor(pool, parse_file, os.path.join(self.config["base"], document))
+                    return document, sha, text, None
+                except Exception as e:
+                    return document, None, None, str(e)
+
+            async def _producer():
+                # Parse ahead of the workers, but never more than the queue can hold
+                pending = set()
+                for document in todo:
+                    pending.add(asyncio.ensure_future(_parse(document)))
+                    if len(pending) >= PARSE_WORKERS:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            await queue.put(task.result())
+                for task in asyncio.as_completed(pending):
+                    await queue.put(await task)
+                for _ in range(DOC_CONCURRENCY):
+                    await queue.put(None)
+
+            async def _worker():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    document, sha, text, parse_error = item
+                    start = time.perf_counter()
+                    if parse_error is not None:
+                        record = {"document": document, "sha256": None, "status": "parse_error",
+                                  "results": {}, "errors": {"parse": parse_error}}
+                    else:
+                        prior = previous.get(document, {})
+                        results, errors = await self._analyze(text, prior if prior.get("sha256") == sha else {}, limit)
+                        record = {"document": document, "sha256": sha, "status": "partial" if errors else "ok",
+                                  "results": results, "errors": errors}
+                    record["seconds"] = round(time.perf_counter() - start, 3)
+                    async with write_lock:
+                        self._append(out, record)
+                    self.processed += 1
+                    self.failed += record["status"] != "ok"
+                    if progress is not None:
+                        progress(self)
+
+            with gemini.request_budget(LLM_REQUESTS_PER_MINUTE):
+                await asyncio.gather(_producer(), *(_worker() for _ in range(DOC_CONCURRENCY)))
+
+        elapsed = time.time() - self.started
+        records = self._compact(self.finished())
+        self.summary = {
+            "job_id": self.job_id,
+            "documents": self.total,
+            "ok": sum(1 for r in records if r["status"] == "ok"),
+            "partial": sum(1 for r in records if r["status"] == "partial"),
+            "parse_errors": sum(1 for r in records if r["status"] == "parse_error"),
+            "processed_this_run": self.processed,
+            "skipped_from_checkpoint": self.total - len(todo),
+            "elapsed_seconds": round(elapsed, 2),
+            "docs_per_minute": round(self.processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "analyses": self.config["analyses"],
+            "results_jsonl": self._path("results.jsonl"),
+        }
+        if parquet:
+            self.summary["results_parquet"] = self._write_parquet(records)
+        with open(self._path("summary.json"), "w", encoding="utf-8") as f:
+            json.dump(self.summary, f, indent=2)
+        return self.summary
+
+    def status(self) -> dict:
+        elapsed = time.time() - self.started if self.started else 0.0
+        return {
+            "job_id": self.job_id,
+            "running": self.running,
+            "documents": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "docs_per_minute": round(self.processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "analyses": self.config["analyses"],
+            "summary": self.summary,
+        }
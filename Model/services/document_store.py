@@ -0,0 +1,195 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import chardet
+import docx
+
+from services import pdf_text, tracing
+from services.executor import run_in_thread, run_cpu
+from services.uploads import spool, spooled, max_bytes
+
+# -----------------------------
+# Content-addressed store of parsed uploads
+# -----------------------------
+# Every router that reads a proposal (plagiarism, novelty, cost, timeline,
+# JSON extraction) goes through here, so the same upload is parsed once and
+# served from memory for the other tools.
+MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# chardet on a whole 200 MB text file is slow and memory hungry; a prefix is enough
+ENCODING_SNIFF_BYTES = int(os.getenv("DOC_ENCODING_SNIFF_BYTES", str(64 * 1024)))
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+# -----------------------------
+# Parsers (bytes or file path -> list of page texts)
+# -----------------------------
+# Routes pass the path of the spooled upload (services/uploads.py), so the file
+# is read from disk by the parser instead of being held in memory as bytes.
+def _source(data):
+    return io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+
+def parse_pdf_pages(data) -> list:
+    # PyMuPDF with a PyPDF2 fallback, large files split across processes (services/pdf_text.py)
+    return pdf_text.page_texts(data)
+
+def parse_docx_pages(data) -> list:
+    doc = docx.Document(_source(data))
+    return ["\n".join(p.text for p in doc.paragraphs if p.text.strip())]
+
+def detect_encoding(prefix: bytes) -> str:
+    return chardet.detect(prefix[:ENCODING_SNIFF_BYTES])["encoding"] or "utf-8"
+
+def parse_text_pages(data) -> list:
+    if isinstance(data, (bytes, bytearray)):
+        return [data.decode(detect_encoding(data), errors="ignore")]
+    with open(data, "rb") as f:
+        encoding = detect_encoding(f.read(ENCODING_SNIFF_BYTES))
+        f.seek(0)
+        return [io.TextIOWrapper(f, encoding=encoding, errors="ignore").read()]
+
+def join_pages(pages: list) -> str:
+    return "".join(page + "\n" for page in pages if page)
+
+PARSERS = {
+    "pdf": parse_pdf_pages,
+    "docx": parse_docx_pages,
+    "txt": parse_text_pages,
+}
+
+
+def content_hash(data) -> str:
+    # sha256 of bytes, or of a file's contents read in chunks
+    if isinstance(data, (bytes, bytearray)):
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    with open(data, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentStore:
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key: "<kind>:<sha256>", value: (pages, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(data, kind: str = "pdf") -> str:
+        return f"{kind}:{content_hash(data)}"
+
+    def _lookup(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                tracing.record_cache("document", True)
+                return entry[0]
+            self.misses += 1
+            tracing.record_cache("document", False)
+            return None
+
+    def get_pages(self, data, kind: str = "pdf") -> list:
+        key = self.key_for(data, kind)
+        pages = self._lookup(key)
+        if pages is not None:
+            return pages
+
+        # Parse outside the lock so one large PDF does not serialise the others
+        with tracing.stage("document_parse", kind=kind):
+            pages = PARSERS[kind](data)
+        self._put(key, pages)
+        return pages
+
+    async def aget_pages(self, data, kind: str = "pdf") -> list:
+        key = await run_in_thread(self.key_for, data, kind)
+        pages = self._lookup(key)
+        if pages is not None:
+            return pages
+
+        with tracing.stage("document_parse", kind=kind):
+            pages = await run_cpu(PARSERS[kind], data)
+        self._put(key, pages)
+        return pages
+
+    def get_text(self, data, kind: str = "pdf") -> str:
+        return join_pages(self.get_pages(data, kind))
+
+    async def aget_text(self, data, kind: str = "pdf") -> str:
+        return join_pages(await self.aget_pages(data, kind))
+
+    def _put(self, key: str, pages: list):
+        size = sum(len(p.encode("utf-8")) for p in pages)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (pages, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Process-wide instance shared by every router
+store = DocumentStore()
+
+def kind_for_filename(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".pdf":
+        return "pdf"
+    if ext == ".docx":
+        return "docx"
+    if ext in [".txt", ".csv"]:
+        return "txt"
+    raise ValueError(f"Unsupported file type: {ext}")
+
+def extract_text_from_pdf(file) -> str:
+    path = spool(file, ".pdf")
+    try:
+        return store.get_text(path, "pdf")
+    finally:
+        os.remove(path)
+
+async def aextract_text_from_pdf(file, endpoint: str = "") -> str:
+    # `file` is an open file object (UploadFile.file); it is copied to disk in chunks, not read whole
+    path = await run_in_thread(spool, file, ".pdf", max_bytes(endpoint))
+    try:
+        return await store.aget_text(path, "pdf")
+    finally:
+        os.remove(path)
+
+async def aget_upload_text(file, endpoint: str) -> str:
+    # UploadFile of any supported kind -> text, parsed from a spooled copy
+    kind = kind_for_filename(file.filename)
+    async with spooled(file, endpoint) as path:
+        return await store.aget_text(path, kind)
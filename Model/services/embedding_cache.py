@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from services import tracing
+
+# -----------------------------
+# On-disk embedding cache (content hash -> float32 vector)
+# -----------------------------
+# Layout under EMBEDDING_CACHE_DIR:
+#   vectors.f32  memory-mapped float32 array of shape (capacity, dim)
+#   keys.bin     sha256 digest stored in each slot, checked on read so a slot
+#                reused after an unflushed crash is never served for the wrong text
+#   index.json   slot of every cached hash, in LRU order (oldest first)
+# When full, the least recently used slot is overwritten.
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("data_files", "embedding_cache"))
+MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+# index.json is rewritten every FLUSH_EVERY inserts (and on shutdown)
+FLUSH_EVERY = int(os.getenv("EMBEDDING_CACHE_FLUSH_EVERY", "256"))
+
+
+class EmbeddingCache:
+    def __init__(self, root: str = CACHE_DIR, max_mb: int = MAX_MB, model_name: str = ""):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self.model_name = model_name
+        self.dim = None
+        self.capacity = 0
+        self._vectors = None
+        self._keys = None
+        self._slots = OrderedDict()  # key: content hash, value: slot in vectors.f32
+        self._free = []
+        self._dirty = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key_for(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _paths(self):
+        return os.path.join(self.root, "vectors.f32"), os.path.join(self.root, "index.json")
+
+    def _keys_path(self):
+        return os.path.join(self.root, "keys.bin")
+
+    def _open_existing(self) -> bool:
+        # Called under self._lock; reopens a cache persisted by an earlier run
+        _, index_path = self._paths()
+        if not os.path.exists(index_path):
+            return False
+        with open(index_path, "r", encoding="utf-8") as f:
+            dim = json.load(f).get("dim")
+        if not dim:
+            return False
+        self._open(dim)
+        return True
+
+    def _open(self, dim: int):
+        # Called under self._lock once the vector dimension is known
+        os.makedirs(self.root, exist_ok=True)
+        vectors_path, index_path = self._paths()
+        capacity = max(1, self.max_bytes // (dim * 4))
+
+        slots = []
+        if os.path.exists(index_path) and os.path.exists(vectors_path) and os.path.exists(self._keys_path()):
+            with open(index_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("dim") == dim and saved.get("capacity") == capacity and saved.get("model") == self.model_name:
+                slots = saved["slots"]
+
+        mode = "r+" if slots else "w+"
+        self._vectors = np.memmap(vectors_path, dtype="float32", mode=mode, shape=(capacity, dim))
+        self._keys = np.memmap(self._keys_path(), dtype="uint8", mode=mode, shape=(capacity, 32))
+        self._slots = OrderedDict((key, slot) for key, slot in slots)
+        used = set(self._slots.values())
+        self._free = [slot for slot in range(capacity - 1, -1, -1) if slot not in used]
+        self.dim = dim
+        self.capacity = capacity
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        with self._lock:
+            if self._vectors is None and not self._open_existing():
+                self.misses += len(keys)
+                tracing.record_cache("embedding", False, len(keys))
+                return found
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None or bytes(self._keys[slot]) != bytes.fromhex(key):
+                    self.misses += 1
+                    continue
+                self._slots.move_to_end(key)
+                found[key] = np.array(self._vectors[slot])
+                self.hits += 1
+        tracing.record_cache("embedding", True, len(found))
+        tracing.record_cache("embedding", False, len(keys) - len(found))
+        return found
+
+    def put_many(self, items: dict):
+        with self._lock:
+            for key, vector in items.items():
+                if self._vectors is None:
+                    self._open(len(vector))
+                if key in self._slots:
+                    self._slots.move_to_end(key)
+                    continue
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    _, slot = self._slots.popitem(last=False)
+                    self.evictions += 1
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(bytes.fromhex(key), dtype="uint8")
+                self._slots[key] = slot
+                self._dirty += 1
+            if self._dirty >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def encode(self, texts: list, encode_fn) -> np.ndarray:
+        # Return vectors for `texts`, calling encode_fn only for texts not in the cache
+        keys = [self.key_for(t) for t in texts]
+        found = self.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in found))
+        if missing:
+            vectors = encode_fn(missing)
+            fresh = {self.key_for(t): v for t, v in zip(missing, vectors)}
+            self.put_many(fresh)
+            found.update(fresh)
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        return np.stack([found[k] for k in keys]).astype("float32", copy=False)
+
+    def _flush_locked(self):
+        if self._vectors is None:
+            return
+        self._vectors.flush()
+        self._keys.flush()
+        _, index_path = self._paths()
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "dim": self.dim,
+                "capacity": self.capacity,
+                "slots": list(self._slots.items()),
+            }, f)
+        os.replace(index_path + ".tmp", index_path)
+        self._dirty = 0
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
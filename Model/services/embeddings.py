@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services import tracing
+from services.executor import run_in_thread
+from services.embedding_cache import EmbeddingCache
+
+# -----------------------------
+# Process-wide MiniLM embedding service
+# -----------------------------
+# One copy of the model is shared by rag_chat_guidlines, rag_chat_specialist and
+# similarity_checker. EMBEDDING_BACKEND=onnx switches to the ONNX runtime
+# (EMBEDDING_ONNX_FILE picks e.g. the int8-quantized export) for faster CPU inference.
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512.onnx")
+BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Dynamic batching: concurrent aencode() calls arriving within this window share one forward pass
+BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+
+class EmbeddingService:
+    def __init__(self, model_name: str = MODEL_NAME, backend: str = BACKEND, batch_size: int = BATCH_SIZE):
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    if self.backend == "onnx":
+                        self._model = SentenceTransformer(
+                            self.model_name, backend="onnx", model_kwargs={"file_name": ONNX_FILE}
+                        )
+                    else:
+                        self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def warm(self):
+        # Load the model and run one forward pass ahead of the first request
+        self.encode(["warm-up"])
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: list) -> np.ndarray:
+        with tracing.stage("embed"):
+            return self._encode(texts)
+
+    def _encode(self, texts: list) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.astype("float32", copy=False)
+
+    # -----------------------------
+    # Dynamic batching across concurrent requests
+    # -----------------------------
+    async def aencode(self, texts: list) -> np.ndarray:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            # Own context: the worker serves every request, not the one that started it
+            self._worker = asyncio.get_running_loop().create_task(self._batch_worker(), context=contextvars.Context())
+        future = asyncio.get_running_loop().create_future()
+        # Timed per request (queueing + its share of a batch); the worker itself is not traced
+        with tracing.stage("embed"):
+            await self._queue.put((list(texts), future))
+            return await future
+
+    async def _batch_worker(self):
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = asyncio.get_running_loop().time() + BATCH_WAIT_MS / 1000
+            while size < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [t for batch, _ in pending for t in batch]
+            try:
+                vectors = await run_in_thread(self._encode, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(batch)])
+                offset += len(batch)
+
+
+class ServiceEmbeddings(Embeddings):
+    # LangChain adapter so FAISS stores reuse the shared model (and, optionally, the disk cache)
+    def __init__(self, service: EmbeddingService, cache: EmbeddingCache = None):
+        self.service = service
+        self.cache = cache
+
+    def _encode(self, texts):
+        if self.cache is None:
+            return self.service.encode(texts)
+        return self.cache.encode(texts, self.service.encode)
+
+    def embed_documents(self, texts):
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+    async def aembed_documents(self, texts):
+        if self.cache is not None:
+            return await run_in_thread(self.embed_documents, texts)
+        return (await self.service.aencode(texts)).tolist()
+
+    async def aembed_query(self, text):
+        if self.cache is not None:
+            return await run_in_thread(self.embed_query, text)
+        return (await self.service.aencode([text]))[0].tolist()
+
+
+# Process-wide instances
+service = EmbeddingService()
+cache = EmbeddingCache(model_name=MODEL_NAME)
+langchain_embeddings = ServiceEmbeddings(service)
+cached_langchain_embeddings = ServiceEmbeddings(service, cache)
+
+def encode_cached(texts: list) -> np.ndarray:
+    return cache.encode(texts, service.encode)
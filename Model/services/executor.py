@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+# -----------------------------
+# Pool configuration
+# -----------------------------
+# Blocking work (PDF parsing, embedding, sync SDK calls) must never run on the
+# uvicorn event loop. Threads are used by default; set PROCESS_POOL_SIZE > 0 to
+# move CPU-bound parsing into worker processes instead.
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "8"))
+PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", "0"))
+ENDPOINT_CONCURRENCY = int(os.getenv("ENDPOINT_CONCURRENCY", "16"))
+
+_thread_pool = None
+_process_pool = None
+_limits = {}  # key: endpoint name, value: asyncio.Semaphore
+
+
+def thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE, thread_name_prefix="model-io")
+    return _thread_pool
+
+def process_pool():
+    global _process_pool
+    if PROCESS_POOL_SIZE <= 0:
+        return None
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_SIZE)
+    return _process_pool
+
+async def run_in_thread(func, *args, **kwargs):
+    # Like asyncio.to_thread, the caller's contextvars (e.g. the tracing endpoint) carry over
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(thread_pool(), partial(context.run, func, *args, **kwargs))
+
+async def run_cpu(func, *args, **kwargs):
+    # `func` and its arguments must be picklable when a process pool is configured
+    pool = process_pool()
+    if pool is None:
+        return await run_in_thread(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, partial(func, *args, **kwargs))
+
+def endpoint_limit(name: str) -> asyncio.Semaphore:
+    # Per-endpoint override, e.g. ENDPOINT_CONCURRENCY_CHECK_PLAGIARISM=4
+    if name not in _limits:
+        env_key = "ENDPOINT_CONCURRENCY_" + name.upper().replace("-", "_")
+        _limits[name] = asyncio.Semaphore(int(os.getenv(env_key, str(ENDPOINT_CONCURRENCY))))
+    return _limits[name]
+
+def shutdown():
+    global _thread_pool, _process_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False)
+        _thread_pool = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False)
+        _process_pool = None
@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from services import tracing
+from services.file_lock import file_lock
+from services.reviewer_assignment import institute_key
+
+# -----------------------------
+# Faculty / reviewer embedding index
+# -----------------------------
+# Faculty profiles (research areas + department) and the distinct research areas
+# are embedded once, at build time. A proposal is then matched with one
+# matrix-vector product over the memory-mapped profile matrix.
+# Layout under FACULTY_INDEX_DIR:
+#   faculty.jsonl      one record per faculty member; line number == row
+#   vectors.npy        (n, dim) float32, L2-normalized profile embeddings
+#   affiliations.npy   (n,) int32 index into meta["affiliations"] (-1 = unknown)
+#   area_vectors.npy   (areas, dim) float32, L2-normalized
+#   meta.json          research areas, affiliations, source file
+#   lock               cross-process build lock
+# A build writes every file as .tmp and swaps them in with meta.json last; every
+# worker notices a rebuild through the mtime of meta.json.
+INDEX_DIR = os.getenv("FACULTY_INDEX_DIR", os.path.join("data_files", "faculty_index"))
+CSV_PATH = os.getenv("FACULTY_CSV", os.path.join("faculty", "IIT Faculty Dataset.csv"))
+CSV_SKIPROWS = int(os.getenv("FACULTY_CSV_SKIPROWS", "3"))
+BUILD_BATCH = 2048
+
+NAME_COLUMNS = ["name", "faculty_name", "faculty"]
+AFFILIATION_COLUMNS = ["institute", "institution", "affiliation", "university", "college"]
+DEPARTMENT_COLUMNS = ["department", "dept"]
+
+
+def _first_column(columns, candidates):
+    return next((c for c in candidates if c in columns), None)
+
+def split_areas(value) -> list:
+    return [a.strip().lower() for a in str(value or "").split(",") if a.strip()]
+
+def load_faculty_csv(path: str = CSV_PATH, skiprows: int = CSV_SKIPROWS) -> list:
+    # CSV -> [{"name", "affiliation", "department", "research_areas": [...]}]
+    import pandas as pd
+    df = pd.read_csv(path, skiprows=skiprows, dtype=str).fillna("")
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    if "research_areas" not in df.columns:
+        raise ValueError(f"{path} has no research_areas column")
+    name = _first_column(df.columns, NAME_COLUMNS)
+    affiliation = _first_column(df.columns, AFFILIATION_COLUMNS)
+    department = _first_column(df.columns, DEPARTMENT_COLUMNS)
+    return [
+        {
+            "name": row[name].strip() if name else f"faculty_{i}",
+            "affiliation": row[affiliation].strip() if affiliation else "",
+            "department": row[department].strip() if department else "",
+            "research_areas": split_areas(row["research_areas"]),
+        }
+        for i, row in enumerate(df.to_dict("records"))
+    ]
+
+def unique_areas(records: list) -> list:
+    # Insertion-ordered set (dict keys) instead of a list membership scan per area
+    return list(dict.fromkeys(area for r in records for area in r["research_areas"]))
+
+def profile_text(record: dict) -> str:
+    areas = ", ".join(record["research_areas"])
+    return f"{areas}. {record['department']}".strip(". ") if record["department"] else areas
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype="float32")
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+class FacultyIndex:
+    def __init__(self, root: str = INDEX_DIR, encode=None):
+        self.root = root
+        self._encode = encode
+        self._records = None
+        self._vectors = None
+        self._affiliations = None
+        self._area_vectors = None
+        self._meta = None
+        self._mtime = None  # mtime_ns of the meta.json the loaded files belong to
+        self._lock = threading.Lock()
+
+    def encode(self, texts: list) -> np.ndarray:
+        if self._encode is None:
+            from services.embeddings import service
+            self._encode = service.encode
+        return self._encode(texts)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    def build(self, records: list, source: str = None) -> dict:
+        # Rebuilds the whole index; vectors are written batch by batch into a
+        # memory-mapped .npy so 50k profiles never sit in memory twice
+        os.makedirs(self.root, exist_ok=True)
+        with file_lock(self._path("lock")):
+            return self._build(records, source)
+
+    def _build(self, records: list, source: str = None) -> dict:
+        areas = unique_areas(records)
+        affiliations = list(dict.fromkeys(r["affiliation"] for r in records if r["affiliation"]))
+        affiliation_ids = {a: i for i, a in enumerate(affiliations)}
+
+        dim = None
+        vectors = None
+        for start in range(0, len(records), BUILD_BATCH):
+            batch = _normalize(self.encode([profile_text(r) for r in records[start:start + BUILD_BATCH]]))
+            if vectors is None:
+                dim = batch.shape[1]
+                vectors = np.lib.format.open_memmap(self._path("vectors.npy.tmp"), mode="w+", dtype="float32",
+                                                    shape=(len(records), dim))
+            vectors[start:start + len(batch)] = batch
+        if vectors is None:
+            raise ValueError("No faculty records to index")
+        vectors.flush()
+        del vectors
+
+        area_vectors = np.concatenate([_normalize(self.encode(areas[s:s + BUILD_BATCH]))
+                                       for s in range(0, len(areas), BUILD_BATCH)]) if areas else np.zeros((0, dim), "float32")
+        self._write_tmp_npy("area_vectors.npy", area_vectors)
+        self._write_tmp_npy("affiliations.npy", np.array(
+            [affiliation_ids.get(r["affiliation"], -1) for r in records], dtype="int32"))
+        with open(self._path("faculty.jsonl.tmp"), "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        meta = {"count": len(records), "dimension": dim, "research_areas": areas,
+                "affiliations": affiliations, "source": source}
+        with open(self._path("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        # Swapped in together under the lock, meta.json last, so a reader never mixes two builds
+        for name in ("vectors.npy", "affiliations.npy", "area_vectors.npy", "faculty.jsonl", "meta.json"):
+            os.replace(self._path(name + ".tmp"), self._path(name))
+        return {"faculty": len(records), "research_areas": len(areas), "affiliations": len(affiliations)}
+
+    def _write_tmp_npy(self, name: str, array: np.ndarray):
+        with open(self._path(name + ".tmp"), "wb") as f:
+            np.save(f, array)
+
+    # -----------------------------
+    # Query
+    # -----------------------------
+    def _load(self):
+        # Called with self._lock held; reloads after a build in any process
+        try:
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return self._records is not None
+        if self._records is not None and self._mtime == mtime:
+            return True
+        with file_lock(self._path("lock")):
+            self._mtime = os.stat(self._path("meta.json")).st_mtime_ns
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                self._meta = json.load(f)
+            with open(self._path("faculty.jsonl"), "r", encoding="utf-8") as f:
+                self._records = [json.loads(line) for line in f if line.strip()]
+            self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+            self._affiliations = np.load(self._path("affiliations.npy"))
+            self._area_vectors = np.load(self._path("area_vectors.npy"))
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records) if self._load() else 0
+
+    def record(self, row: int) -> dict:
+        with self._lock:
+            self._load()
+            return self._records[row]
+
+    def query_vectors(self, texts: list) -> np.ndarray:
+        return _normalize(self.encode(texts))
+
+    def query_vector(self, title: str, abstract: str) -> np.ndarray:
+        return self.query_vectors([f"{title}\n{abstract}".strip()])[0]
+
+    def matrix(self) -> tuple:
+        # (profile vectors (n, dim) mmap, affiliation id per row, affiliation names)
+        with self._lock:
+            if not self._load():
+                raise RuntimeError(f"Faculty index not built; run python -m faculty.faculty build ({self.root})")
+            return self._vectors, self._affiliations, self._meta["affiliations"]
+
+    def match(self, title: str, abstract: str, k: int = 10, exclude_affiliation: str = None,
+              areas_k: int = 5) -> dict:
+        if not len(self):
+            raise RuntimeError(f"Faculty index not built; run python -m faculty.faculty build ({self.root})")
+        query = self.query_vector(title, abstract)  # encoded outside the lock
+        with self._lock, tracing.stage("retrieval"):
+            self._load()
+            scores = np.asarray(self._vectors @ query, dtype="float32")
+            if exclude_affiliation:
+                # Same institute, not the same string: "Dept. of Mining, IIT Madras" excludes "IIT Madras"
+                key = institute_key(exclude_affiliation)
+                excluded = [i for i, name in enumerate(self._meta["affiliations"]) if institute_key(name) == key]
+                if excluded:
+                    scores[np.isin(self._affiliations, excluded)] = -np.inf
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k] if k else np.array([], dtype="int64")
+            top = top[np.argsort(-scores[top])]
+            area_scores = self._area_vectors @ query
+            top_areas = np.argsort(-area_scores)[:areas_k]
+            return {
+                "matches": [
+                    {"faculty_id": int(i), **self._records[i], "score": float(scores[i]) * 100}
+                    for i in top if np.isfinite(scores[i])
+                ],
+                "research_areas": [
+                    {"area": self._meta["research_areas"][i], "score": float(area_scores[i]) * 100} for i in top_areas
+                ],
+                "faculty_count": len(self._records),
+            }
+
+
+# Process-wide instance
+store = FacultyIndex()
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# -----------------------------
+# Cross-process write lock for on-disk indexes
+# -----------------------------
+# Every worker process reads and appends to the same index files; writers (and
+# readers that need a consistent set of files) hold an exclusive lock on a
+# "lock" file next to them.
+
+
+@contextmanager
+def file_lock(path: str):
+    with open(path, "a+") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
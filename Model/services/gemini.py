@@ -0,0 +1,452 @@
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from services import tracing
+
+# -----------------------------
+# Shared Gemini client
+# -----------------------------
+# Every Gemini call in the app (direct SDK users and the LangChain wrappers)
+# goes through one GeminiClient per process, which adds:
+#   - token buckets for requests/minute (GEMINI_RPM) and tokens/minute (GEMINI_TPM)
+#   - retries with exponential backoff and full jitter for 429/5xx/timeouts
+#   - a circuit breaker that fails fast for GEMINI_BREAKER_COOLDOWN seconds after
+#     GEMINI_BREAKER_THRESHOLD consecutive failures
+#   - coalescing: identical concurrent requests share one upstream call
+#   - request_budget(): an extra requests/minute limit for one caller, e.g. a batch job
+# Set GEMINI_API_ENDPOINT (e.g. http://127.0.0.1:8089 for benchmarks/fake_gemini.py)
+# to talk REST to another server instead of using the SDK.
+RPM = float(os.getenv("GEMINI_RPM", "300"))
+TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "20"))
+BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "120"))
+API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+CHARS_PER_TOKEN = 4
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(Exception):
+    # Quota exhausted or upstream down; routes answer 503/429 instead of 500
+    def __init__(self, message: str, status_code: int = 503, retry_after: float = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class UpstreamError(Exception):
+    # Non-2xx answer from the REST transport
+    def __init__(self, status_code: int, message: str, retry_after: float = None):
+        super().__init__(f"Gemini API returned {status_code}: {message}")
+        self.code = status_code
+        self.retry_after = retry_after
+
+
+def error_response(e: Exception) -> JSONResponse:
+    if isinstance(e, LLMUnavailable):
+        headers = {"Retry-After": str(int(e.retry_after + 1))} if e.retry_after else None
+        return JSONResponse(content={"error": str(e)}, status_code=e.status_code, headers=headers)
+    if isinstance(e, HTTPException):
+        # e.g. UploadTooLarge (413) raised while a route spools its upload
+        return JSONResponse(content={"error": str(e.detail)}, status_code=e.status_code, headers=e.headers)
+    return JSONResponse(content={"error": str(e)}, status_code=500)
+
+def prompt_chars(prompt) -> int:
+    return sum(len(str(p)) for p in prompt) if isinstance(prompt, (list, tuple)) else len(str(prompt))
+
+def estimate_tokens(prompt) -> int:
+    return max(1, prompt_chars(prompt) // CHARS_PER_TOKEN)
+
+def is_retryable(e: Exception) -> bool:
+    # google.api_core exceptions and UpstreamError carry the HTTP status as `code`
+    code = getattr(e, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    return isinstance(e, (asyncio.TimeoutError, ConnectionError, OSError)) or type(e).__name__ in (
+        "ConnectError", "ReadTimeout", "RemoteProtocolError", "ReadError",
+    )
+
+
+class TokenBucket:
+    # `capacity` units, refilled continuously over a minute; a debit larger than
+    # the capacity waits for a full bucket and leaves it in deficit
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        if self.capacity <= 0:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= min(amount, self.capacity):
+                    self.level -= amount
+                    return
+                await asyncio.sleep((min(amount, self.capacity) - self.level) / self.rate)
+
+    def debit(self, amount: float):
+        # Charge usage known only afterwards (response tokens)
+        if self.capacity > 0:
+            self._refill()
+            self.level -= amount
+
+
+# Caller-specific bucket drawn from on top of the process-wide ones; contextvars
+# carry it into the tasks the caller starts
+_caller_bucket = contextvars.ContextVar("gemini_caller_bucket", default=None)
+
+@contextlib.contextmanager
+def request_budget(per_minute: float):
+    # Every upstream request (retries included, cache hits and coalesced calls not)
+    # made inside the block also draws from a bucket of `per_minute` requests
+    token = _caller_bucket.set(TokenBucket(per_minute) if per_minute > 0 else None)
+    try:
+        yield
+    finally:
+        _caller_bucket.reset(token)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def before_call(self) -> bool:
+        # Called once per logical request; True when it is the half-open trial
+        if self.opened_at is None:
+            return False
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0 or self.trial_running:
+            raise LLMUnavailable("Gemini is temporarily unavailable (circuit open)", retry_after=max(remaining, 1.0))
+        # Half-open: let one request through to probe the upstream
+        self.trial_running = True
+        return True
+
+    def release(self, trial: bool):
+        # The request ended without saying anything about the upstream's health
+        if trial:
+            self.trial_running = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() >= self.opened_at + self.cooldown else "open"
+
+
+class GeminiClient:
+    def __init__(self, endpoint: str = API_ENDPOINT, rpm: float = RPM, tpm: float = TPM,
+                 max_retries: int = MAX_RETRIES, coalesce: bool = True):
+        self.endpoint = endpoint.rstrip("/") if endpoint else None
+        self.rpm, self.tpm, self.max_retries, self.coalesce = rpm, tpm, max_retries, coalesce
+        self._sdk = None
+        self._http = None
+        self._lock = threading.Lock()
+        self._inflight = {}  # request key -> task shared by identical concurrent calls
+        self._buckets = None
+        self._loop = None  # event loop the buckets, in-flight tasks and HTTP client belong to
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+
+    # -----------------------------
+    # Transports
+    # -----------------------------
+    def sdk(self):
+        # google.generativeai takes about a second to import, so it is loaded on first use
+        if self._sdk is None:
+            with self._lock:
+                if self._sdk is None:
+                    import google.generativeai as genai
+                    load_dotenv()
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                    self._sdk = genai
+        return self._sdk
+
+    def _http_client(self):
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(base_url=self.endpoint, timeout=TIMEOUT)
+        return self._http
+
+    def _rest_body(self, prompt, generation_config):
+        parts = prompt if isinstance(prompt, (list, tuple)) else [prompt]
+        body = {"contents": [{"role": "user", "parts": [{"text": str(p)} for p in parts]}]}
+        if generation_config:
+            body["generationConfig"] = generation_config
+        return body
+
+    def _rest_headers(self):
+        return {"x-goog-api-key": os.getenv("GEMINI_API_KEY", "")}
+
+    @staticmethod
+    def _rest_text(payload: dict) -> str:
+        candidates = payload.get("candidates") or [{}]
+        return "".join(p.get("text", "") for p in (candidates[0].get("content") or {}).get("parts", []))
+
+    @staticmethod
+    def _raise_for_status(response):
+        if response.status_code >= 400:
+            retry_after = response.headers.get("retry-after")
+            raise UpstreamError(response.status_code, response.text[:200], float(retry_after) if retry_after else None)
+
+    async def _send(self, model: str, prompt, generation_config) -> str:
+        if self.endpoint:
+            response = await self._http_client().post(
+                f"/v1beta/models/{model}:generateContent",
+                json=self._rest_body(prompt, generation_config),
+                headers=self._rest_headers(),
+            )
+            self._raise_for_status(response)
+            return self._rest_text(response.json())
+        response = await asyncio.wait_for(
+            self.sdk().GenerativeModel(model).generate_content_async(prompt, generation_config=generation_config),
+            TIMEOUT,
+        )
+        return response.text
+
+    async def _send_stream(self, model: str, prompt, generation_config):
+        if self.endpoint:
+            async with self._http_client().stream(
+                "POST",
+                f"/v1beta/models/{model}:streamGenerateContent?alt=sse",
+                json=self._rest_body(prompt, generation_config),
+                headers=self._rest_headers(),
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._raise_for_status(response)
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        text = self._rest_text(json.loads(line[5:]))
+                        if text:
+                            yield text
+            return
+        response = await self.sdk().GenerativeModel(model).generate_content_async(
+            prompt, generation_config=generation_config, stream=True
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    # -----------------------------
+    # Limits, retries, breaker
+    # -----------------------------
+    def buckets(self):
+        # Created lazily so they bind to the running event loop
+        if self._buckets is None:
+            self._loop = asyncio.get_running_loop()
+            self._buckets = (TokenBucket(self.rpm), TokenBucket(self.tpm))
+        return self._buckets
+
+    async def _admit(self, prompt):
+        requests, tokens = self.buckets()
+        caller = _caller_bucket.get()
+        if caller is not None:
+            await caller.acquire(1)
+        await requests.acquire(1)
+        await tokens.acquire(estimate_tokens(prompt))
+
+    def _backoff(self, attempt: int, e: Exception) -> float:
+        hinted = getattr(e, "retry_after", None)
+        if hinted:
+            return min(BACKOFF_MAX, hinted)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    async def _generate(self, model: str, prompt, generation_config) -> str:
+        # The breaker counts logical requests: one failure once the retries are used up
+        trial = self.breaker.before_call()
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._admit(prompt)
+                self.calls += 1
+                try:
+                    text = await self._send(model, prompt, generation_config)
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The upstream answered (e.g. 400 for a bad request): neither a failure nor a success
+                        self.breaker.release(trial)
+                        self.failures += 1
+                        raise
+                    if attempt == self.max_retries:
+                        self.breaker.record_failure()
+                        self.failures += 1
+                        status = 429 if getattr(e, "code", None) == 429 else 503
+                        raise LLMUnavailable(f"Gemini call failed after {self.max_retries + 1} attempts: {e}", status) from e
+                    self.retries += 1
+                    await asyncio.sleep(self._backoff(attempt, e))
+                    continue
+                self.breaker.record_success()
+                self.buckets()[1].debit(estimate_tokens(text))
+                tracing.record_llm(model, estimate_tokens(prompt), estimate_tokens(text), prompt_chars(prompt))
+                return text
+        except asyncio.CancelledError:
+            self.breaker.release(trial)
+            raise
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    async def generate(self, model: str, prompt, generation_config: dict = None) -> str:
+        with tracing.stage("llm", model=model):
+            return await self._generate_once(model, prompt, generation_config)
+
+    async def _generate_once(self, model: str, prompt, generation_config: dict = None) -> str:
+        if not self.coalesce:
+            return await self._generate(model, prompt, generation_config)
+        key = hashlib.sha256(json.dumps([model, prompt, generation_config], sort_keys=True).encode("utf-8")).hexdigest()
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._generate(model, prompt, generation_config))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller giving up does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def stream(self, model: str, prompt, generation_config: dict = None):
+        # Retries only happen before the first chunk; a stream that breaks midway raises.
+        # Timed by hand: a span cannot stay open across the generator's yields
+        start = time.perf_counter()
+        output = 0
+        trial = self.breaker.before_call()
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._admit(prompt)
+                self.calls += 1
+                started = False
+                try:
+                    async for part in self._send_stream(model, prompt, generation_config):
+                        started = True
+                        output += len(part)
+                        yield part
+                except Exception as e:
+                    if not is_retryable(e):
+                        self.breaker.release(trial)
+                        self.failures += 1
+                        tracing.observe("llm_stream", time.perf_counter() - start, type(e).__name__)
+                        raise
+                    if started:
+                        self.breaker.record_failure()
+                        self.failures += 1
+                        tracing.observe("llm_stream", time.perf_counter() - start, type(e).__name__)
+                        raise
+                    if attempt == self.max_retries:
+                        self.breaker.record_failure()
+                        self.failures += 1
+                        tracing.observe("llm_stream", time.perf_counter() - start, "LLMUnavailable")
+                        raise LLMUnavailable(f"Gemini stream failed after {self.max_retries + 1} attempts: {e}") from e
+                    self.retries += 1
+                    await asyncio.sleep(self._backoff(attempt, e))
+                    continue
+                self.breaker.record_success()
+                tracing.observe("llm_stream", time.perf_counter() - start)
+                tracing.record_llm(model, estimate_tokens(prompt), max(1, output // CHARS_PER_TOKEN), prompt_chars(prompt))
+                return
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled or closed by the consumer (e.g. the client disconnected)
+            self.breaker.release(trial)
+            raise
+
+    def run_sync(self, coro):
+        # Runs `coro` on the client's event loop from another thread and waits for it.
+        # asyncio.run() would start a second loop, which the loop-bound locks,
+        # in-flight tasks and HTTP client cannot be used from
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is None or not loop.is_running() or running is loop:
+            coro.close()
+            raise RuntimeError(
+                "Synchronous Gemini calls need the app's event loop running in another thread; "
+                "call ainvoke()/generate() from async code instead"
+            )
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def stats(self) -> dict:
+        return {
+            "transport": f"rest:{self.endpoint}" if self.endpoint else "sdk",
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": len(self._inflight),
+            "circuit": self.breaker.state,
+        }
+
+
+# Process-wide instance
+client = GeminiClient()
+
+async def generate(model: str, prompt, generation_config: dict = None) -> str:
+    return await client.generate(model, prompt, generation_config)
+
+
+class GeminiLLM(LLM):
+    # LangChain LLM backed by the shared client, used where GoogleGenerativeAI was
+    model: str = "gemini-2.5-flash-lite"
+    temperature: float = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "shared-gemini"
+
+    def _config(self):
+        return {"temperature": self.temperature} if self.temperature is not None else None
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs) -> str:
+        # Sync entry point for worker threads; handed over to the client's event loop
+        return client.run_sync(client.generate(self.model, prompt, self._config()))
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs) -> str:
+        return await client.generate(self.model, prompt, self._config())
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        async for part in client.stream(self.model, prompt, self._config()):
+            chunk = GenerationChunk(text=part)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(part, chunk=chunk)
+            yield chunk
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+
+import faiss
+import numpy as np
+
+from services.file_lock import file_lock
+
+# -----------------------------
+# On-disk FAISS indexes for uploaded guidelines
+# -----------------------------
+# Layout, one directory per guidelines filename:
+#   <INDEX_DIR>/<sha1(filename)>/index.faiss  FAISS IndexIDMap2 (memory-mapped on load)
+#   <INDEX_DIR>/<sha1(filename)>/meta.json    page hashes, chunk texts and metadata
+#   <INDEX_DIR>/<sha1(filename)>/lock         cross-process write lock
+# Every worker process reads the same files, and a worker notices another
+# worker's update through the mtime of meta.json.
+INDEX_DIR = os.getenv("GUIDELINE_INDEX_DIR", os.path.join("data_files", "guideline_indexes"))
+
+
+def _page_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class GuidelineIndexStore:
+    def __init__(self, root: str = INDEX_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._loaded = {}  # key: filename, value: (meta mtime_ns, index, meta)
+        self._lock = threading.Lock()
+
+    def _paths(self, filename: str):
+        folder = os.path.join(self.root, hashlib.sha1(filename.encode("utf-8")).hexdigest())
+        return (
+            folder,
+            os.path.join(folder, "index.faiss"),
+            os.path.join(folder, "meta.json"),
+            os.path.join(folder, "lock"),
+        )
+
+    def exists(self, filename: str) -> bool:
+        return os.path.exists(self._paths(filename)[2])
+
+    def list_filenames(self) -> list:
+        names = []
+        for entry in os.scandir(self.root):
+            meta_path = os.path.join(entry.path, "meta.json")
+            if entry.is_dir() and os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    names.append(json.load(f)["filename"])
+        return names
+
+    # -----------------------------
+    # Read path (lazy, memory-mapped)
+    # -----------------------------
+    def load(self, filename: str):
+        _, index_path, meta_path, lock_path = self._paths(filename)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = self._loaded.get(filename)
+            if cached is not None and cached[0] == mtime:
+                return cached[1], cached[2]
+
+        with file_lock(lock_path):
+            mtime = os.stat(meta_path).st_mtime_ns
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+        with self._lock:
+            self._loaded[filename] = (mtime, index, meta)
+        return index, meta
+
+    # -----------------------------
+    # Write path (incremental per page)
+    # -----------------------------
+    def update(self, filename: str, pages: list, chunk_page, embed_documents) -> dict:
+        # Index `pages` (list of page texts), re-embedding only pages whose text changed.
+        # chunk_page(page_number, text) -> [(chunk_text, metadata), ...]
+        # embed_documents(texts) -> one vector per text
+        folder, index_path, meta_path, lock_path = self._paths(filename)
+        os.makedirs(folder, exist_ok=True)
+
+        with file_lock(lock_path):
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                index = faiss.read_index(index_path)
+            else:
+                meta = {"filename": filename, "version": 0, "next_id": 0, "pages": {}, "chunks": {}}
+                index = None
+
+            old_pages = meta["pages"]
+            stale_ids, changed = [], []
+            for number, text in enumerate(pages):
+                old = old_pages.get(str(number))
+                if old is not None and old["hash"] == _page_hash(text):
+                    continue
+                if old is not None:
+                    stale_ids.extend(old["ids"])
+                changed.append(number)
+            for key in [k for k in old_pages if int(k) >= len(pages)]:
+                stale_ids.extend(old_pages.pop(key)["ids"])
+
+            # Same text as already indexed: keep the files and version untouched
+            if index is not None and not changed and not stale_ids:
+                return {"pages": len(pages), "reembedded_pages": 0, "removed_chunks": 0,
+                        "added_chunks": 0, "version": meta["version"]}
+
+            if stale_ids and index is not None:
+                index.remove_ids(np.array(stale_ids, dtype="int64"))
+            for chunk_id in stale_ids:
+                meta["chunks"].pop(str(chunk_id), None)
+
+            texts, owners = [], []
+            for number in changed:
+                for text, metadata in chunk_page(number, pages[number]):
+                    texts.append(text)
+                    owners.append((number, metadata))
+
+            new_ids = []
+            if texts:
+                vectors = np.asarray(embed_documents(texts), dtype="float32")
+                if index is None:
+                    index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+                new_ids = list(range(meta["next_id"], meta["next_id"] + len(texts)))
+                index.add_with_ids(vectors, np.array(new_ids, dtype="int64"))
+                meta["next_id"] += len(texts)
+            if index is None:
+                raise ValueError("No text found in guidelines PDF")
+
+            for number in changed:
+                meta["pages"][str(number)] = {"hash": _page_hash(pages[number]), "ids": []}
+            for chunk_id, text, (number, metadata) in zip(new_ids, texts, owners):
+                meta["pages"][str(number)]["ids"].append(chunk_id)
+                meta["chunks"][str(chunk_id)] = {"text": text, "metadata": metadata}
+            meta["version"] += 1
+
+            # Atomic replace so readers in other workers never see a half-written file
+            faiss.write_index(index, index_path + ".tmp")
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(meta_path + ".tmp", meta_path)
+
+        return {
+            "pages": len(pages),
+            "reembedded_pages": len(changed),
+            "removed_chunks": len(stale_ids),
+            "added_chunks": len(new_ids),
+            "version": meta["version"],
+        }
+
+
+# Process-wide instance
+store = GuidelineIndexStore()
@@ -0,0 +1,146 @@
+import os
+import threading
+
+from services import gemini, tracing
+from services.executor import run_in_thread
+
+# -----------------------------
+# LLM backends per endpoint
+# -----------------------------
+# "gemini" is the shared remote client (services/gemini.py). "local" runs a small
+# CPU-only model in-process, which is enough for short grading tasks (compare-json
+# scores, validateProposal spell/format checks) and works offline.
+#   LLM_BACKEND=gemini                     default for every endpoint
+#   LLM_BACKEND_COMPARE_JSON=local         per-endpoint override (same naming as ENDPOINT_CONCURRENCY_*)
+#   LLM_BACKEND_VALIDATE_PROPOSAL=local
+# The local engine is llama.cpp with a quantized GGUF file (LOCAL_LLM_PATH, needs
+# llama-cpp-python) or, if no file is given, a Hugging Face model run with
+# transformers (LOCAL_LLM_HF_MODEL).
+DEFAULT_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LOCAL_LLM_PATH = os.getenv("LOCAL_LLM_PATH")
+LOCAL_LLM_HF_MODEL = os.getenv("LOCAL_LLM_HF_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+LOCAL_LLM_CONTEXT = int(os.getenv("LOCAL_LLM_CONTEXT", "4096"))
+LOCAL_LLM_MAX_TOKENS = int(os.getenv("LOCAL_LLM_MAX_TOKENS", "512"))
+LOCAL_LLM_THREADS = int(os.getenv("LOCAL_LLM_THREADS", str(os.cpu_count() or 4)))
+
+
+def prompt_text(prompt) -> str:
+    return "\n\n".join(str(p) for p in prompt) if isinstance(prompt, (list, tuple)) else str(prompt)
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def cache_model(self, model: str) -> str:
+        return model
+
+    async def generate(self, model: str, prompt, json_schema: dict = None) -> str:
+        # Gemini follows the prompt's output instructions; the schema is only used locally
+        return await gemini.generate(model, prompt)
+
+
+class LocalBackend:
+    # One model instance per process; inference is serialized because neither
+    # llama.cpp nor a transformers model is safe to call from several threads
+    name = "local"
+
+    def __init__(self, path: str = LOCAL_LLM_PATH, hf_model: str = LOCAL_LLM_HF_MODEL):
+        self.path = path
+        self.hf_model = hf_model
+        self.engine = "llama_cpp" if path else "transformers"
+        self._model = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return os.path.basename(self.path) if self.path else self.hf_model
+
+    def cache_model(self, model: str) -> str:
+        # Local answers must never be served for Gemini prompts (or the other way round)
+        return f"local:{self.model_name}"
+
+    def _load(self):
+        if self._model is not None:
+            return
+        if self.engine == "llama_cpp":
+            try:
+                from llama_cpp import Llama
+            except ImportError as e:
+                raise RuntimeError("LOCAL_LLM_PATH is set but llama-cpp-python is not installed") from e
+            self._model = Llama(model_path=self.path, n_ctx=LOCAL_LLM_CONTEXT, n_threads=LOCAL_LLM_THREADS, verbose=False)
+        else:
+            try:
+                import torch
+                from transformers import AutoModelForCausalLM, AutoTokenizer
+            except ImportError as e:
+                raise RuntimeError("The local LLM backend needs transformers (or llama-cpp-python with LOCAL_LLM_PATH)") from e
+            torch.set_num_threads(LOCAL_LLM_THREADS)
+            self._tokenizer = AutoTokenizer.from_pretrained(self.hf_model)
+            self._model = AutoModelForCausalLM.from_pretrained(self.hf_model, torch_dtype=torch.float32)
+            self._model.eval()
+
+    def _complete(self, prompt: str, json_schema: dict = None) -> str:
+        with self._lock:
+            self._load()
+            messages = [{"role": "user", "content": prompt}]
+            if self.engine == "llama_cpp":
+                # With a schema, llama.cpp constrains decoding with a grammar, so the reply always parses
+                response_format = {"type": "json_object", "schema": json_schema} if json_schema else None
+                result = self._model.create_chat_completion(
+                    messages=messages, max_tokens=LOCAL_LLM_MAX_TOKENS, temperature=0.0, response_format=response_format,
+                )
+                return result["choices"][0]["message"]["content"]
+
+            import torch
+            inputs = self._tokenizer.apply_chat_template(
+                messages, add_generation_prompt=True, return_tensors="pt", return_dict=True,
+                truncation=True, max_length=LOCAL_LLM_CONTEXT - LOCAL_LLM_MAX_TOKENS,
+            )
+            with torch.inference_mode():
+                output = self._model.generate(**inputs, max_new_tokens=LOCAL_LLM_MAX_TOKENS, do_sample=False)
+            return self._tokenizer.decode(output[0][inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+
+    def warm(self):
+        with self._lock:
+            self._load()
+
+    async def generate(self, model: str, prompt, json_schema: dict = None) -> str:
+        text = prompt_text(prompt)
+        with tracing.stage("llm_local", model=self.model_name):
+            answer = await run_in_thread(self._complete, text, json_schema)
+        tracing.record_llm(self.cache_model(model), gemini.estimate_tokens(text), gemini.estimate_tokens(answer), len(text))
+        return answer
+
+
+_backends = {}  # key: backend name, value: instance (created on first use)
+_FACTORIES = {"gemini": GeminiBackend, "local": LocalBackend}
+
+def backend_name(endpoint: str) -> str:
+    env_key = "LLM_BACKEND_" + endpoint.upper().replace("-", "_")
+    return os.getenv(env_key, DEFAULT_BACKEND).strip().lower()
+
+def get_backend(name: str):
+    if name not in _FACTORIES:
+        raise ValueError(f"Unknown LLM backend: {name} (choose from {', '.join(_FACTORIES)})")
+    if name not in _backends:
+        _backends[name] = _FACTORIES[name]()
+    return _backends[name]
+
+def backend_for(endpoint: str):
+    return get_backend(backend_name(endpoint))
+
+def warm():
+    # Startup warm-up: load the local model only if some endpoint is configured to use it
+    names = {DEFAULT_BACKEND} | {v.strip().lower() for k, v in os.environ.items() if k.startswith("LLM_BACKEND_")}
+    if "local" in names:
+        get_backend("local").warm()
+
+def stats() -> dict:
+    local = _backends.get("local")
+    return {
+        "default": DEFAULT_BACKEND,
+        "overrides": {k[len("LLM_BACKEND_"):].lower().replace("_", "-"): v for k, v in os.environ.items() if k.startswith("LLM_BACKEND_")},
+        "local_model": local.model_name if local else None,
+        "local_loaded": bool(local and local._model is not None),
+    }
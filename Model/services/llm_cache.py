@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from services import tracing
+from services.executor import run_in_thread
+
+# -----------------------------
+# Persistent LLM response cache (SQLite)
+# -----------------------------
+# Exact mode: key = sha256(model name + whitespace-normalized prompt). Entries
+# expire after LLM_CACHE_TTL_SECONDS and the least recently used ones are evicted
+# beyond LLM_CACHE_MAX_ENTRIES.
+# Semantic mode (LLM_CACHE_SEMANTIC=1): questions are stored with their
+# embedding per namespace (e.g. one guidelines index version), and a new
+# question within LLM_CACHE_SEMANTIC_DISTANCE cosine distance reuses the answer.
+# Each worker keeps the normalized embeddings of a namespace as one matrix,
+# rebuilt when a question is added to it; the oldest questions are evicted
+# beyond LLM_CACHE_SEMANTIC_MAX_ENTRIES.
+DB_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("data_files", "llm_cache.sqlite3"))
+ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "0") == "1"
+SEMANTIC_DISTANCE = float(os.getenv("LLM_CACHE_SEMANTIC_DISTANCE", "0.08"))
+SEMANTIC_MAX_ENTRIES = int(os.getenv("LLM_CACHE_SEMANTIC_MAX_ENTRIES", "5000"))
+
+
+def normalize_prompt(prompt) -> str:
+    # Prompts are indented f-strings; indentation and blank lines carry no meaning
+    if isinstance(prompt, (list, tuple)):
+        prompt = "\n\x1e\n".join(str(p) for p in prompt)
+    return " ".join(str(prompt).split())
+
+
+class LLMCache:
+    def __init__(self, path: str = DB_PATH, ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES,
+                 semantic_max_entries: int = SEMANTIC_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic_max_entries = semantic_max_entries
+        self._conn = None
+        self._matrices = {}  # namespace -> {"newest", "ids", "created", "matrix"}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+        self.saved_seconds = 0.0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, "
+                "created REAL, last_used REAL, latency REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS semantic ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT, question TEXT, "
+                "embedding BLOB, answer TEXT, created REAL, latency REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS semantic_namespace ON semantic(namespace)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key_for(model: str, prompt) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    # -----------------------------
+    # Exact mode
+    # -----------------------------
+    def get(self, model: str, prompt):
+        key = self.key_for(model, prompt)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT response, created, latency FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    db.commit()
+                self.misses += 1
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            self.saved_seconds += row[2] or 0.0
+            return row[0]
+
+    def put(self, model: str, prompt, response: str, latency: float = 0.0):
+        key = self.key_for(model, prompt)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used, latency) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, now, now, latency),
+            )
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            count = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            db.commit()
+
+    async def cached(self, model: str, prompt, call) -> str:
+        # `call` is a zero-argument coroutine function returning the response text
+        if not ENABLED:
+            return await call()
+        hit = await run_in_thread(self.get, model, prompt)
+        tracing.record_cache("llm", hit is not None)
+        if hit is not None:
+            return hit
+        start = time.perf_counter()
+        response = await call()
+        await run_in_thread(self.put, model, prompt, response, time.perf_counter() - start)
+        return response
+
+    async def cached_stream(self, model: str, prompt, stream):
+        # `stream` is a zero-argument function returning an async iterator of text
+        # parts. A hit is replayed as a single part; a miss is stored once complete.
+        if not ENABLED:
+            async for part in stream():
+                yield part
+            return
+        hit = await run_in_thread(self.get, model, prompt)
+        tracing.record_cache("llm", hit is not None)
+        if hit is not None:
+            yield hit
+            return
+        start = time.perf_counter()
+        parts = []
+        async for part in stream():
+            parts.append(part)
+            yield part
+        await run_in_thread(self.put, model, prompt, "".join(parts), time.perf_counter() - start)
+
+    # -----------------------------
+    # Semantic mode
+    # -----------------------------
+    def _semantic_matrix(self, db: sqlite3.Connection, namespace: str) -> dict:
+        # Called with self._lock held. Another worker's put shows up as a newer max id.
+        newest = db.execute("SELECT MAX(id) FROM semantic WHERE namespace = ?", (namespace,)).fetchone()[0]
+        entry = self._matrices.get(namespace)
+        if entry is None or entry["newest"] != newest:
+            rows = db.execute("SELECT id, embedding, created FROM semantic WHERE namespace = ?", (namespace,)).fetchall()
+            matrix = np.stack([np.frombuffer(r[1], dtype="float32") for r in rows]) if rows else np.zeros((0, 0), dtype="float32")
+            if rows:
+                matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+            entry = {
+                "newest": newest,
+                "ids": np.array([r[0] for r in rows], dtype="int64"),
+                "created": np.array([r[2] for r in rows], dtype="float64"),
+                "matrix": matrix,
+            }
+            self._matrices[namespace] = entry
+        return entry
+
+    def semantic_get(self, namespace: str, vector: np.ndarray):
+        vector = np.asarray(vector, dtype="float32")
+        vector = vector / (np.linalg.norm(vector) + 1e-12)
+        with self._lock:
+            db = self._db()
+            entry = self._semantic_matrix(db, namespace)
+            live = entry["created"] >= time.time() - self.ttl
+            if not live.any():
+                return None
+            sims = np.where(live, entry["matrix"] @ vector, -np.inf)
+            best = int(np.argmax(sims))
+            row = None
+            if 1.0 - float(sims[best]) <= SEMANTIC_DISTANCE:
+                row = db.execute("SELECT answer, latency FROM semantic WHERE id = ?", (int(entry["ids"][best]),)).fetchone()
+                if row is None:
+                    self._matrices.pop(namespace, None)  # evicted by another worker
+            if row is not None:
+                self.semantic_hits += 1
+                self.saved_seconds += row[1] or 0.0
+        tracing.record_cache("llm_semantic", row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def semantic_put(self, namespace: str, question: str, vector: np.ndarray, answer, latency: float = 0.0):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO semantic (namespace, question, embedding, answer, created, latency) VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, question, np.asarray(vector, dtype="float32").tobytes(), json.dumps(answer), now, latency),
+            )
+            evicted = db.execute("DELETE FROM semantic WHERE created < ?", (now - self.ttl,)).rowcount
+            count = db.execute("SELECT COUNT(*) FROM semantic").fetchone()[0]
+            if count > self.semantic_max_entries:
+                evicted += db.execute(
+                    "DELETE FROM semantic WHERE id IN (SELECT id FROM semantic ORDER BY id ASC LIMIT ?)",
+                    (count - self.semantic_max_entries,),
+                ).rowcount
+            db.commit()
+            if evicted:
+                self._matrices.clear()
+            else:
+                self._matrices.pop(namespace, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self._db().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "enabled": ENABLED,
+                "semantic": SEMANTIC,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "semantic_hits": self.semantic_hits,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+# Process-wide instance
+cache = LLMCache()
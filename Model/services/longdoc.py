@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import re
+
+from fastapi.responses import StreamingResponse
+
+from services import gemini
+from services.streaming import stream_response
+from services.llm_cache import cache as llm_cache
+
+# -----------------------------
+# Map-reduce over long documents
+# -----------------------------
+# Documents are split into token-bounded chunks, every chunk is sent to the LLM
+# concurrently (at most LONGDOC_CONCURRENCY in flight), and the per-chunk JSON
+# replies are merged by an analysis-specific reducer. Token counts are estimated
+# at ~4 characters per token, which is close for Gemini on English prose.
+MODEL_NAME = "gemini-2.5-flash-lite"
+CHUNK_TOKENS = int(os.getenv("LONGDOC_CHUNK_TOKENS", "3000"))
+OVERLAP_TOKENS = int(os.getenv("LONGDOC_OVERLAP_TOKENS", "150"))
+CONCURRENCY = int(os.getenv("LONGDOC_CONCURRENCY", "4"))
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> list:
+    # Greedy packing of paragraphs; oversized paragraphs are split on sentence/word boundaries
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for para in re.split(r"\n\s*\n|\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        while len(para) > max_chars:
+            cut = para.rfind(". ", 0, max_chars)
+            if cut < max_chars // 2:
+                cut = para.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(para[:cut + 1].strip())
+            para = para[cut + 1:].strip()
+        if para:
+            pieces.append(para)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > max_chars:
+            chunks.append(current)
+            # Carry a short tail over so facts split across the boundary are not lost
+            current = current[-overlap_chars:] if overlap_chars else ""
+        current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def parse_json(raw_text: str):
+    match = re.search(r"\{.*\}", raw_text or "", re.DOTALL)
+    if not match:
+        return None
+    try:
+        parsed = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+async def generate(prompt: str) -> str:
+    return await llm_cache.cached(MODEL_NAME, prompt, lambda: gemini.generate(MODEL_NAME, prompt))
+
+# -----------------------------
+# Map / reduce drivers
+# -----------------------------
+async def map_chunks(text: str, build_prompt):
+    # Yields (index, total, chunk, parsed JSON or None) as chunks complete
+    chunks = chunk_text(text) or [""]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def _one(i, chunk):
+        async with semaphore:
+            return i, chunk, parse_json(await generate(build_prompt(chunk)))
+
+    tasks = [asyncio.ensure_future(_one(i, c)) for i, c in enumerate(chunks)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            i, chunk, parsed = await task
+            yield i, len(chunks), chunk, parsed
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def map_reduce(text: str, build_prompt, reduce_fn) -> dict:
+    results = []
+    async for i, _, chunk, parsed in map_chunks(text, build_prompt):
+        results.append((i, chunk, parsed))
+    results.sort(key=lambda r: r[0])
+    return reduce_fn([(chunk, parsed) for _, chunk, parsed in results])
+
+async def stream_map_reduce(text: str, build_prompt, reduce_fn):
+    # Progress events: one "partial" per finished chunk (merged over chunks so far), then "final"
+    results = []
+    async for i, total, chunk, parsed in map_chunks(text, build_prompt):
+        results.append((i, chunk, parsed))
+        ordered = [(c, p) for _, c, p in sorted(results, key=lambda r: r[0])]
+        yield {"type": "partial", "chunk": i, "completed": len(results), "total": total, "result": reduce_fn(ordered)}
+    ordered = [(c, p) for _, c, p in sorted(results, key=lambda r: r[0])]
+    yield {"type": "final", "completed": len(results), "total": len(results), "result": reduce_fn(ordered)}
+
+def ndjson_response(events, limit: asyncio.Semaphore = None) -> StreamingResponse:
+    return stream_response(events, lambda event: json.dumps(event, ensure_ascii=False) + "\n",
+                           lambda e: {"type": "error", "error": str(e)}, "application/x-ndjson", limit)
+
+# -----------------------------
+# Reducers: list of (chunk text, parsed JSON or None) -> merged JSON
+# -----------------------------
+def _number(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = re.search(r"-?\d+(\.\d+)?", str(value).replace(",", ""))
+    return float(m.group(0)) if m else 0.0
+
+def _merge_unique(lists) -> list:
+    seen, merged = set(), []
+    for items in lists:
+        for item in items or []:
+            key = " ".join(str(item).lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
+
+def percentage_reducer(percentage_key: str, sections_key: str):
+    # Length-weighted mean of the per-chunk percentages, sections concatenated and deduplicated
+    def _reduce(results):
+        parsed = [(chunk, p) for chunk, p in results if p and percentage_key in p]
+        weight = sum(len(chunk) for chunk, _ in parsed)
+        merged = {
+            percentage_key: round(sum(_number(p[percentage_key]) * len(c) for c, p in parsed) / weight, 2) if weight else 0,
+            sections_key: _merge_unique(p.get(sections_key) for _, p in parsed),
+            "chunks": len(results),
+        }
+        if len(parsed) < len(results):
+            merged["unparsed_chunks"] = len(results) - len(parsed)
+        return merged
+    return _reduce
+
+def cost_reducer(results) -> dict:
+    parsed = [p for _, p in results if p]
+    breakdown = {}
+    for p in parsed:
+        for category, amount in (p.get("cost_breakdown") or {}).items():
+            breakdown[category] = breakdown.get(category, 0) + _number(amount)
+    merged = {
+        "estimated_cost": sum(_number(p.get("estimated_cost", 0)) for p in parsed),
+        "cost_breakdown": breakdown,
+        "chunks": len(results),
+    }
+    if len(parsed) < len(results):
+        merged["unparsed_chunks"] = len(results) - len(parsed)
+    return merged
+
+def timeline_reducer(results) -> dict:
+    seen, events = set(), []
+    for _, p in results:
+        for event in (p or {}).get("timeline", []) or []:
+            if not isinstance(event, dict):
+                continue
+            key = (str(event.get("date", "")).strip(), " ".join(str(event.get("event", "")).lower().split()))
+            if key not in seen:
+                seen.add(key)
+                events.append(event)
+    events.sort(key=lambda e: str(e.get("date", "")))
+    return {"timeline": events}
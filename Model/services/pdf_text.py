@@ -0,0 +1,154 @@
+import io
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+from services import tracing
+
+# -----------------------------
+# PDF text extraction
+# -----------------------------
+# One module for every PDF path in the service. PyMuPDF (fitz) is the fast path;
+# PyPDF2 is the fallback when PyMuPDF is not installed, PDF_ENGINE=pypdf2, or
+# PyMuPDF cannot open a file. Documents with at least PDF_PARALLEL_MIN_PAGES
+# pages are split into page ranges extracted in parallel by PDF_WORKERS
+# processes (PyMuPDF only, and only for files on disk).
+# Output keeps page numbers (1-based) and, on request, the section headings found
+# on each page: larger or bold short lines with PyMuPDF, a text heuristic with PyPDF2.
+ENGINE = os.getenv("PDF_ENGINE", "auto").lower()
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_WORDS = 12
+_HEADING_TEXT = re.compile(r"^(\d+(\.\d+)*\.?\s+)?[A-Z][A-Za-z0-9 ,&()/\-–:]{2,80}$")
+
+_pool = None
+
+
+def _fitz():
+    if ENGINE == "pypdf2":
+        return None
+    try:
+        import fitz
+    except ImportError:
+        if ENGINE == "pymupdf":
+            raise
+        return None
+    return fitz
+
+def looks_like_heading(line: str) -> bool:
+    # Text-only heuristic: short, capitalised or numbered, no sentence punctuation at the end
+    line = line.strip()
+    if not line or len(line.split()) > HEADING_MAX_WORDS or line[-1] in ".,;":
+        return False
+    return bool(_HEADING_TEXT.match(line)) and (line.isupper() or line.istitle() or line[0].isdigit())
+
+def _text_headings(text: str) -> list:
+    return [line.strip() for line in text.split("\n") if looks_like_heading(line)]
+
+# -----------------------------
+# PyMuPDF
+# -----------------------------
+def _fitz_page(page, headings: bool) -> dict:
+    if not headings:
+        return {"page": page.number + 1, "text": page.get_text("text"), "headings": []}
+    fitz = _fitz()
+    lines = []  # (text, max font size, all bold)
+    sizes = Counter()
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+        for line in block.get("lines", []):
+            spans = [s for s in line["spans"] if s["text"].strip()]
+            if not spans:
+                continue
+            text = "".join(s["text"] for s in line["spans"])
+            for s in spans:
+                sizes[round(s["size"], 1)] += len(s["text"])
+            lines.append((text, max(s["size"] for s in spans), all(s["flags"] & 16 for s in spans)))
+    body_size = sizes.most_common(1)[0][0] if sizes else 0
+    found = []
+    for text, size, bold in lines:
+        stripped = text.strip()
+        if len(stripped.split()) > HEADING_MAX_WORDS or not any(c.isalpha() for c in stripped):
+            continue
+        if size >= body_size * HEADING_SIZE_RATIO or (bold and stripped[-1] not in ".,;"):
+            found.append(stripped)
+    return {"page": page.number + 1, "text": "".join(text + "\n" for text, _, _ in lines), "headings": found}
+
+def _fitz_range(path: str, start: int, stop: int, headings: bool) -> list:
+    # Runs in a worker process for parallel extraction
+    fitz = _fitz()
+    with fitz.open(path) as doc:
+        return [_fitz_page(doc[i], headings) for i in range(start, stop)]
+
+def _pool_executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=WORKERS)
+    return _pool
+
+def _fitz_pages(source, headings: bool) -> list:
+    fitz = _fitz()
+    is_path = isinstance(source, str)
+    with (fitz.open(source) if is_path else fitz.open(stream=bytes(source), filetype="pdf")) as doc:
+        count = doc.page_count
+        # Already inside a worker process (e.g. batch parsing): do not start a nested pool
+        parallel = is_path and WORKERS > 1 and count >= PARALLEL_MIN_PAGES and multiprocessing.parent_process() is None
+        if not parallel:
+            return [_fitz_page(page, headings) for page in doc]
+    step = -(-count // WORKERS)
+    ranges = [(source, start, min(start + step, count), headings) for start in range(0, count, step)]
+    pages = []
+    for part in _pool_executor().map(_fitz_range, *zip(*ranges)):
+        pages.extend(part)
+    return pages
+
+# -----------------------------
+# PyPDF2
+# -----------------------------
+def _pypdf2_pages(source, headings: bool) -> list:
+    # From an open file, one page at a time (given a path, PyPDF2 would read the
+    # whole file into memory). The reader caches every object it resolves, images
+    # included, so the cache is dropped after each page.
+    pages = []
+    with (open(source, "rb") if isinstance(source, str) else io.BytesIO(source)) as f:
+        reader = PyPDF2.PdfReader(f)
+        for number, page in enumerate(reader.pages, start=1):
+            text = page.extract_text() or ""
+            pages.append({"page": number, "text": text, "headings": _text_headings(text) if headings else []})
+            reader.resolved_objects.clear()
+    return pages
+
+# -----------------------------
+# Public API
+# -----------------------------
+def engine() -> str:
+    return "pymupdf" if _fitz() is not None else "pypdf2"
+
+def extract_pages(source, headings: bool = True) -> list:
+    # source: path or bytes -> [{"page": 1-based number, "text": str, "headings": [str]}]
+    with tracing.stage("pdf_extract", engine=engine()):
+        return _extract_pages(source, headings)
+
+def _extract_pages(source, headings: bool) -> list:
+    if _fitz() is not None:
+        try:
+            return _fitz_pages(source, headings)
+        except Exception:
+            if ENGINE == "pymupdf":
+                raise
+            # Files PyMuPDF cannot open are retried with PyPDF2
+    return _pypdf2_pages(source, headings)
+
+def page_texts(source) -> list:
+    # One text per page, in order (the page number is the index + 1)
+    return [page["text"] for page in extract_pages(source, headings=False)]
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = None
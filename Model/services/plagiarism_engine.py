@@ -0,0 +1,344 @@
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from services import tracing
+from services.file_lock import file_lock
+
+# -----------------------------
+# Local n-gram / MinHash plagiarism engine
+# -----------------------------
+# Documents are split into word shingles (SHINGLE_WORDS words each). Every
+# window of PASSAGE_SHINGLES shingles (stepping by half a window) gets a MinHash
+# signature, banded for LSH. A query's passages find candidate sources via the
+# band hashes, then the exact overlapping spans are computed from the
+# candidates' stored shingle hashes.
+#
+# Layout under PLAGIARISM_INDEX_DIR:
+#   sources.jsonl       {"source_id", "offset", "count"} into shingles.u32 (append-only)
+#   shingles.u32        32-bit shingle hashes of every source, concatenated (append-only)
+#   bands.u64           (passages, BANDS) LSH band hashes (append-only)
+#   passages.i32        source number of each passage (append-only)
+#   band_hashes.npy     (BANDS, passages) band hashes, each row sorted (memory-mapped)
+#   band_sources.npy    (BANDS, passages) source number of each entry above
+#   meta.json           committed sizes of the files above
+#   lock                cross-process write lock
+# Ingest appends under the lock, merges the new passages into the sorted band
+# table (written to .tmp and swapped in with os.replace), then replaces
+# meta.json. Anything appended past the sizes in meta.json (an ingest that
+# died half-way) is truncated by the next ingest. Every worker reads the same
+# files and notices another worker's ingest through the mtime of meta.json.
+# Lookups are binary searches (np.searchsorted) into the memory-mapped rows, so
+# neither the band table nor the shingles are read into memory as a whole.
+INDEX_DIR = os.getenv("PLAGIARISM_INDEX_DIR", os.path.join("data_files", "plagiarism_index"))
+SHINGLE_WORDS = 5
+PASSAGE_SHINGLES = 50
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+# Matched runs shorter than this many words are ignored as common phrasing
+MIN_SPAN_WORDS = int(os.getenv("PLAGIARISM_MIN_SPAN_WORDS", "12"))
+MAX_CANDIDATES = int(os.getenv("PLAGIARISM_MAX_CANDIDATES", "50"))
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(25185)
+_PERM_A = _rng.integers(1, 1 << 29, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 29, size=NUM_PERM, dtype=np.uint64)
+_BAND_MIX = np.uint64(0x9E3779B97F4A7C15)
+_WORD_MIX = np.uint64(1000003)
+_WORD = re.compile(r"\w+")
+
+
+# -----------------------------
+# Hashing helpers
+# -----------------------------
+def tokenize(text: str):
+    # Returns (word hashes, char spans) for every word in `text`
+    matches = list(_WORD.finditer(text.lower()))
+    hashes = np.fromiter((zlib.crc32(m.group(0).encode("utf-8")) for m in matches), dtype=np.uint64, count=len(matches))
+    spans = [(m.start(), m.end()) for m in matches]
+    return hashes, spans
+
+def shingle_hashes(word_hashes: np.ndarray) -> np.ndarray:
+    n = len(word_hashes) - SHINGLE_WORDS + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint32)
+    h = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(SHINGLE_WORDS):
+            h = h * _WORD_MIX + word_hashes[j:j + n]
+    return (h & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+def passage_bands(shingles: np.ndarray) -> np.ndarray:
+    # MinHash per half-window block, then each passage is the min of two adjacent blocks
+    if len(shingles) == 0:
+        return np.zeros((0, BANDS), dtype=np.uint64)
+    half = PASSAGE_SHINGLES // 2
+    with np.errstate(over="ignore"):
+        permuted = (_PERM_A[:, None] * shingles.astype(np.uint64)[None, :] + _PERM_B[:, None]) % _MERSENNE
+    starts = np.arange(0, len(shingles), half)
+    blocks = np.minimum.reduceat(permuted, starts, axis=1)
+    signatures = np.minimum(blocks[:, :-1], blocks[:, 1:]) if blocks.shape[1] > 1 else blocks
+    signatures = signatures.T.reshape(-1, BANDS, ROWS)
+    bands = np.zeros(signatures.shape[:2], dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for r in range(ROWS):
+            bands = bands * _BAND_MIX + signatures[:, :, r]
+    return bands
+
+
+def _ranges(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    # Concatenation of arange(lo[i], hi[i]) for every i, without a Python loop
+    lengths = hi - lo
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    skipped = np.cumsum(lengths) - lengths
+    return np.repeat(lo - skipped, lengths) + np.arange(total)
+
+_EMPTY = {
+    "mtime": None,
+    "sources": [],
+    "hashes": np.zeros((BANDS, 0), dtype=np.uint64),
+    "owners": np.zeros((BANDS, 0), dtype=np.int32),
+    "shingles": np.zeros(0, dtype=np.uint32),
+}
+
+
+class PlagiarismEngine:
+    def __init__(self, root: str = INDEX_DIR):
+        self.root = root
+        self._state = None  # snapshot of one committed ingest, see _load
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    # -----------------------------
+    # Read path (memory-mapped, reloaded after another worker's ingest)
+    # -----------------------------
+    def _read_meta(self):
+        try:
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _read_sources(self, count: int) -> list:
+        sources = []
+        if count:
+            with open(self._path("sources.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    if len(sources) == count:
+                        break
+                    sources.append(json.loads(line))
+        return sources
+
+    def _load(self) -> dict:
+        try:
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if self._state is not None and self._state["mtime"] == mtime:
+                return self._state
+            if mtime is None and not os.path.exists(self._path("sources.jsonl")):
+                self._state = _EMPTY
+                return self._state
+
+        os.makedirs(self.root, exist_ok=True)
+        with file_lock(self._path("lock")):
+            meta = self._read_meta()
+            if meta is None:
+                # Index written before meta.json existed: build the sorted table once
+                meta = self._commit(self._sizes_on_disk(), None)
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+            state = {
+                "mtime": mtime,
+                "sources": self._read_sources(meta["sources"]),
+                "hashes": self._table("band_hashes.npy", meta["passages"], np.uint64),
+                "owners": self._table("band_sources.npy", meta["passages"], np.int32),
+                "shingles": np.memmap(self._path("shingles.u32"), dtype=np.uint32, mode="r", shape=(meta["shingles"],))
+                if meta["shingles"] else _EMPTY["shingles"],
+            }
+        with self._lock:
+            self._state = state
+        return state
+
+    def _table(self, name: str, passages: int, dtype) -> np.ndarray:
+        if not passages:
+            return np.zeros((BANDS, 0), dtype=dtype)
+        return np.load(self._path(name), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._load()["sources"])
+
+    def warm(self):
+        # Map the index ahead of the first check
+        self._load()
+
+    # -----------------------------
+    # Ingest
+    # -----------------------------
+    def _sizes_on_disk(self) -> dict:
+        # Committed sizes of an index from before meta.json, taken from the files themselves
+        sources = []
+        if os.path.exists(self._path("sources.jsonl")):
+            with open(self._path("sources.jsonl"), "r", encoding="utf-8") as f:
+                sources = [json.loads(line) for line in f if line.strip()]
+        passages = os.path.getsize(self._path("passages.i32")) // 4 if os.path.exists(self._path("passages.i32")) else 0
+        return {
+            "sources": len(sources),
+            "sources_bytes": os.path.getsize(self._path("sources.jsonl")) if sources else 0,
+            "shingles": sources[-1]["offset"] + sources[-1]["count"] if sources else 0,
+            "passages": passages,
+        }
+
+    def _truncate(self, meta: dict):
+        # Drop whatever an interrupted ingest appended after the last commit
+        for name, size in (("sources.jsonl", meta["sources_bytes"]), ("shingles.u32", meta["shingles"] * 4),
+                           ("bands.u64", meta["passages"] * BANDS * 8), ("passages.i32", meta["passages"] * 4)):
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+            elif not os.path.exists(path):
+                open(path, "ab").close()
+
+    def _commit(self, meta: dict, old_meta) -> dict:
+        # Merge passages [old passages, meta passages) into the sorted band table,
+        # swap it in, then replace meta.json (the commit point for readers)
+        start = old_meta["passages"] if old_meta else 0
+        total = meta["passages"]
+        bands = np.memmap(self._path("bands.u64"), dtype=np.uint64, mode="r", shape=(total, BANDS)) \
+            if total else np.zeros((0, BANDS), dtype=np.uint64)
+        owners = np.fromfile(self._path("passages.i32"), dtype=np.int32, count=total - start, offset=start * 4) \
+            if total > start else np.zeros(0, dtype=np.int32)
+        if not total:
+            return self._write_meta(meta)
+        old_hashes = self._table("band_hashes.npy", start, np.uint64)
+        old_owners = self._table("band_sources.npy", start, np.int32)
+        hashes_tmp, owners_tmp = self._path("band_hashes.npy.tmp"), self._path("band_sources.npy.tmp")
+        out_hashes = np.lib.format.open_memmap(hashes_tmp, mode="w+", dtype=np.uint64, shape=(BANDS, total))
+        out_owners = np.lib.format.open_memmap(owners_tmp, mode="w+", dtype=np.int32, shape=(BANDS, total))
+        for b in range(BANDS):
+            new = np.asarray(bands[start:, b])
+            order = np.argsort(new, kind="stable")
+            at = np.searchsorted(old_hashes[b], new[order], side="right")
+            out_hashes[b] = np.insert(old_hashes[b], at, new[order])
+            out_owners[b] = np.insert(old_owners[b], at, owners[order])
+        out_hashes.flush()
+        out_owners.flush()
+        del out_hashes, out_owners, bands
+        os.replace(hashes_tmp, self._path("band_hashes.npy"))
+        os.replace(owners_tmp, self._path("band_sources.npy"))
+        return self._write_meta(meta)
+
+    def _write_meta(self, meta: dict) -> dict:
+        with open(self._path("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self._path("meta.json.tmp"), self._path("meta.json"))
+        return meta
+
+    def add(self, documents: list) -> dict:
+        # documents: list of (source_id, text)
+        os.makedirs(self.root, exist_ok=True)
+        with file_lock(self._path("lock")):
+            # Always start from what is on disk, not from this worker's snapshot
+            old_meta = self._read_meta()
+            if old_meta is None:
+                old_meta = self._commit(self._sizes_on_disk(), None)
+            self._truncate(old_meta)
+            sources = self._read_sources(old_meta["sources"])
+            known = {s["source_id"] for s in sources}
+            meta = dict(old_meta)
+            added = 0
+            with open(self._path("shingles.u32"), "ab") as shingle_file, \
+                    open(self._path("bands.u64"), "ab") as band_file, \
+                    open(self._path("passages.i32"), "ab") as passage_file, \
+                    open(self._path("sources.jsonl"), "ab") as source_file:
+                for source_id, text in documents:
+                    if source_id in known:
+                        continue
+                    known.add(source_id)
+                    shingles = shingle_hashes(tokenize(text)[0])
+                    bands = passage_bands(shingles)
+                    shingles.tofile(shingle_file)
+                    bands.tofile(band_file)
+                    np.full(len(bands), meta["sources"], dtype=np.int32).tofile(passage_file)
+                    source = {"source_id": source_id, "offset": meta["shingles"], "count": int(len(shingles))}
+                    line = (json.dumps(source, ensure_ascii=False) + "\n").encode("utf-8")
+                    source_file.write(line)
+                    meta["sources"] += 1
+                    meta["sources_bytes"] += len(line)
+                    meta["shingles"] += len(shingles)
+                    meta["passages"] += len(bands)
+                    added += 1
+            if added:
+                self._commit(meta, old_meta)
+        return {"added": added, "skipped": len(documents) - added, "total": meta["sources"]}
+
+    # -----------------------------
+    # Check
+    # -----------------------------
+    @staticmethod
+    def _candidates(state: dict, bands: np.ndarray) -> list:
+        # Sources sharing the most band hashes with the query's passages
+        found = []
+        for b in range(BANDS):
+            column = state["hashes"][b]
+            if len(column) == 0:
+                continue
+            left = np.searchsorted(column, bands[:, b], side="left")
+            right = np.searchsorted(column, bands[:, b], side="right")
+            found.append(np.asarray(state["owners"][b][_ranges(left, right)]))
+        if not found:
+            return []
+        hits = np.bincount(np.concatenate(found), minlength=len(state["sources"]))
+        ranked = np.argsort(-hits, kind="stable")[:MAX_CANDIDATES]
+        return [int(n) for n in ranked if hits[n] > 0]
+
+    def check(self, text: str, max_sections: int = 20) -> dict:
+        with tracing.stage("plagiarism_match"):
+            state = self._load()
+            sources = state["sources"]
+            word_hashes, spans = tokenize(text)
+            shingles = shingle_hashes(word_hashes)
+            if len(shingles) == 0:
+                return {"plagiarism_percentage": 0, "suspicious_sections": [], "matches": [],
+                        "sources_checked": len(sources)}
+
+            covered = np.zeros(len(spans), dtype=bool)
+            matches = []
+            for number in self._candidates(state, passage_bands(shingles)):
+                source = sources[number]
+                matched = np.isin(shingles, state["shingles"][source["offset"]:source["offset"] + source["count"]])
+                # Runs of consecutive matched shingles -> word ranges
+                edges = np.diff(np.concatenate([[0], matched.astype(np.int8), [0]]))
+                for start, end in zip(np.where(edges == 1)[0], np.where(edges == -1)[0]):
+                    last_word = end - 1 + SHINGLE_WORDS - 1
+                    if last_word - start + 1 < MIN_SPAN_WORDS:
+                        continue
+                    covered[start:last_word + 1] = True
+                    matches.append({
+                        "source_id": source["source_id"],
+                        "start_word": int(start),
+                        "end_word": int(last_word),
+                        "words": int(last_word - start + 1),
+                        "text": text[spans[start][0]:spans[last_word][1]],
+                    })
+
+            matches.sort(key=lambda m: m["words"], reverse=True)
+            return {
+                "plagiarism_percentage": round(float(covered.mean()) * 100, 2),
+                "suspicious_sections": [m["text"] for m in matches[:max_sections]],
+                "matches": matches[:max_sections],
+                "sources_checked": len(sources),
+            }
+
+
+# Process-wide instance
+engine = PlagiarismEngine()
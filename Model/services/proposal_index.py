@@ -0,0 +1,496 @@
+import json
+import os
+import re
+import threading
+
+import faiss
+import numpy as np
+
+from services import tracing
+from services.file_lock import file_lock
+
+# -----------------------------
+# Per-field vector index over extracted proposal JSONs
+# -----------------------------
+# Layout under PROPOSAL_INDEX_DIR:
+#   proposals.jsonl                 one record per proposal; line number == internal id (append-only)
+#   offsets.i64                     byte offset of each record in proposals.jsonl (append-only, memory-mapped)
+#   ids.jsonl                       proposal id per internal id (append-only)
+#   vectors_<field>.f32             (n, dim) float32, zero rows where the field is missing (append-only, memory-mapped)
+#   mask.u8                         (n, fields) field present for proposal (append-only, memory-mapped)
+#   index_<field>_<start>_<end>.faiss  ANN shard over internal ids [start, end)
+#   meta.json                       committed row count, dimension and shard list
+#   lock                            cross-process write lock
+# Each ingest batch becomes a new shard, merged with its predecessor while the
+# predecessor is no larger (like a binary counter), so there are O(log n)
+# shards and every vector is re-indexed O(log n) times instead of rewriting
+# everything per batch. Shards use PROPOSAL_INDEX_FACTORY (HNSW32 needs no
+# training and handles 100k proposals per field on one CPU); factories that
+# need training (e.g. "IVF1024,PQ32") are only used once a shard has enough
+# vectors to train them (39 per centroid), exact Flat search until then.
+# Ingest appends under the lock and replaces meta.json last; anything appended
+# past the committed row count (an ingest that died half-way) is truncated by
+# the next one. Every worker notices another worker's ingest through the mtime
+# of meta.json and then reads only the ids appended since. Workers keep just
+# the proposal ids in memory; stored field text is read from disk through
+# offsets.i64 for the records a caller asks for.
+INDEX_DIR = os.getenv("PROPOSAL_INDEX_DIR", os.path.join("data_files", "proposal_index"))
+FIELDS = [
+    f.strip()
+    for f in os.getenv(
+        "PROPOSAL_INDEX_FIELDS", "title,abstract,keywords,introduction,methodology,results,conclusion"
+    ).split(",")
+    if f.strip()
+]
+FACTORY = os.getenv("PROPOSAL_INDEX_FACTORY", "HNSW32")
+# Neighbours fetched per field and shard before exact re-scoring
+SEARCH_DEPTH = int(os.getenv("PROPOSAL_INDEX_DEPTH", "50"))
+# Field text kept per proposal for display and LLM re-scoring
+STORED_CHARS = 2000
+# faiss warns below 39 training points per centroid
+TRAIN_POINTS_PER_CENTROID = 39
+
+
+def field_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def min_train_rows(factory: str) -> int:
+    # Vectors needed before `factory` can be trained: IVF<nlist> needs nlist * 39,
+    # PQ codebooks 256 * 39
+    rows = 0
+    ivf = re.search(r"IVF(\d+)", factory)
+    if ivf:
+        rows = int(ivf.group(1)) * TRAIN_POINTS_PER_CENTROID
+    if "PQ" in factory:
+        rows = max(rows, 256 * TRAIN_POINTS_PER_CENTROID)
+    return rows
+
+class ProposalIndex:
+    def __init__(self, root: str = INDEX_DIR, fields: list = FIELDS, factory: str = FACTORY, encode=None):
+        self.root = root
+        self.fields = list(fields)
+        self.factory = factory
+        self._encode = encode
+        self._state = None  # snapshot of one committed ingest, see _load
+        self._shards = {}  # key: shard file name, value: faiss index (shard files never change)
+        self._lock = threading.Lock()
+
+    def encode(self, texts: list) -> np.ndarray:
+        if self._encode is None:
+            from services.embeddings import service
+            self._encode = service.encode
+        return self._encode(texts)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @staticmethod
+    def _shard_file(field: str, shard: dict) -> str:
+        return f"index_{field}_{shard['start']}_{shard['end']}.faiss"
+
+    # -----------------------------
+    # Read path (memory-mapped, reloaded after another worker's ingest)
+    # -----------------------------
+    def _read_meta(self):
+        try:
+            with open(self._path("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta["fields"] != self.fields:
+            raise ValueError(f"Index in {self.root} was built for fields {meta['fields']}, not {self.fields}")
+        return meta
+
+    def _scan_records(self, end: int):
+        # (byte offset, proposal id) of every record in proposals.jsonl before byte `end`
+        if not os.path.exists(self._path("proposals.jsonl")):
+            return
+        offset = 0
+        with open(self._path("proposals.jsonl"), "rb") as f:
+            for line in f:
+                if offset >= end:
+                    break
+                if line.strip():
+                    yield offset, json.loads(line)["proposal_id"]
+                offset += len(line)
+
+    def _read_ids(self, start: int, end: int) -> list:
+        # Proposal ids stored in ids.jsonl between bytes `start` and `end`
+        if end <= start:
+            return []
+        with open(self._path("ids.jsonl"), "rb") as f:
+            f.seek(start)
+            return [json.loads(line) for line in f.read(end - start).splitlines()]
+
+    def _committed_meta(self) -> dict:
+        # Called with the file lock held; converts indexes written by older versions
+        meta = self._read_meta()
+        if meta is None:
+            meta = self._migrate()
+        if "ids_bytes" not in meta:
+            meta = self._index_records(meta)
+        return meta
+
+    def _load(self) -> dict:
+        try:
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            previous = self._state
+            if previous is not None and previous["mtime"] == mtime:
+                return previous
+            if mtime is None and not os.path.exists(self._path("proposals.jsonl")):
+                self._state = {"mtime": None, "meta": None, "pids": [], "ids": {}, "shards": {}}
+                return self._state
+
+        os.makedirs(self.root, exist_ok=True)
+        with file_lock(self._path("lock")):
+            meta = self._committed_meta()
+            mtime = os.stat(self._path("meta.json")).st_mtime_ns
+            # Committed ids never change, so only the ones appended since the last load are read
+            if previous is not None and previous["meta"] is not None and previous["meta"]["count"] <= meta["count"]:
+                pids, ids = list(previous["pids"]), dict(previous["ids"])
+                new = self._read_ids(previous["meta"]["ids_bytes"], meta["ids_bytes"])
+            else:
+                pids, ids = [], {}
+                new = self._read_ids(0, meta["ids_bytes"])
+            for pid in new:
+                ids[pid] = len(pids)
+                pids.append(pid)
+            shards = {}
+            for field in self.fields:
+                shards[field] = []
+                for shard in meta["shards"]:
+                    if field in shard["fields"]:
+                        name = self._shard_file(field, shard)
+                        if name not in self._shards:
+                            self._shards[name] = faiss.read_index(self._path(name))
+                        shards[field].append(self._shards[name])
+        live = {self._shard_file(f, shard) for shard in meta["shards"] for f in shard["fields"]}
+        state = {
+            "mtime": mtime,
+            "meta": meta,
+            "pids": pids,
+            "ids": ids,
+            "offsets": self._offset_map(meta["count"]),
+            "mask": self._mask_map(meta["count"]),
+            "vectors": {field: self._vector_map(field, meta["count"], meta["dim"]) for field in self.fields},
+            "shards": shards,
+        }
+        with self._lock:
+            self._shards = {name: index for name, index in self._shards.items() if name in live}
+            self._state = state
+        return state
+
+    def _vector_map(self, field: str, count: int, dim: int) -> np.ndarray:
+        if not count:
+            return np.zeros((0, dim or 0), dtype="float32")
+        return np.memmap(self._path(f"vectors_{field}.f32"), dtype="float32", mode="r", shape=(count, dim))
+
+    def _mask_map(self, count: int) -> np.ndarray:
+        if not count:
+            return np.zeros((0, len(self.fields)), dtype=bool)
+        return np.memmap(self._path("mask.u8"), dtype=np.bool_, mode="r", shape=(count, len(self.fields)))
+
+    def _offset_map(self, count: int) -> np.ndarray:
+        if not count:
+            return np.zeros(0, dtype="int64")
+        return np.memmap(self._path("offsets.i64"), dtype="int64", mode="r", shape=(count,))
+
+    def _read_record(self, state: dict, row: int) -> dict:
+        offsets = state["offsets"]
+        start = int(offsets[row])
+        end = int(offsets[row + 1]) if row + 1 < len(offsets) else state["meta"]["records_bytes"]
+        with open(self._path("proposals.jsonl"), "rb") as f:
+            f.seek(start)
+            return json.loads(f.read(end - start))
+
+    def __len__(self) -> int:
+        return len(self._load()["pids"])
+
+    def record(self, proposal_id: str):
+        state = self._load()
+        i = state["ids"].get(proposal_id)
+        return None if i is None else self._read_record(state, i)
+
+    # -----------------------------
+    # Ingest
+    # -----------------------------
+    def _build_shard(self, field: str, start: int, end: int, meta: dict, col: int):
+        # ANN index over the rows in [start, end) that have `field`; None if there are none
+        mask = self._mask_map(meta["count"])[start:end, col]
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return None
+        vectors = np.ascontiguousarray(self._vector_map(field, meta["count"], meta["dim"])[start + rows])
+        factory = self.factory if len(rows) >= min_train_rows(self.factory) else "Flat"
+        index = faiss.IndexIDMap2(faiss.index_factory(meta["dim"], factory, faiss.METRIC_INNER_PRODUCT))
+        if not index.is_trained:
+            index.train(vectors)
+        index.add_with_ids(vectors, (start + rows).astype("int64"))
+        return index
+
+    def _write_shard(self, start: int, end: int, meta: dict) -> dict:
+        shard = {"start": start, "end": end, "fields": []}
+        for col, field in enumerate(self.fields):
+            index = self._build_shard(field, start, end, meta, col)
+            if index is None:
+                continue
+            path = self._path(self._shard_file(field, shard))
+            faiss.write_index(index, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            shard["fields"].append(field)
+        return shard
+
+    def _truncate(self, meta: dict):
+        # Drop whatever an interrupted ingest appended after the last commit
+        sizes = [("proposals.jsonl", meta["records_bytes"]), ("mask.u8", meta["count"] * len(self.fields)),
+                 ("offsets.i64", meta["count"] * 8), ("ids.jsonl", meta["ids_bytes"])]
+        sizes += [(f"vectors_{field}.f32", meta["count"] * (meta["dim"] or 0) * 4) for field in self.fields]
+        for name, size in sizes:
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _commit(self, meta: dict, obsolete: list):
+        meta["version"] += 1
+        with open(self._path("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self._path("meta.json.tmp"), self._path("meta.json"))
+        for shard in obsolete:
+            for field in shard["fields"]:
+                try:
+                    os.remove(self._path(self._shard_file(field, shard)))
+                except FileNotFoundError:
+                    pass
+
+    def _migrate(self) -> dict:
+        # Index written before meta.json (one .npy per field, rewritten per batch):
+        # convert it once to the append-only layout with a single shard
+        records = [pid for _, pid in self._scan_records(float("inf"))]
+        meta = {"fields": self.fields, "count": 0, "dim": None, "records_bytes": 0, "shards": [], "version": 0}
+        if records:
+            mask = np.load(self._path("mask.npy"))
+            mask.astype(np.bool_).tofile(self._path("mask.u8"))
+            for field in self.fields:
+                vectors = np.load(self._path(f"vectors_{field}.npy"), mmap_mode="r")
+                np.asarray(vectors, dtype="float32").tofile(self._path(f"vectors_{field}.f32"))
+                meta["dim"] = int(vectors.shape[1])
+            meta["count"] = len(records)
+            meta["records_bytes"] = os.path.getsize(self._path("proposals.jsonl"))
+            meta["shards"] = [self._write_shard(0, len(records), meta)]
+        meta = self._index_records(meta)
+        for name in ["mask.npy"] + [f"vectors_{f}.npy" for f in self.fields] + [f"index_{f}.faiss" for f in self.fields]:
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        return meta
+
+    def _index_records(self, meta: dict) -> dict:
+        # Index written before offsets.i64 / ids.jsonl: build them once from proposals.jsonl
+        offsets, pids = [], []
+        if meta["count"]:
+            for offset, pid in self._scan_records(meta["records_bytes"]):
+                offsets.append(offset)
+                pids.append(pid)
+        np.array(offsets, dtype="int64").tofile(self._path("offsets.i64"))
+        with open(self._path("ids.jsonl"), "wb") as f:
+            for pid in pids:
+                f.write((json.dumps(pid, ensure_ascii=False) + "\n").encode("utf-8"))
+        meta["ids_bytes"] = os.path.getsize(self._path("ids.jsonl"))
+        self._commit(meta, [])
+        return meta
+
+    def add(self, proposals: list) -> dict:
+        # proposals: list of (proposal_id, extracted JSON dict); already-indexed ids are skipped
+        snapshot = self._load()
+        known = snapshot["ids"]
+        fresh, seen = [], set()
+        for pid, data in proposals:
+            if pid in known or pid in seen:
+                continue
+            seen.add(pid)
+            fresh.append((pid, {f: field_text(data.get(f)) for f in self.fields}))
+        if not fresh:
+            return {"added": 0, "skipped": len(proposals), "total": len(snapshot["pids"])}
+
+        # Embedding is the slow part; it runs before taking the cross-process lock
+        mask = np.array([[bool(texts[f].strip()) for f in self.fields] for _, texts in fresh], dtype=np.bool_)
+        encoded = {}
+        for col, field in enumerate(self.fields):
+            rows = np.flatnonzero(mask[:, col])
+            if len(rows):
+                encoded[field] = (rows, _normalize(self.encode([fresh[r][1][field] for r in rows])))
+
+        os.makedirs(self.root, exist_ok=True)
+        with file_lock(self._path("lock")):
+            meta = self._committed_meta()
+            self._truncate(meta)
+            # Another worker may have added some of these since the snapshot above
+            since = snapshot["meta"]["ids_bytes"] if snapshot["meta"] else 0
+            added = set(self._read_ids(since, meta["ids_bytes"]))
+            keep = np.array([pid not in added for pid, _ in fresh], dtype=bool)
+            if not keep.any():
+                return {"added": 0, "skipped": len(proposals), "total": meta["count"]}
+            if meta["dim"] is None:
+                if encoded:
+                    meta["dim"] = int(next(iter(encoded.values()))[1].shape[1])
+                else:
+                    meta["dim"] = int(self.encode(["dimension probe"]).shape[1])
+
+            fresh = [item for item, k in zip(fresh, keep) if k]
+            start = meta["count"]
+            with open(self._path("mask.u8"), "ab") as f:
+                np.ascontiguousarray(mask[keep]).tofile(f)
+            for field in self.fields:
+                block = np.zeros((len(keep), meta["dim"]), dtype="float32")
+                if field in encoded:
+                    rows, vectors = encoded[field]
+                    block[rows] = vectors
+                with open(self._path(f"vectors_{field}.f32"), "ab") as f:
+                    block[keep].tofile(f)
+            offsets = []
+            with open(self._path("proposals.jsonl"), "ab") as f, open(self._path("ids.jsonl"), "ab") as id_file:
+                for pid, texts in fresh:
+                    record = {"proposal_id": pid, "fields": {k: v[:STORED_CHARS] for k, v in texts.items() if v}}
+                    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                    f.write(line)
+                    offsets.append(meta["records_bytes"])
+                    meta["records_bytes"] += len(line)
+                    id_line = (json.dumps(pid, ensure_ascii=False) + "\n").encode("utf-8")
+                    id_file.write(id_line)
+                    meta["ids_bytes"] += len(id_line)
+            with open(self._path("offsets.i64"), "ab") as f:
+                np.array(offsets, dtype="int64").tofile(f)
+            meta["count"] += len(fresh)
+
+            # New shard, merged with the previous ones while they are no larger
+            shards = list(meta["shards"])
+            obsolete = []
+            end = meta["count"]
+            while shards and shards[-1]["end"] - shards[-1]["start"] <= end - start:
+                previous = shards.pop()
+                obsolete.append(previous)
+                start = previous["start"]
+            shards.append(self._write_shard(start, end, meta))
+            meta["shards"] = shards
+            self._commit(meta, obsolete)
+            return {"added": len(fresh), "skipped": len(proposals) - len(fresh), "total": meta["count"],
+                    "shards": len(shards)}
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def _exact_scores(self, state: dict, query: dict, candidates: np.ndarray):
+        # Mean cosine over the fields present in both the query and each candidate
+        total = np.zeros(len(candidates), dtype="float32")
+        count = np.zeros(len(candidates), dtype="float32")
+        per_field = {}
+        for col, field in enumerate(self.fields):
+            if field not in query:
+                continue
+            present = np.asarray(state["mask"][candidates, col])
+            sims = np.asarray(state["vectors"][field][candidates]) @ query[field]
+            sims = np.where(present, sims, 0.0)
+            per_field[field] = sims
+            total += sims
+            count += present
+        return np.divide(total, count, out=np.zeros_like(total), where=count > 0), per_field
+
+    def search(self, data: dict, k: int = 10, exclude: str = None) -> list:
+        with tracing.stage("retrieval"):
+            state = self._load()
+            texts = {f: field_text(data.get(f)) for f in self.fields}
+            texts = {f: t for f, t in texts.items() if t.strip() and state["shards"].get(f)}
+            if not texts or not state["pids"]:
+                return []
+            names = list(texts)
+            vectors = _normalize(self.encode([texts[f] for f in names]))
+            query = dict(zip(names, vectors))
+
+            candidates = set()
+            for field in names:
+                for index in state["shards"][field]:
+                    _, found = index.search(query[field][None, :], SEARCH_DEPTH)
+                    candidates.update(int(i) for i in found[0] if i >= 0)
+            candidates.discard(state["ids"].get(exclude))
+            if not candidates:
+                return []
+
+            candidates = np.array(sorted(candidates), dtype="int64")
+            scores, per_field = self._exact_scores(state, query, candidates)
+            order = np.argsort(-scores)[:k]
+            mask = state["mask"]
+            return [
+                {
+                    "proposal_id": state["pids"][candidates[i]],
+                    "score": float(scores[i]) * 100,
+                    "field_scores": {f: float(s[i]) * 100 for f, s in per_field.items() if mask[candidates[i], self.fields.index(f)]},
+                }
+                for i in order
+            ]
+
+    def near_duplicates(self, threshold: float = 90.0, k: int = 20, batch_size: int = 4096) -> list:
+        # All-pairs report: ANN neighbours per field give candidate pairs, which are
+        # then scored exactly as the mean field cosine and filtered by `threshold` (0-100)
+        state = self._load()
+        if not state["pids"]:
+            return []
+        mask, pids = state["mask"], state["pids"]
+        cutoff = threshold / 100
+        # A pair can only average above the cutoff if at least one field is close to it
+        field_floor = max(0.0, cutoff - 0.1)
+        pairs = []
+        for col, field in enumerate(self.fields):
+            shards = state["shards"].get(field)
+            if not shards:
+                continue
+            rows = np.flatnonzero(mask[:, col])
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                queries = np.ascontiguousarray(state["vectors"][field][batch])
+                for index in shards:
+                    sims, found = index.search(queries, k + 1)
+                    src = np.repeat(batch, found.shape[1])
+                    dst, sims = found.ravel(), sims.ravel()
+                    keep = (dst >= 0) & (dst != src) & (sims >= field_floor)
+                    a, b = np.minimum(src[keep], dst[keep]), np.maximum(src[keep], dst[keep])
+                    pairs.append(np.stack([a, b], axis=1))
+        if not pairs:
+            return []
+        pairs = np.unique(np.concatenate(pairs), axis=0)
+
+        report = []
+        for start in range(0, len(pairs), 100000):
+            chunk = pairs[start:start + 100000]
+            a, b = chunk[:, 0], chunk[:, 1]
+            total = np.zeros(len(chunk), dtype="float32")
+            count = np.zeros(len(chunk), dtype="float32")
+            for col, field in enumerate(self.fields):
+                both = np.asarray(mask[a, col]) & np.asarray(mask[b, col])
+                vectors = state["vectors"][field]
+                sims = np.einsum("ij,ij->i", np.asarray(vectors[a]), np.asarray(vectors[b]))
+                total += np.where(both, sims, 0.0)
+                count += both
+            scores = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+            for i in np.flatnonzero(scores >= cutoff):
+                report.append({
+                    "proposal_a": pids[a[i]],
+                    "proposal_b": pids[b[i]],
+                    "score": float(scores[i]) * 100,
+                })
+        report.sort(key=lambda r: r["score"], reverse=True)
+        return report
+
+
+# Process-wide instance
+store = ProposalIndex()
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+
+from services import tracing
+
+# -----------------------------
+# Persistent analysis results (MongoDB)
+# -----------------------------
+# Every analysis endpoint stores its result keyed by endpoint, analysis version and
+# document hash (sha256 of the text the analysis ran on, plus any parameters that
+# change the result). A repeated request for the same document returns the stored
+# result instead of recomputing it. Requests that carry a proposal_id add it to the
+# result's proposal_ids, which is how a proposal's history is listed
+# (GET /results/{proposal_id}).
+# One pooled Motor client is created at app startup (MONGODB_URI, as in
+# config/db.py). Writes are buffered and sent as unordered bulk upserts every
+# RESULT_STORE_FLUSH_SECONDS or RESULT_STORE_BATCH results. Without MONGODB_URI,
+# or if Mongo is unreachable at startup, the store is disabled and endpoints
+# simply compute.
+# Bump ANALYSIS_VERSION (or ANALYSIS_VERSION_<ENDPOINT>) when a prompt or model
+# changes so stale results are no longer served.
+ENABLED = os.getenv("RESULT_STORE_ENABLED", "1") != "0"
+DB_NAME = os.getenv("RESULT_STORE_DB", "proposal_analysis")
+COLLECTION = os.getenv("RESULT_STORE_COLLECTION", "analysis_results")
+BATCH = int(os.getenv("RESULT_STORE_BATCH", "100"))
+FLUSH_SECONDS = float(os.getenv("RESULT_STORE_FLUSH_SECONDS", "1.0"))
+POOL_SIZE = int(os.getenv("RESULT_STORE_POOL_SIZE", "50"))
+TIMEOUT_MS = int(os.getenv("RESULT_STORE_TIMEOUT_MS", "2000"))
+ANALYSIS_VERSION = os.getenv("ANALYSIS_VERSION", "1")
+
+
+def analysis_version(endpoint: str) -> str:
+    env_key = "ANALYSIS_VERSION_" + endpoint.upper().replace("-", "_")
+    return os.getenv(env_key, ANALYSIS_VERSION)
+
+def document_hash(content, params: dict = None) -> str:
+    # content: extracted text, or any JSON-serialisable input (e.g. both compare-json files)
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(content.encode("utf-8"))
+    if params:
+        digest.update(b"\0" + json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def key_for(endpoint: str, doc_hash: str) -> str:
+    return f"{endpoint}:{analysis_version(endpoint)}:{doc_hash}"
+
+
+class ResultStore:
+    def __init__(self, batch: int = BATCH, flush_seconds: float = FLUSH_SECONDS):
+        self.batch = batch
+        self.flush_seconds = flush_seconds
+        self._client = None
+        self._collection = None
+        self._pending = {}  # key -> {"document": new result or None, "proposal_ids": set}
+        self._wakeup = None
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.write_errors = 0
+        self.read_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._collection is not None
+
+    async def connect(self):
+        # Called once from the app's startup hook
+        if not ENABLED or not os.getenv("MONGODB_URI") or self._client is not None:
+            return
+        try:
+            from config.db import connect_async_db
+            client = connect_async_db(maxPoolSize=POOL_SIZE, serverSelectionTimeoutMS=TIMEOUT_MS)
+            await client.admin.command("ping")
+            collection = client[DB_NAME][COLLECTION]
+            await collection.create_index([("proposal_ids", 1), ("created", -1)])
+            await collection.create_index([("doc_hash", 1), ("endpoint", 1)])
+        except Exception as e:
+            print(f"Result store disabled: {e}", file=sys.stderr)
+            return
+        self._client, self._collection = client, collection
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            self._client.close()
+        self._client = self._collection = None
+
+    # -----------------------------
+    # Read path
+    # -----------------------------
+    async def get(self, endpoint: str, doc_hash: str):
+        if not self.enabled:
+            return None
+        key = key_for(endpoint, doc_hash)
+        document = (self._pending.get(key) or {}).get("document")
+        if document is None:
+            try:
+                document = await self._collection.find_one({"_id": key}, {"result": 1})
+            except Exception:
+                self.read_errors += 1
+                return None
+        tracing.record_cache("result", document is not None)
+        if document is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return document["result"]
+
+    async def history(self, proposal_id: str, endpoint: str = None, limit: int = 50) -> list:
+        if not self.enabled:
+            return []
+        await self.flush()
+        query = {"proposal_ids": proposal_id}
+        if endpoint:
+            query["endpoint"] = endpoint
+        cursor = self._collection.find(query, {"_id": 0}).sort("created", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    # -----------------------------
+    # Write path
+    # -----------------------------
+    def _queue(self, key: str, document: dict = None, proposal_id: str = None):
+        entry = self._pending.setdefault(key, {"document": None, "proposal_ids": set()})
+        if document is not None:
+            entry["document"] = document
+        if proposal_id:
+            entry["proposal_ids"].add(proposal_id)
+        if len(self._pending) >= self.batch:
+            self._wakeup.set()
+
+    def put(self, endpoint: str, doc_hash: str, result, proposal_id: str = None):
+        if not self.enabled:
+            return
+        key = key_for(endpoint, doc_hash)
+        self._queue(key, {
+            "endpoint": endpoint,
+            "version": analysis_version(endpoint),
+            "doc_hash": doc_hash,
+            "result": result,
+            "created": time.time(),
+        }, proposal_id)
+
+    def link(self, endpoint: str, doc_hash: str, proposal_id: str):
+        # A stored result reused for another proposal also shows up in its history
+        if self.enabled and proposal_id:
+            self._queue(key_for(endpoint, doc_hash), proposal_id=proposal_id)
+
+    async def flush(self):
+        if not self.enabled or not self._pending:
+            return
+        from pymongo import UpdateOne
+        pending, self._pending = self._pending, {}
+        requests = []
+        for key, entry in pending.items():
+            # First write of a result wins; proposal ids accumulate
+            update = {"$setOnInsert": entry["document"]} if entry["document"] is not None else {}
+            if entry["proposal_ids"]:
+                update["$addToSet"] = {"proposal_ids": {"$each": sorted(entry["proposal_ids"])}}
+            requests.append(UpdateOne({"_id": key}, update, upsert=entry["document"] is not None))
+        try:
+            await self._collection.bulk_write(requests, ordered=False)
+            self.writes += len(requests)
+        except Exception as e:
+            self.write_errors += len(requests)
+            print(f"Result store bulk write failed: {e}", file=sys.stderr)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def cached(self, endpoint: str, content, compute, params: dict = None, proposal_id: str = None):
+        # Stored result for (endpoint, version, content, params), else compute() and store it
+        if not self.enabled:
+            return await compute()
+        doc_hash = document_hash(content, params)
+        result = await self.get(endpoint, doc_hash)
+        if result is not None:
+            self.link(endpoint, doc_hash, proposal_id)
+            return result
+        result = await compute()
+        if not (isinstance(result, dict) and "error" in result):
+            self.put(endpoint, doc_hash, result, proposal_id)
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "write_errors": self.write_errors,
+            "read_errors": self.read_errors,
+        }
+
+
+# Process-wide instance shared by every router
+store = ResultStore()
@@ -0,0 +1,275 @@
+import heapq
+import math
+import os
+import re
+from collections import deque
+
+import numpy as np
+
+# -----------------------------
+# Cycle-wide reviewer assignment
+# -----------------------------
+# Every proposal gets REVIEWERS_PER_PROPOSAL distinct reviewers, no reviewer gets
+# more than its capacity, and no reviewer shares an institute with the proposal
+# (its affiliation or collaborating institutions; see institute_key). Total
+# affinity is maximised.
+#  1. Sparse affinity: proposals are scored against every reviewer block-wise
+#     (one matrix product per block), conflicts are masked, and only the top
+#     ASSIGNMENT_CANDIDATES reviewers per proposal are kept.
+#  2. Auction (Bertsekas, "similar objects" variant, with epsilon scaling): each
+#     proposal slot bids for its best reviewer net of price; a reviewer with
+#     capacity c is c copies whose prices rise as they are outbid. A slot may
+#     also stay unassigned at value ASSIGNMENT_FLOOR, which keeps the auction
+#     finite when the sparse graph has no complete assignment.
+#  3. Slots still empty are filled from the full matrix, best reviewer with spare
+#     capacity first.
+# The result is within slots * epsilon of the optimal min-cost flow on the
+# candidate graph.
+PER_PROPOSAL = int(os.getenv("REVIEWERS_PER_PROPOSAL", "3"))
+CANDIDATES = int(os.getenv("ASSIGNMENT_CANDIDATES", "50"))
+CAPACITY_SLACK = float(os.getenv("ASSIGNMENT_CAPACITY_SLACK", "1.2"))
+EPSILON = float(os.getenv("ASSIGNMENT_EPSILON", "0.001"))
+FLOOR = float(os.getenv("ASSIGNMENT_FLOOR", "-1.0"))
+BLOCK = 1024
+# First word of an affiliation part that names a unit inside an institute ("Dept. of Mining")
+DEPARTMENT_WORDS = {"dept", "department", "division", "centre", "center", "lab", "laboratory", "group", "unit"}
+# Long institute names and the acronym they are usually written as
+INSTITUTE_ALIASES = {
+    "indian institute of science education and research": "iiser",
+    "indian institute of information technology": "iiit",
+    "indian institute of technology": "iit",
+    "indian institute of management": "iim",
+    "indian institute of science": "iisc",
+    "national institute of technology": "nit",
+}
+# Acronyms shared by several campuses; the campus is part of the name ("iit madras")
+CAMPUS_ACRONYMS = {"iiser", "iiit", "iit", "iim", "nit"}
+INSTITUTE_WORDS = {"university", "institute", "institution", "college", "academy", "polytechnic"} | set(INSTITUTE_ALIASES.values())
+
+
+def institute_key(name) -> str:
+    # "Dept. of Mining, IIT Madras" -> "iit madras". Of the comma/semicolon-separated
+    # parts, the first that names an institute (else the first that is not a
+    # department) is kept in order, with long names abbreviated; the other parts
+    # (departments, city, country) are dropped. Affiliations conflict when their keys are equal
+    text = re.sub(r"\([^)]*\)", " ", str(name or "").casefold())
+    parts = [" ".join(re.findall(r"[0-9a-z]+", part)) for part in re.split(r"[,;]", text)]
+    parts = [part for part in parts if part]
+    if not parts:
+        return ""
+    for i, part in enumerate(parts):
+        for long, short in INSTITUTE_ALIASES.items():
+            part = re.sub(rf"\b{long}\b", short, part)
+        parts[i] = re.sub(r"^the ", "", part)
+    first = next((i for i, part in enumerate(parts) if INSTITUTE_WORDS & set(part.split())),
+                 next((i for i, part in enumerate(parts) if part.split()[0] not in DEPARTMENT_WORDS), 0))
+    # "Indian Institute of Technology, Madras": the campus is in the next part
+    if parts[first] in CAMPUS_ACRONYMS and first + 1 < len(parts):
+        return f"{parts[first]} {parts[first + 1]}"
+    return parts[first]
+
+def proposal_affiliations(data: dict) -> list:
+    # Institute keys that conflict with a proposal, from the JSON extracted by /extract-json
+    names = [data.get("affiliation")]
+    institutions = data.get("collaborating_institutions") or []
+    names += institutions if isinstance(institutions, list) else [institutions]
+    return [key for key in (institute_key(name) for name in names) if key]
+
+def conflict_rows(affiliations: list, reviewer_affiliations: list) -> list:
+    # affiliations: per proposal, list of institute keys; reviewer_affiliations:
+    # one name per reviewer. -> per proposal, array of excluded reviewer indices
+    by_key = {}
+    for j, name in enumerate(reviewer_affiliations):
+        key = institute_key(name)
+        if key:
+            by_key.setdefault(key, []).append(j)
+    by_key = {key: np.array(rows, dtype="int64") for key, rows in by_key.items()}
+    empty = np.array([], dtype="int64")
+    return [
+        np.unique(np.concatenate([by_key[k] for k in keys if k in by_key])) if any(k in by_key for k in keys) else empty
+        for keys in affiliations
+    ]
+
+def default_capacity(proposals: int, reviewers: int, per_proposal: int) -> int:
+    return max(1, math.ceil(proposals * per_proposal * CAPACITY_SLACK / max(1, reviewers)))
+
+# -----------------------------
+# Sparse affinity
+# -----------------------------
+def _block_scores(proposals: np.ndarray, reviewers: np.ndarray, conflicts: list, start: int) -> np.ndarray:
+    scores = np.asarray(proposals[start:start + BLOCK] @ reviewers.T, dtype="float32")
+    for row, excluded in enumerate(conflicts[start:start + BLOCK]):
+        if len(excluded):
+            scores[row, excluded] = -np.inf
+    return scores
+
+def candidate_graph(proposals: np.ndarray, reviewers: np.ndarray, conflicts: list, k: int = CANDIDATES) -> tuple:
+    # -> (candidates (n, k) int32 reviewer indices, affinities (n, k) float32; -inf = no edge)
+    k = min(k, len(reviewers))
+    candidates = np.empty((len(proposals), k), dtype="int32")
+    affinities = np.empty((len(proposals), k), dtype="float32")
+    for start in range(0, len(proposals), BLOCK):
+        scores = _block_scores(proposals, reviewers, conflicts, start)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidates[start:start + len(top)] = top
+        affinities[start:start + len(top)] = np.take_along_axis(scores, top, axis=1)
+    return candidates, affinities
+
+# -----------------------------
+# Auction
+# -----------------------------
+def auction(candidates: np.ndarray, affinities: np.ndarray, per_proposal: int, capacity: np.ndarray,
+            epsilon: float = EPSILON, floor: float = FLOOR) -> tuple:
+    # -> (held (n * per_proposal,) reviewer per slot or -1, number of bids)
+    n = len(candidates)
+    reviewers = len(capacity)
+    slots = n * per_proposal
+    # Spare capacity goes to dummy bidders that value every reviewer at 0, so every
+    # copy ends up held; that keeps prices carried across epsilon phases exact
+    bidders = int(capacity.sum())
+    spread = float(np.max(affinities[np.isfinite(affinities)], initial=0.0)) - floor
+    phases = []
+    step = spread / 4
+    while step > epsilon:
+        phases.append(step)
+        step /= 6
+    phases.append(epsilon)
+
+    # A reviewer is a heap of copies [price, tiebreak, holding bidder]
+    heaps = [[[0.0, c, -1] for c in range(int(capacity[j]))] for j in range(reviewers)]
+    cheapest = np.array([0.0 if capacity[j] else np.inf for j in range(reviewers)])
+    held = np.full(bidders, -1, dtype="int64")
+    bids = 0
+    for eps in phases:
+        # Dummy bids lift all prices together; re-anchor at 0 so FLOOR keeps its meaning
+        finite = cheapest[np.isfinite(cheapest)]
+        shift = float(finite.min()) if len(finite) else 0.0
+        for heap in heaps:
+            for copy in heap:
+                copy[0] -= shift
+                copy[2] = -1
+        cheapest -= shift
+        held[:] = -1
+        queue = deque(range(bidders))
+        while queue:
+            bidder = queue.popleft()
+            if bidder < slots:
+                i = bidder // per_proposal
+                row = candidates[i]
+                gains = affinities[i]
+                values = gains - cheapest[row]
+                for sibling in held[i * per_proposal:(i + 1) * per_proposal]:
+                    if sibling >= 0:
+                        values[row == sibling] = -np.inf
+            else:
+                row = None
+                values = -cheapest
+            if len(values) > 1:
+                top2 = np.argpartition(-values, 1)[:2]
+                best, second = (top2[0], top2[1]) if values[top2[0]] >= values[top2[1]] else (top2[1], top2[0])
+                w2 = values[second]
+            else:
+                best, w2 = 0, -np.inf
+            w1 = values[best]
+            if row is not None and not w1 > floor:
+                continue  # left unassigned; filled after the auction
+            j = int(row[best]) if row is not None else int(best)
+            heap = heaps[j]
+            # Indifferent between copies: the second-cheapest copy of j is also an alternative
+            if len(heap) > 1:
+                gain = gains[best] if row is not None else 0.0
+                w2 = max(w2, gain - min(c[0] for c in heap[1:3]))
+            if row is not None:
+                w2 = max(w2, floor)
+            copy = heapq.heappop(heap)
+            displaced = copy[2]
+            heapq.heappush(heap, [copy[0] + (w1 - w2) + eps, copy[1], bidder])
+            cheapest[j] = heap[0][0]
+            held[bidder] = j
+            bids += 1
+            if displaced >= 0:
+                held[displaced] = -1
+                queue.append(displaced)
+    held = held[:slots]
+    return held, bids
+
+# -----------------------------
+# Public API
+# -----------------------------
+def assign(proposals: np.ndarray, reviewers: np.ndarray, conflicts: list, per_proposal: int = PER_PROPOSAL,
+           capacity=None, k: int = CANDIDATES, epsilon: float = EPSILON) -> dict:
+    # proposals (n, dim), reviewers (m, dim): L2-normalized embeddings.
+    # capacity: int, per-reviewer array, or None for an even share plus slack.
+    # -> {"reviewers": (n, per_proposal) int (-1 = none), "scores": (n, per_proposal) float, "stats": {...}}
+    n, m = len(proposals), len(reviewers)
+    if capacity is None:
+        capacity = default_capacity(n, m, per_proposal)
+    capacity = np.broadcast_to(np.asarray(capacity, dtype="int64"), (m,)).copy()
+    if capacity.sum() < n * per_proposal:
+        raise ValueError(f"Total reviewer capacity {int(capacity.sum())} is below the {n * per_proposal} reviews needed")
+
+    candidates, affinities = candidate_graph(proposals, reviewers, conflicts, k)
+    held, bids = auction(candidates, affinities, per_proposal, capacity, epsilon)
+    held = held.reshape(n, per_proposal)
+
+    # Fill empty slots from the full (conflict-masked) matrix
+    load = np.bincount(held[held >= 0], minlength=m)
+    filled = 0
+    for i in np.flatnonzero((held < 0).any(axis=1)):
+        scores = _block_scores(proposals[i:i + 1], reviewers, conflicts[i:i + 1], 0)[0]
+        scores[load >= capacity] = -np.inf
+        scores[held[i][held[i] >= 0]] = -np.inf
+        for slot in np.flatnonzero(held[i] < 0):
+            j = int(np.argmax(scores))
+            if not np.isfinite(scores[j]):
+                break
+            held[i, slot] = j
+            load[j] += 1
+            scores[j] = -np.inf
+            filled += 1
+
+    scores = np.full(held.shape, np.nan, dtype="float32")
+    assigned = held >= 0
+    rows = np.nonzero(assigned)[0]
+    scores[assigned] = np.einsum("ij,ij->i", proposals[rows], reviewers[held[assigned]])
+    # Best reviewers first within each proposal
+    order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), axis=1)
+    held = np.take_along_axis(held, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    return {
+        "reviewers": held,
+        "scores": scores,
+        "stats": {
+            "proposals": n,
+            "reviewers": m,
+            "per_proposal": per_proposal,
+            "assigned": int(assigned.sum()),
+            "unassigned": int((~assigned).sum()),
+            "filled_outside_candidates": filled,
+            "bids": bids,
+            "total_affinity": float(np.nansum(scores)),
+            "mean_affinity": float(np.nanmean(scores)) if assigned.any() else None,
+            "max_load": int(load.max()) if m else 0,
+            "capacity": int(capacity.max()) if m else 0,
+        },
+    }
+
+def assign_cycle(proposals: list, per_proposal: int = PER_PROPOSAL, capacity=None, k: int = CANDIDATES) -> dict:
+    # proposals: [(proposal_id, extracted JSON)], reviewers from the faculty index
+    from services.faculty_index import store as faculty_index
+    vectors, affiliation_ids, affiliations = faculty_index.matrix()
+    reviewer_affiliations = [affiliations[a] if a >= 0 else "" for a in affiliation_ids]
+    texts = [f"{data.get('title', '')}\n{data.get('abstract', '')}".strip() for _, data in proposals]
+    query = np.concatenate([faculty_index.query_vectors(texts[s:s + BLOCK]) for s in range(0, len(texts), BLOCK)])
+    conflicts = conflict_rows([proposal_affiliations(data) for _, data in proposals], reviewer_affiliations)
+    result = assign(query, vectors, conflicts, per_proposal, capacity, k)
+    assignments = []
+    for (pid, _), row, row_scores in zip(proposals, result["reviewers"], result["scores"]):
+        assignments.append({
+            "proposal_id": pid,
+            "reviewers": [
+                {"faculty_id": int(j), **faculty_index.record(int(j)), "score": float(s) * 100}
+                for j, s in zip(row, row_scores) if j >= 0
+            ],
+        })
+    return {"assignments": assignments, "stats": result["stats"]}
@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+import os
+import time
+import traceback
+
+from services.executor import run_in_thread
+
+# -----------------------------
+# Deferred router loading and warm-up
+# -----------------------------
+# With LAZY_STARTUP=1 (the default) main.py only imports FastAPI and this module.
+# Router modules (LangChain, Gemini SDK, FAISS, PDF libraries) are imported by a
+# background task after the server starts accepting connections, followed by the
+# warm-ups (embedding model, guidelines index, ...). /health answers at once;
+# /ready reports progress and returns 503 until everything is loaded. Requests
+# for other paths wait for the routers instead of getting a 404.
+LAZY = os.getenv("LAZY_STARTUP", "1") == "1"
+WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+
+def load_object(spec: str):
+    # "package.module:attribute.path" -> object
+    module_name, path = spec.split(":")
+    obj = importlib.import_module(module_name)
+    for attr in path.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+class Startup:
+    def __init__(self, routers: list, warmups: list):
+        self.routers = routers    # ["RAG.timeline:router", ...]
+        self.warmups = warmups    # [(name, "module:callable"), ...], each called with no arguments
+        self.router_status = {spec: "pending" for spec in routers}
+        self.warmup_status = {name: "pending" for name, _ in warmups}
+        self.started = time.time()
+        self.timings = {}
+        self.routers_loaded = asyncio.Event()
+        self._included = False
+        self._task = None
+
+    def include_routers(self, app):
+        for spec in self.routers:
+            start = time.perf_counter()
+            try:
+                app.include_router(load_object(spec))
+                self.router_status[spec] = "loaded"
+            except Exception as e:
+                self.router_status[spec] = f"error: {e}"
+                traceback.print_exc()
+            self.timings[spec] = round(time.perf_counter() - start, 3)
+        # Routes added after the first /docs request would be missing from the cached schema
+        app.openapi_schema = None
+        self._included = True
+
+    def run_warmups(self):
+        for name, spec in self.warmups:
+            start = time.perf_counter()
+            try:
+                load_object(spec)()
+                self.warmup_status[name] = "done"
+            except Exception as e:
+                self.warmup_status[name] = f"error: {e}"
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    async def _background(self, app):
+        if not self._included:
+            # Imports run in a worker thread so the event loop keeps serving /health
+            for spec in self.routers:
+                start = time.perf_counter()
+                try:
+                    await run_in_thread(importlib.import_module, spec.split(":")[0])
+                except Exception:
+                    pass  # reported by include_routers
+                self.timings[f"import {spec}"] = round(time.perf_counter() - start, 3)
+            self.include_routers(app)
+        self.routers_loaded.set()
+        if WARMUP:
+            await run_in_thread(self.run_warmups)
+
+    def start(self, app):
+        # Called from the app's startup event
+        self._task = asyncio.get_running_loop().create_task(self._background(app))
+
+    def load_eagerly(self, app):
+        # LAZY_STARTUP=0: import and include everything before the app is served
+        self.include_routers(app)
+
+    @property
+    def ready(self) -> bool:
+        # Failed routers or warm-ups do not block readiness; they are listed in status()
+        waiting = list(self.router_status.values()) + (list(self.warmup_status.values()) if WARMUP else [])
+        return "pending" not in waiting
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "lazy": LAZY,
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "routers": self.router_status,
+            "warmups": self.warmup_status,
+            "timings": self.timings,
+        }
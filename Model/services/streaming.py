@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from fastapi.responses import StreamingResponse
+
+from services import tracing
+
+# -----------------------------
+# Streaming responses
+# -----------------------------
+# Shared by the SSE routes below and the NDJSON map-reduce routes
+# (services/longdoc.py): `encode` turns one item of `events` into a frame, and a
+# failure is sent as the item `error_item(exception)`.
+def stream_response(events, encode, error_item, media_type: str,
+                    limit: asyncio.Semaphore = None, headers: dict = None) -> StreamingResponse:
+    # `limit` is held for the whole stream, since the body runs after the route returns
+    async def _body():
+        try:
+            if limit is not None:
+                await limit.acquire()
+            async for item in events:
+                yield encode(item)
+        except Exception as e:
+            yield encode(error_item(e))
+        finally:
+            if limit is not None:
+                limit.release()
+    return StreamingResponse(_body(), media_type=media_type, headers=headers)
+
+# -----------------------------
+# Server-sent events
+# -----------------------------
+# Streaming routes yield (event name, JSON payload) pairs. The order is always
+# "sources" (retrieved chunks, sent as soon as retrieval finishes), then any
+# number of "token" events, then one "final" event carrying the same payload
+# the non-streaming route returns. Failures become an "error" event.
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response(events, limit: asyncio.Semaphore = None) -> StreamingResponse:
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return stream_response(events, lambda item: sse_event(*item), lambda e: ("error", {"error": str(e)}),
+                           "text/event-stream", limit, headers)
+
+# -----------------------------
+# Retrieval-augmented answers
+# -----------------------------
+def source_payload(doc) -> dict:
+    return {
+        "chunk_id": doc.metadata.get("chunk_id"),
+        "source": doc.metadata.get("source"),
+        "page": doc.metadata.get("page"),
+        "text": doc.page_content,
+    }
+
+async def single_event(event: str, data):
+    yield event, data
+
+async def rag_events(store, question: str, prompt_template, llm, final: dict, k: int = 5):
+    # Same retrieval and "stuff" prompt as RetrievalQA, but the LLM output is streamed.
+    # The "final" event is `final` plus the complete "answer".
+    with tracing.stage("retrieval"):
+        docs = await store.asimilarity_search(question, k=k)
+    yield "sources", [source_payload(d) for d in docs]
+
+    prompt = prompt_template.format(context="\n\n".join(d.page_content for d in docs), question=question)
+    parts = []
+    async for token in llm.astream(prompt):
+        parts.append(token)
+        yield "token", {"text": token}
+    yield "final", {**final, "answer": "".join(parts)}
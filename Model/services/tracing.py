@@ -0,0 +1,237 @@
+import contextlib
+import contextvars
+import os
+import sys
+import time
+import uuid
+
+# -----------------------------
+# Per-stage latency, token and cache instrumentation
+# -----------------------------
+# Services wrap their expensive steps in `stage(name)`: document parsing, PDF
+# extraction, embedding, FAISS / index retrieval, LLM calls. Each stage is
+# recorded as a Prometheus histogram labelled with the route template of the
+# current request, e.g. "/batch-jobs/{job_id}/resume" ("other" when no route
+# matched, so label values stay bounded by the app's routes) (GET /metrics), listed in the response's Server-Timing header, and,
+# with TRACING_OTEL=1, opened as an OpenTelemetry span (exporter configured by
+# the standard OTEL_* variables). LLM calls also record token and prompt sizes;
+# caches record hits and misses.
+# With PROFILING_ENABLED=1 a request carrying the X-Profile header is run under
+# a sampling profiler (pyinstrument); the report is saved under PROFILE_DIR and
+# its id returned in X-Profile-Id (GET /profiles/{id}).
+# prometheus_client, opentelemetry and pyinstrument are optional: without them
+# the corresponding output is simply off.
+ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+OTEL = os.getenv("TRACING_OTEL", "0") == "1"
+PROFILING = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile").lower().encode("latin-1")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("data_files", "profiles"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_scope = contextvars.ContextVar("tracing_scope", default=None)  # ASGI scope of the current request
+_stages = contextvars.ContextVar("tracing_stages", default=None)  # per request: [(stage, seconds)]
+_metrics = None
+_tracer = None
+
+
+def _prometheus():
+    # Metrics are registered on first use; None when prometheus_client is missing
+    global _metrics
+    if _metrics is None:
+        try:
+            from prometheus_client import Counter, Histogram
+        except ImportError:
+            _metrics = {}
+            return _metrics
+        _metrics = {
+            "request": Histogram("model_request_seconds", "Request latency", ["endpoint", "status"],
+                                 buckets=LATENCY_BUCKETS),
+            "stage": Histogram("model_stage_seconds", "Latency per processing stage", ["endpoint", "stage"],
+                               buckets=LATENCY_BUCKETS),
+            "stage_errors": Counter("model_stage_errors_total", "Failed stages", ["endpoint", "stage", "error"]),
+            "tokens": Counter("model_llm_tokens_total", "LLM tokens (estimated)", ["endpoint", "model", "direction"]),
+            "prompt_chars": Histogram("model_llm_prompt_chars", "LLM prompt size in characters", ["endpoint", "model"],
+                                      buckets=SIZE_BUCKETS),
+            "cache": Counter("model_cache_lookups_total", "Cache lookups", ["cache", "endpoint", "result"]),
+        }
+    return _metrics
+
+def _otel_tracer():
+    global _tracer
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+            _tracer = trace.get_tracer("model")
+        except ImportError:
+            _tracer = False
+    return _tracer or None
+
+def endpoint() -> str:
+    # The router stores the matched route in the request scope, which is shared
+    # with this middleware, so the template is known from the endpoint onwards
+    scope = _scope.get()
+    if scope is None:
+        return ""
+    return getattr(scope.get("route"), "path", None) or "other"
+
+# -----------------------------
+# Recording
+# -----------------------------
+def observe(name: str, seconds: float, error: str = None):
+    # Records one stage run timed by the caller (streams, LangChain callbacks)
+    if not ENABLED:
+        return
+    metrics = _prometheus()
+    if metrics:
+        metrics["stage"].labels(endpoint(), name).observe(seconds)
+        if error:
+            metrics["stage_errors"].labels(endpoint(), name, error).inc()
+    stages = _stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+@contextlib.contextmanager
+def stage(name: str, **attributes):
+    # Times a block; usable in sync and async code (contextvars follow run_in_thread)
+    if not ENABLED:
+        yield
+        return
+    tracer = _otel_tracer() if OTEL else None
+    span = tracer.start_as_current_span(name, attributes=attributes) if tracer else contextlib.nullcontext()
+    start = time.perf_counter()
+    error = None
+    try:
+        with span:
+            yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, error)
+
+def record_llm(model: str, input_tokens: int, output_tokens: int, prompt_chars: int):
+    metrics = _prometheus() if ENABLED else None
+    if metrics:
+        metrics["tokens"].labels(endpoint(), model, "input").inc(input_tokens)
+        metrics["tokens"].labels(endpoint(), model, "output").inc(output_tokens)
+        metrics["prompt_chars"].labels(endpoint(), model).observe(prompt_chars)
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    metrics = _prometheus() if ENABLED else None
+    if metrics and count:
+        metrics["cache"].labels(cache, endpoint(), "hit" if hit else "miss").inc(count)
+
+_callbacks = None
+
+def langchain_callbacks() -> list:
+    # Callback handlers for chain.ainvoke(..., config={"callbacks": ...}): times the
+    # retriever (embedding + FAISS search) inside LangChain chains as "retrieval"
+    global _callbacks
+    if not ENABLED:
+        return []
+    if _callbacks is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class RetrieverTimer(BaseCallbackHandler):
+            run_inline = True  # same context as the request, so the endpoint label applies
+
+            def __init__(self):
+                self._started = {}
+
+            def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+                self._started[run_id] = time.perf_counter()
+
+            def on_retriever_end(self, documents, *, run_id, **kwargs):
+                if run_id in self._started:
+                    observe("retrieval", time.perf_counter() - self._started.pop(run_id))
+
+            def on_retriever_error(self, error, *, run_id, **kwargs):
+                if run_id in self._started:
+                    observe("retrieval", time.perf_counter() - self._started.pop(run_id), type(error).__name__)
+
+        _callbacks = [RetrieverTimer()]
+    return _callbacks
+
+def metrics_payload() -> tuple:
+    # -> (body, content type) for GET /metrics, or None without prometheus_client
+    if not _prometheus():
+        return None
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def server_timing(stages: list) -> str:
+    # Repeated stages (e.g. one LLM call per chunk) are summed: "llm;dur=812.4;desc=x3"
+    totals = {}
+    for name, seconds in stages:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + seconds, count + 1)
+    return ", ".join(f"{name};dur={total * 1000:.1f}" + (f";desc=x{count}" if count > 1 else "")
+                     for name, (total, count) in totals.items())
+
+def profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.html")
+
+# -----------------------------
+# Middleware
+# -----------------------------
+class TracingMiddleware:
+    # ASGI: sets the endpoint label, times the request, adds Server-Timing and
+    # runs the opt-in profiler
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        stages = []
+        scope_token = _scope.set(scope)
+        stages_token = _stages.set(stages)
+        status = {"code": 500}
+        profiler, profile_id = None, None
+        if PROFILING and any(key == PROFILE_HEADER for key, _ in scope.get("headers", [])):
+            profiler, profile_id = self._start_profiler()
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                if stages:
+                    headers.append((b"server-timing", server_timing(stages).encode("latin-1")))
+                if profile_id:
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            metrics = _prometheus()
+            if metrics:
+                metrics["request"].labels(endpoint(), str(status["code"])).observe(time.perf_counter() - start)
+            if profiler is not None:
+                self._save_profile(profiler, profile_id)
+            _stages.reset(stages_token)
+            _scope.reset(scope_token)
+
+    @staticmethod
+    def _start_profiler() -> tuple:
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            return None, None
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        profiler.start()
+        return profiler, uuid.uuid4().hex
+
+    @staticmethod
+    def _save_profile(profiler, profile_id: str):
+        try:
+            profiler.stop()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(profile_path(profile_id), "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        except Exception as e:
+            print(f"Profile {profile_id} not saved: {e}", file=sys.stderr)
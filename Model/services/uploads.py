@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from services.executor import run_in_thread
+
+# -----------------------------
+# Bounded-memory upload handling
+# -----------------------------
+# Uploads are never read into memory as a whole. Starlette already spools the
+# multipart body to a temporary file; routes copy it to a named file in
+# UPLOAD_CHUNK_BYTES pieces and parsers read from that path.
+# Size limits are checked twice:
+#   - UploadLimitMiddleware answers 413 from Content-Length, before the body is read,
+#     and stops chunked bodies as soon as they pass the limit
+#   - spool() stops copying once a single file passes it
+# UPLOAD_MAX_BYTES is the default limit (0 = unlimited). A per-endpoint override
+# uses the same naming as ENDPOINT_CONCURRENCY_*, e.g. UPLOAD_MAX_BYTES_BATCH_JOBS.
+MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(256 * 1024 * 1024)))
+CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # None = system temp dir
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+        self.limit = limit
+
+    def __str__(self):
+        return self.detail
+
+
+def max_bytes(endpoint: str) -> int:
+    env_key = "UPLOAD_MAX_BYTES_" + endpoint.upper().replace("-", "_")
+    return int(os.getenv(env_key, str(MAX_BYTES)))
+
+def endpoint_for_path(path: str) -> str:
+    # "/check-plagiarism" -> "check-plagiarism", "/batch-jobs/abc/resume" -> "batch-jobs"
+    return path.strip("/").split("/")[0]
+
+def spool(source, suffix: str = "", limit: int = MAX_BYTES) -> str:
+    # Copy a file object, from its current position, to a named temporary file in
+    # chunks; the caller removes it
+    written = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=SPOOL_DIR) as tmp:
+        try:
+            while chunk := source.read(CHUNK_BYTES):
+                written += len(chunk)
+                if limit and written > limit:
+                    raise UploadTooLarge(limit)
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    return tmp.name
+
+async def spool_upload(file, endpoint: str, suffix: str = None) -> str:
+    # UploadFile -> path of a temporary copy (removed by the caller)
+    if suffix is None:
+        suffix = os.path.splitext(file.filename or "")[1]
+    return await run_in_thread(spool, file.file, suffix, max_bytes(endpoint))
+
+@asynccontextmanager
+async def spooled(file, endpoint: str, suffix: str = None):
+    path = await spool_upload(file, endpoint, suffix)
+    try:
+        yield path
+    finally:
+        os.remove(path)
+
+def load_json(path: str):
+    with open(path, "rb") as f:
+        return json.load(f)
+
+async def json_upload(file, endpoint: str):
+    # Parsed JSON from an upload, read from its spooled copy off the event loop
+    async with spooled(file, endpoint, ".json") as path:
+        return await run_in_thread(load_json, path)
+
+
+class UploadLimitMiddleware:
+    # Plain ASGI middleware so the check runs before Starlette parses the multipart body
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            return await self.app(scope, receive, send)
+        limit = max_bytes(endpoint_for_path(scope["path"]))
+        if not limit:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse(content={"error": str(UploadTooLarge(limit))}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def _receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing, so FastAPI answers it as a 413
+                    raise UploadTooLarge(limit)
+            return message
+
+        await self.app(scope, _receive, send)
@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks import fake_gemini
+from RAG import analyze, plag
+from services import gemini, llm_cache
+from services.longdoc import chunk_text
+from services.plagiarism_engine import PlagiarismEngine
+
+# /analyze's combined prompt against benchmarks/fake_gemini.py: one Gemini call
+# per chunk whichever analyses are selected.
+
+WORDS = "grant proposal pilot study sensor network mining safety evaluation budget".split()
+TEXT = "\n".join(
+    " ".join(WORDS[(p * 7 + i) % len(WORDS)] + str(p * 100 + i) for i in range(400)) for p in range(12)
+)
+
+
+@pytest.fixture(autouse=True)
+def fake(monkeypatch, tmp_path):
+    monkeypatch.setattr(fake_gemini, "LATENCY", 0.0)
+    monkeypatch.setattr(fake_gemini, "ERROR_RATE", 0.0)
+    monkeypatch.setattr(fake_gemini, "counts", {"requests": 0, "errors": 0})
+    monkeypatch.setattr(llm_cache, "ENABLED", False)
+    client = gemini.GeminiClient(endpoint="http://fake-gemini", rpm=0, tpm=0)
+    client._http = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_gemini.app), base_url="http://fake-gemini")
+    monkeypatch.setattr(gemini, "client", client)
+    engine = PlagiarismEngine(str(tmp_path / "plagiarism"))
+    monkeypatch.setattr(analyze, "plagiarism_engine", engine)
+    monkeypatch.setattr(plag, "plagiarism_engine", engine)
+    return engine
+
+def chunks() -> int:
+    return len(chunk_text(TEXT))
+
+
+def test_without_corpus_every_section_shares_one_call_per_chunk():
+    result = asyncio.run(analyze.run_analyses(TEXT, ["plagiarism", "novelty", "cost"]))
+
+    assert chunks() > 1
+    assert fake_gemini.counts["requests"] == chunks()
+    assert result["fallback_sections"] == []
+    assert result["results"]["plagiarism"]["plagiarism_percentage"] == 12
+    assert result["results"]["novelty"]["chunks"] == chunks()
+
+def test_with_corpus_the_local_engine_decides(fake):
+    fake.add([("source.txt", TEXT)])
+
+    result = asyncio.run(analyze.run_analyses(TEXT, ["plagiarism", "novelty"]))
+
+    plagiarism = result["results"]["plagiarism"]
+    assert plagiarism["engine"] == "minhash" and plagiarism["plagiarism_percentage"] == 100
+    assert "llm_review" not in plagiarism
+    assert fake_gemini.counts["requests"] == chunks()
+
+def test_borderline_score_is_reviewed_in_the_combined_prompt(fake, monkeypatch):
+    fake.add([("source.txt", TEXT)])
+    monkeypatch.setattr(plag, "LLM_BORDERLINE_LOW", 0)
+    monkeypatch.setattr(plag, "LLM_BORDERLINE_HIGH", 100)
+
+    result = asyncio.run(analyze.run_analyses(TEXT, ["plagiarism", "cost"]))
+
+    plagiarism = result["results"]["plagiarism"]
+    assert plagiarism["engine"] == "minhash"
+    assert plagiarism["llm_review"]["plagiarism_percentage"] == 12
+    assert fake_gemini.counts["requests"] == chunks()
+
+def test_only_local_plagiarism_needs_no_llm(fake):
+    fake.add([("source.txt", TEXT)])
+
+    result = asyncio.run(analyze.run_analyses(TEXT, ["plagiarism"]))
+
+    assert result["results"]["plagiarism"]["engine"] == "minhash"
+    assert fake_gemini.counts["requests"] == 0
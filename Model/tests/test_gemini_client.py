@@ -0,0 +1,191 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from benchmarks import fake_gemini
+from services import gemini
+from services.gemini import CircuitBreaker, GeminiClient, GeminiLLM, LLMUnavailable
+
+# GeminiClient against benchmarks/fake_gemini.py, served in-process through
+# httpx's ASGI transport instead of a port.
+
+MODEL = "gemini-2.5-flash-lite"
+
+
+@pytest.fixture(autouse=True)
+def fake(monkeypatch):
+    monkeypatch.setattr(fake_gemini, "LATENCY", 0.0)
+    monkeypatch.setattr(fake_gemini, "ERROR_RATE", 0.0)
+    monkeypatch.setattr(fake_gemini, "counts", {"requests": 0, "errors": 0})
+    monkeypatch.setattr(gemini, "BACKOFF_BASE", 0.001)
+    return fake_gemini
+
+def fail_next(monkeypatch, n: int, status: int):
+    # The fake's next `n` requests are answered with `status`, the rest succeed
+    draws = iter([0.0] * n)
+    monkeypatch.setattr(fake_gemini, "ERROR_RATE", 0.5)
+    monkeypatch.setattr(fake_gemini, "ERROR_CODES", [status])
+    monkeypatch.setattr(fake_gemini, "random", SimpleNamespace(random=lambda: next(draws, 1.0), choice=random.choice))
+
+def make_client(**options) -> GeminiClient:
+    client = GeminiClient(endpoint="http://fake-gemini", rpm=0, tpm=0, **options)
+    client._http = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_gemini.app), base_url="http://fake-gemini")
+    return client
+
+
+def test_retries_on_429(monkeypatch):
+    fail_next(monkeypatch, 2, 429)
+    client = make_client(max_retries=3)
+
+    text = asyncio.run(client.generate(MODEL, "You are an AI novelty detector. Text: x"))
+    assert '"novelty_percentage": 64' in text
+    assert fake_gemini.counts == {"requests": 3, "errors": 2}
+    assert (client.retries, client.failures, client.breaker.state) == (2, 0, "closed")
+
+def test_gives_up_with_429_after_max_retries(monkeypatch):
+    fail_next(monkeypatch, 10, 429)
+    client = make_client(max_retries=2)
+
+    with pytest.raises(LLMUnavailable) as raised:
+        asyncio.run(client.generate(MODEL, "prompt"))
+    assert raised.value.status_code == 429
+    assert fake_gemini.counts["requests"] == 3
+
+def test_breaker_opens_then_half_opens(monkeypatch):
+    fail_next(monkeypatch, 2, 503)
+    client = make_client(max_retries=0)
+    client.breaker = CircuitBreaker(threshold=2, cooldown=0.2)
+
+    async def scenario():
+        for n in range(2):
+            with pytest.raises(LLMUnavailable):
+                await client.generate(MODEL, f"prompt {n}")
+        assert client.breaker.state == "open"
+        # Open: fails fast without reaching the server
+        with pytest.raises(LLMUnavailable, match="circuit open"):
+            await client.generate(MODEL, "prompt 2")
+        assert fake_gemini.counts["requests"] == 2
+
+        await asyncio.sleep(0.25)
+        assert client.breaker.state == "half-open"
+        # Half-open: one trial request goes through and closes the breaker
+        await client.generate(MODEL, "prompt 3")
+        return client.breaker.state
+
+    assert asyncio.run(scenario()) == "closed"
+    assert fake_gemini.counts["requests"] == 3
+
+def test_failed_trial_reopens_breaker(monkeypatch):
+    fail_next(monkeypatch, 3, 503)
+    client = make_client(max_retries=0)
+    client.breaker = CircuitBreaker(threshold=2, cooldown=0.2)
+
+    async def scenario():
+        for n in range(2):
+            with pytest.raises(LLMUnavailable):
+                await client.generate(MODEL, f"prompt {n}")
+        await asyncio.sleep(0.25)
+        with pytest.raises(LLMUnavailable):
+            await client.generate(MODEL, "trial")
+        return client.breaker.state
+
+    assert asyncio.run(scenario()) == "open"
+    assert fake_gemini.counts["requests"] == 3
+
+def test_retries_of_one_request_count_as_one_breaker_failure(monkeypatch):
+    fail_next(monkeypatch, 3, 503)
+    client = make_client(max_retries=2)
+    client.breaker = CircuitBreaker(threshold=2, cooldown=0.2)
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(client.generate(MODEL, "prompt"))
+    assert fake_gemini.counts["requests"] == 3
+    assert (client.breaker.failures, client.breaker.state) == (1, "closed")
+
+def test_rejected_request_does_not_reset_the_breaker(monkeypatch):
+    client = make_client(max_retries=0)
+    client.breaker = CircuitBreaker(threshold=2, cooldown=0.2)
+
+    async def scenario():
+        fail_next(monkeypatch, 1, 503)
+        with pytest.raises(LLMUnavailable):
+            await client.generate(MODEL, "prompt 0")
+        # A 400 is the caller's fault: no verdict on the upstream either way
+        fail_next(monkeypatch, 1, 400)
+        with pytest.raises(gemini.UpstreamError):
+            await client.generate(MODEL, "prompt 1")
+        assert client.breaker.failures == 1
+        fail_next(monkeypatch, 1, 503)
+        with pytest.raises(LLMUnavailable):
+            await client.generate(MODEL, "prompt 2")
+        return client.breaker.state
+
+    assert asyncio.run(scenario()) == "open"
+
+def test_half_open_trial_is_retried_before_the_verdict(monkeypatch):
+    client = make_client(max_retries=2)
+    client.breaker = CircuitBreaker(threshold=1, cooldown=0.1)
+
+    async def scenario():
+        fail_next(monkeypatch, 3, 503)
+        with pytest.raises(LLMUnavailable):
+            await client.generate(MODEL, "prompt 0")
+        await asyncio.sleep(0.15)
+        # The trial's own retries go through; one success closes the breaker
+        fail_next(monkeypatch, 1, 503)
+        await client.generate(MODEL, "trial")
+        return client.breaker.state
+
+    assert asyncio.run(scenario()) == "closed"
+    assert fake_gemini.counts["requests"] == 5
+
+def test_identical_concurrent_calls_are_coalesced(monkeypatch):
+    monkeypatch.setattr(fake_gemini, "LATENCY", 0.05)
+    client = make_client()
+
+    async def scenario():
+        same = [client.generate(MODEL, "You are an AI cost estimator. Text: x") for _ in range(5)]
+        other = client.generate(MODEL, "You are an AI novelty detector. Text: x")
+        return await asyncio.gather(*same, other)
+
+    texts = asyncio.run(scenario())
+    assert len(set(texts[:5])) == 1 and texts[5] != texts[0]
+    assert fake_gemini.counts["requests"] == 2
+    assert client.coalesced == 4
+
+def test_sync_call_runs_on_the_client_loop(monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(gemini, "client", client)
+    llm = GeminiLLM(model=MODEL)
+
+    async def scenario():
+        await client.generate(MODEL, "warm-up")
+        # A worker thread's invoke() is handed to this loop, not run on a new one
+        return await asyncio.to_thread(llm.invoke, "You are an AI cost estimator. Text: x")
+
+    assert '"estimated_cost": 1850000' in asyncio.run(scenario())
+    assert fake_gemini.counts["requests"] == 2
+
+def test_sync_call_without_a_running_loop_is_refused(monkeypatch):
+    monkeypatch.setattr(gemini, "client", make_client())
+
+    with pytest.raises(RuntimeError, match="ainvoke"):
+        GeminiLLM(model=MODEL).invoke("prompt")
+    assert fake_gemini.counts["requests"] == 0
+
+def test_request_budget_limits_calls_made_inside_it():
+    client = make_client(coalesce=False)
+
+    async def scenario():
+        with gemini.request_budget(3):
+            # Tasks started inside the block share its budget
+            await asyncio.gather(*(client.generate(MODEL, f"prompt {n}") for n in range(3)))
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.ensure_future(client.generate(MODEL, "over budget")), 0.2)
+        await client.generate(MODEL, "outside")
+
+    asyncio.run(scenario())
+    assert fake_gemini.counts["requests"] == 4
@@ -0,0 +1,83 @@
+import os
+import random
+
+import pytest
+
+from RAG import plag
+from services.plagiarism_engine import MIN_SPAN_WORDS, PlagiarismEngine
+
+# MinHash/LSH engine on a synthetic corpus: every source is random words from a
+# shared vocabulary, so only deliberately copied passages overlap.
+
+VOCAB = [f"term{i}" for i in range(5000)]
+
+
+def random_text(rng, words: int) -> str:
+    return " ".join(rng.choice(VOCAB) for _ in range(words))
+
+def edit_every(text: str, step: int) -> str:
+    # Replaces every `step`-th word, like a light rewording
+    words = text.split()
+    return " ".join("edited" if i % step == step - 1 else w for i, w in enumerate(words))
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = random.Random(11)
+    sources = [(f"source_{i}", random_text(rng, 600)) for i in range(200)]
+    engine = PlagiarismEngine(str(tmp_path / "index"))
+    engine.add(sources)
+    return engine, dict(sources), rng
+
+
+def test_finds_near_duplicate_passages(corpus):
+    engine, sources, rng = corpus
+    copied = " ".join(sources["source_42"].split()[100:400])
+    query = f"{random_text(rng, 300)} {edit_every(copied, 40)} {random_text(rng, 300)}"
+
+    result = engine.check(query)
+
+    assert {m["source_id"] for m in result["matches"]} == {"source_42"}
+    assert 25 <= result["plagiarism_percentage"] <= 35  # 300 of 900 words
+    assert all(m["words"] >= MIN_SPAN_WORDS for m in result["matches"])
+    assert result["sources_checked"] == 200
+
+def test_unrelated_text_scores_zero(corpus):
+    engine, _, rng = corpus
+
+    result = engine.check(random_text(rng, 1000))
+
+    assert result["plagiarism_percentage"] == 0 and result["matches"] == []
+
+def test_overlaps_shorter_than_the_minimum_span_are_ignored(corpus):
+    engine, sources, _ = corpus
+    # Every run of untouched words is shorter than MIN_SPAN_WORDS in the first
+    # query and just long enough in the second
+    short = edit_every(sources["source_7"], MIN_SPAN_WORDS - 1)
+    long_enough = edit_every(sources["source_7"], MIN_SPAN_WORDS + 1)
+
+    assert engine.check(short)["plagiarism_percentage"] == 0
+    assert engine.check(long_enough)["plagiarism_percentage"] > 80
+
+@pytest.mark.parametrize("percentage, reviewed", [(9.99, False), (10, True), (25, True), (40, True), (40.01, False)])
+def test_only_the_borderline_band_goes_to_the_llm(monkeypatch, percentage, reviewed):
+    monkeypatch.setattr(plag, "LLM_BORDERLINE_LOW", 10)
+    monkeypatch.setattr(plag, "LLM_BORDERLINE_HIGH", 40)
+
+    assert plag.needs_llm_review({"plagiarism_percentage": percentage}) is reviewed
+
+def test_index_round_trips_through_disk(corpus, tmp_path):
+    engine, sources, rng = corpus
+    query = f"{random_text(rng, 200)} {sources['source_3']}"
+    before = engine.check(query)
+
+    reopened = PlagiarismEngine(str(tmp_path / "index"))
+    assert len(reopened) == 200
+    assert reopened.check(query) == before
+    assert reopened.add([("source_3", "already indexed")]) == {"added": 0, "skipped": 1, "total": 200}
+
+    # An ingest by another instance is picked up, and a half-written append is dropped
+    with open(os.path.join(reopened.root, "shingles.u32"), "ab") as f:
+        f.write(b"\0" * 12)
+    reopened.add([("late", query)])
+    assert len(engine) == 201
+    assert {m["source_id"] for m in engine.check(query)["matches"]} >= {"source_3", "late"}
@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import config.db
+from services import result_store
+from services.result_store import ResultStore, document_hash
+
+# Runs ResultStore against mongomock-motor (pip install mongomock-motor); the
+# unreachable-server test needs motor itself.
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setenv("MONGODB_URI", "mongodb://mongomock")
+    monkeypatch.setattr(result_store, "ENABLED", True)
+    monkeypatch.setattr(config.db, "connect_async_db", lambda **options: client)
+    return client[result_store.DB_NAME][result_store.COLLECTION]
+
+async def open_store(batch: int = 100) -> ResultStore:
+    # Flushes happen on batch size or explicit flush(), never on the timer
+    store = ResultStore(batch=batch, flush_seconds=3600)
+    await store.connect()
+    assert store.enabled
+    return store
+
+def counting(result):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return result
+    return compute, calls
+
+
+def test_cached_computes_once_then_hits(mongo):
+    async def scenario():
+        store = await open_store()
+        try:
+            compute, calls = counting({"novelty_percentage": 60})
+            first = await store.cached("check-novelty", "text", compute)
+            pending_hit = await store.cached("check-novelty", "text", compute)
+            await store.flush()
+            stored_hit = await store.cached("check-novelty", "text", compute)
+            return first, pending_hit, stored_hit, calls, store.stats()
+        finally:
+            await store.close()
+
+    first, pending_hit, stored_hit, calls, stats = asyncio.run(scenario())
+    assert first == pending_hit == stored_hit == {"novelty_percentage": 60}
+    assert len(calls) == 1
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (2, 1, 1)
+
+def test_params_and_errors_are_not_mixed_up(mongo):
+    async def scenario():
+        store = await open_store()
+        try:
+            await store.cached("check-plagiarism", "text", counting({"p": 1})[0], {"use_llm": True})
+            compute, calls = counting({"p": 2})
+            other = await store.cached("check-plagiarism", "text", compute, {"use_llm": False})
+            failing, failed_calls = counting({"error": "quota"})
+            await store.cached("check-cost", "text", failing)
+            await store.cached("check-cost", "text", failing)
+            await store.flush()
+            return other, calls, failed_calls, await mongo.count_documents({})
+        finally:
+            await store.close()
+
+    other, calls, failed_calls, stored = asyncio.run(scenario())
+    assert other == {"p": 2} and len(calls) == 1
+    assert len(failed_calls) == 2  # error results are recomputed, never stored
+    assert stored == 2
+
+def test_first_write_wins(mongo):
+    async def scenario():
+        store = await open_store()
+        try:
+            doc_hash = document_hash("text")
+            store.put("timeline", doc_hash, {"timeline": ["first"]})
+            await store.flush()
+            store.put("timeline", doc_hash, {"timeline": ["second"]})
+            await store.flush()
+            return await store.get("timeline", doc_hash), await mongo.count_documents({})
+        finally:
+            await store.close()
+
+    result, stored = asyncio.run(scenario())
+    assert result == {"timeline": ["first"]}
+    assert stored == 1
+
+def test_link_accumulates_proposal_ids(mongo):
+    async def scenario():
+        store = await open_store()
+        try:
+            await store.cached("extract-json", "text", counting({"title": "t"})[0], proposal_id="p1")
+            await store.flush()
+            await store.cached("extract-json", "text", counting({"title": "t"})[0], proposal_id="p2")
+            await store.cached("extract-json", "text", counting({"title": "t"})[0], proposal_id="p2")
+            await store.flush()
+            document = await mongo.find_one({})
+            return document, await store.history("p2")
+        finally:
+            await store.close()
+
+    document, history = asyncio.run(scenario())
+    assert sorted(document["proposal_ids"]) == ["p1", "p2"]
+    assert [entry["result"] for entry in history] == [{"title": "t"}]
+
+def test_history_is_newest_first_and_limited(mongo, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(result_store, "time", SimpleNamespace(time=lambda: next(clock)))
+
+    async def scenario():
+        store = await open_store()
+        try:
+            for n in range(4):
+                store.put("check-cost", document_hash(f"text {n}"), {"n": n}, "p")
+            store.put("timeline", document_hash("text 9"), {"n": 9}, "p")
+            store.put("check-cost", document_hash("other"), {"n": -1}, "q")
+            # history() flushes pending writes itself
+            return await store.history("p", limit=3), await store.history("p", endpoint="check-cost", limit=10)
+        finally:
+            await store.close()
+
+    latest, costs = asyncio.run(scenario())
+    assert [entry["result"]["n"] for entry in latest] == [9, 3, 2]
+    assert [entry["result"]["n"] for entry in costs] == [3, 2, 1, 0]
+    assert "_id" not in latest[0]
+
+def test_flushes_when_batch_is_full(mongo):
+    async def scenario():
+        store = await open_store(batch=3)
+        try:
+            for n in range(2):
+                store.put("check-novelty", document_hash(f"text {n}"), {"n": n})
+            await asyncio.sleep(0.05)
+            before = await mongo.count_documents({})
+            store.put("check-novelty", document_hash("text 2"), {"n": 2})
+            for _ in range(50):
+                await asyncio.sleep(0.01)
+                if not store._pending:
+                    break
+            return before, await mongo.count_documents({})
+        finally:
+            await store.close()
+
+    before, after = asyncio.run(scenario())
+    assert (before, after) == (0, 3)
+
+def test_stays_disabled_when_mongo_is_unreachable(monkeypatch):
+    pytest.importorskip("motor")
+    monkeypatch.setenv("MONGODB_URI", "mongodb://127.0.0.1:9")
+    monkeypatch.setattr(result_store, "ENABLED", True)
+    monkeypatch.setattr(result_store, "TIMEOUT_MS", 200)
+
+    async def scenario():
+        store = ResultStore()
+        await store.connect()
+        compute, calls = counting({"n": 1})
+        results = [await store.cached("check-cost", "text", compute) for _ in range(2)]
+        store.put("check-cost", document_hash("text"), {"n": 1})
+        await store.close()
+        return store, results, calls
+
+    store, results, calls = asyncio.run(scenario())
+    assert not store.enabled
+    assert results == [{"n": 1}, {"n": 1}] and len(calls) == 2
+    assert store.stats()["pending"] == 0
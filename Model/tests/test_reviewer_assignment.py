@@ -0,0 +1,81 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from services.reviewer_assignment import assign, conflict_rows, institute_key, proposal_affiliations
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Dept. of Mining, IIT Madras", "IIT Madras"),
+    ("IIT Madras, Chennai", "IIT Madras, India"),
+    ("Indian Institute of Technology Madras", "IIT Madras"),
+    ("Indian Institute of Technology, Madras", "IIT-Madras"),
+    ("Department of Physics; Indian Institute of Science, Bangalore", "IISc"),
+    ("Indian Institute of Science Education and Research, Pune", "IISER Pune"),
+    ("School of Planning and Architecture", "School of Planning and Architecture, New Delhi"),
+])
+def test_same_institute(a, b):
+    assert institute_key(a) == institute_key(b)
+
+@pytest.mark.parametrize("a, b", [
+    ("University of Delhi", "Delhi Technological University"),
+    ("Indian Institute of Science", "Indian Institute of Science Education and Research, Pune"),
+    ("IISER Pune", "IISER Kolkata"),
+    ("IIT", "IIT Madras"),
+    ("IIT Delhi", "University of Delhi"),
+    ("Dept. of Mining, IIT Madras", "Dept. of Mining, IIT Bombay"),
+])
+def test_different_institutes(a, b):
+    assert institute_key(a) != institute_key(b)
+
+def test_conflict_rows():
+    reviewers = ["IIT Madras", "Dept. of Civil Engg., IIT Madras", "IIT Bombay", "IIT", "", "University of Delhi"]
+    proposals = [
+        proposal_affiliations({"affiliation": "Dept. of Chemistry, Indian Institute of Technology Madras"}),
+        proposal_affiliations({"affiliation": "Delhi Technological University", "collaborating_institutions": ["IIT Bombay"]}),
+        proposal_affiliations({}),
+    ]
+    rows = conflict_rows(proposals, reviewers)
+    assert [r.tolist() for r in rows] == [[0, 1], [2], []]
+
+
+def unit_rows(n: int, dim: int, rng) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_assignment_respects_capacity_distinctness_and_conflicts():
+    rng = np.random.default_rng(7)
+    proposals, reviewers = unit_rows(120, 16, rng), unit_rows(60, 16, rng)
+    institutes = rng.integers(0, 8, 60)
+    conflicts = [np.flatnonzero(institutes == i % 8) for i in range(120)]
+
+    result = assign(proposals, reviewers, conflicts, per_proposal=3, capacity=7, k=20)
+
+    held = result["reviewers"]
+    assert result["stats"]["unassigned"] == 0 and (held >= 0).all()
+    assert np.bincount(held.ravel(), minlength=60).max() <= 7
+    assert all(len(set(row)) == 3 for row in held)
+    assert not any(np.isin(row, c).any() for row, c in zip(held, conflicts))
+    # Scores are the affinities, best first
+    assert np.allclose(result["scores"], np.take_along_axis(proposals @ reviewers.T, held, axis=1), atol=1e-5)
+    assert (np.diff(result["scores"], axis=1) <= 1e-6).all()
+
+def test_assignment_is_optimal_on_a_small_instance():
+    rng = np.random.default_rng(3)
+    proposals, reviewers = unit_rows(5, 8, rng), unit_rows(6, 8, rng)
+    conflicts = [np.array([0]), np.array([], dtype="int64"), np.array([2, 3]), np.array([], dtype="int64"), np.array([5])]
+    affinity = proposals @ reviewers.T
+    for i, excluded in enumerate(conflicts):
+        affinity[i, excluded] = -np.inf
+
+    result = assign(proposals, reviewers, conflicts, per_proposal=1, capacity=1, epsilon=1e-4)
+
+    best = max(sum(affinity[i, j] for i, j in enumerate(choice)) for choice in itertools.permutations(range(6), 5))
+    assert result["stats"]["total_affinity"] >= best - 5 * 1e-4 - 1e-5
+
+def test_assignment_rejects_too_little_capacity():
+    rng = np.random.default_rng(0)
+    empty = [np.array([], dtype="int64")] * 10
+    with pytest.raises(ValueError, match="capacity"):
+        assign(unit_rows(10, 4, rng), unit_rows(4, 4, rng), empty, per_proposal=3, capacity=2)